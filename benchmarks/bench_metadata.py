@@ -0,0 +1,99 @@
+""" Benchmarks for retrieving image collection dates and metadata from GEE
+
+Requests are evaluated by a local stand-in for Earth Engine (see
+``benchmarks/fake_ee.py``), comparing the size of the requests and the work
+needed to evaluate them when iterating over the images one by one
+("iterate") against aggregating the dates, and mapping over the images to
+get their metadata, on the server ("aggregate", as in
+:py:mod:`cedar.sensors.common`).
+"""
+from cedar.sensors import common, landsat
+
+from . import fake_ee
+from . import fake_ee as ee
+
+#: str: Collection of synthetic images
+COLLECTION = 'LANDSAT/LC08/C01/T1_SR'
+#: list[str]: Metadata retrieved per image
+KEYS = landsat.METADATA[COLLECTION]
+
+
+# Previous implementations, using ``iterate``
+def _iterate_collection_dates(imgcol):
+    def inner(image, previous):
+        date = ee.Image(image).date().format(common.EE_DATE_FORMAT)
+        previous_ = ee.List(previous)
+        return ee.List(previous_.add(date))
+    return ee.List(imgcol.iterate(inner, ee.List([])))
+
+
+def _iterate_images_metadata(collection, keys):
+    def inner(img, previous):
+        meta = common.object_metadata(img, keys)
+        previous_ = ee.List(previous)
+        return ee.List(previous_.add(meta))
+    return ee.List(collection.iterate(inner, ee.List([])))
+
+
+#: dict[str, dict]: Ways of retrieving dates and metadata to benchmark
+METHODS = {
+    'iterate': {
+        'dates': _iterate_collection_dates,
+        'metadata': lambda imgcol: _iterate_images_metadata(imgcol, KEYS)
+    },
+    'aggregate': {
+        'dates': common.collection_dates,
+        'metadata': lambda imgcol: common.images_metadata(imgcol, KEYS)
+    }
+}
+
+
+class _Retrieve(object):
+    params = ([100, 1000], list(METHODS))
+    param_names = ['n_images', 'method']
+    timeout = 300
+    #: str: What to retrieve (key of each ``METHODS`` item)
+    what = None
+
+    def setup(self, n_images, method):
+        # Use the stand-in within cedar too
+        self._ee, common.ee = common.ee, fake_ee
+        fake_ee.register_collection(
+            COLLECTION, fake_ee.make_properties(n_images, KEYS))
+        self.imgcol = fake_ee.ImageCollection(COLLECTION)
+        self.func = METHODS[method][self.what]
+
+    def teardown(self, n_images, method):
+        common.ee = self._ee
+
+    def time_build(self, n_images, method):
+        self.func(self.imgcol).serialize()
+
+    def time_evaluate(self, n_images, method):
+        self.func(self.imgcol).getInfo()
+
+    def track_request_size(self, n_images, method):
+        return len(self.func(self.imgcol).serialize())
+    track_request_size.unit = 'bytes'
+
+    def track_n_calls(self, n_images, method):
+        self.func(self.imgcol).getInfo()
+        return fake_ee.last_evaluator.n_calls
+    track_n_calls.unit = 'calls'
+
+    def track_n_copied(self, n_images, method):
+        self.func(self.imgcol).getInfo()
+        return fake_ee.last_evaluator.n_copied
+    track_n_copied.unit = 'items'
+
+
+class CollectionDates(_Retrieve):
+    """ Retrieve the date of each image in a collection
+    """
+    what = 'dates'
+
+
+class ImagesMetadata(_Retrieve):
+    """ Retrieve the metadata of each image in a collection
+    """
+    what = 'metadata'
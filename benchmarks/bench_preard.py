@@ -0,0 +1,123 @@
+""" Benchmarks for reading and converting "pre-ARD" to ARD
+"""
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+import dask
+
+from cedar import convert, manifest, preard
+
+from .synthetic import make_preard
+
+#: dict[str, dict]: Synthetic pre-ARD orders to benchmark
+ORDERS = {
+    'single': {'size': 1024, 'n_band': 7, 'n_time': 10, 'shard_size': None},
+    'sharded': {'size': 1024, 'n_band': 7, 'n_time': 10, 'shard_size': 384},
+    'long': {'size': 512, 'n_band': 7, 'n_time': 60, 'shard_size': 256},
+}
+
+
+def _make_orders(root):
+    orders = {}
+    for key, kwds in ORDERS.items():
+        metadata, images = make_preard(Path(root).joinpath(key), **kwds)
+        orders[key] = (str(metadata), [str(i) for i in images])
+    return orders
+
+
+class _PreARD(object):
+    params = list(ORDERS)
+    param_names = ['order']
+    timeout = 600
+
+    def setup_cache(self):
+        return _make_orders(os.getcwd())
+
+    def setup(self, orders, order):
+        self.metadata_filename, self.images = orders[order]
+        self.metadata = preard.read_metadata(self.metadata_filename)
+        self.bands = self.metadata['image']['bands']
+
+
+class GraphConstruction(_PreARD):
+    """ Time building (but not computing) the pre-ARD to ARD task graph
+    """
+    def time_index_preard_shards(self, orders, order):
+        preard.index_preard_shards(self.images)
+
+    def time_read_preard(self, orders, order):
+        preard.read_preard(self.images)
+
+    def time_process_preard(self, orders, order):
+        preard.process_preard(self.metadata, self.images)
+
+    def track_n_tasks(self, orders, order):
+        ard = preard.process_preard(self.metadata, self.images)
+        return len(ard.__dask_graph__())
+
+
+class Compute(_PreARD):
+    """ Time reading and reorganizing pre-ARD, without writing
+    """
+    def time_read_preard(self, orders, order):
+        preard.read_preard(self.images).data.sum().compute()
+
+    def time_process_preard(self, orders, order):
+        ard = preard.process_preard(self.metadata, self.images)
+        dask.compute(*[ard[band].data.sum() for band in self.bands])
+
+
+class ConvertNetCDF(_PreARD):
+    """ Time and measure peak memory of converting pre-ARD to NetCDF4
+    """
+    def setup(self, orders, order):
+        super().setup(orders, order)
+        self.dest = tempfile.mkdtemp(prefix='cedar_bench_')
+
+    def teardown(self, orders, order):
+        shutil.rmtree(self.dest, ignore_errors=True)
+
+    def _convert(self):
+        result = convert.convert_preard(
+            self.metadata_filename, self.images, self.dest,
+            format='netcdf', overwrite=True, skip_metadata=True,
+            manifest=False
+        )
+        assert result['state'] == convert.CONVERT_STATES.CONVERTED
+
+    def time_convert_preard(self, orders, order):
+        self._convert()
+
+    def peakmem_convert_preard(self, orders, order):
+        self._convert()
+
+
+class CreateManifest(_PreARD):
+    """ Time describing (and hashing) the pre-ARD converted, for manifests
+    """
+    def time_create_manifest(self, orders, order):
+        manifest.create_manifest(self.metadata_filename, self.images)
+
+
+class FindPreARD(object):
+    """ Time matching pre-ARD metadata with images in large directories
+    """
+    params = [100, 1000]
+    param_names = ['n_orders']
+
+    def setup(self, n_orders):
+        self.root = tempfile.mkdtemp(prefix='cedar_bench_')
+        for i in range(n_orders):
+            name = f'ORDER_{i:05d}'
+            Path(self.root).joinpath(name + '.json').touch()
+            for j in range(20):
+                Path(self.root).joinpath(
+                    f'{name}-{j * 256:010d}-0000000000.tif').touch()
+
+    def teardown(self, n_orders):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def time_find_preard(self, n_orders):
+        preard.find_preard(self.root)
@@ -0,0 +1,377 @@
+""" A local stand-in for the parts of the Earth Engine API used by cedar
+
+Like the ``ee`` client library, objects only record the expression used to
+compute them, which is serialized into the request sent by ``getInfo``.
+Unlike the real library, ``getInfo`` evaluates the expression locally
+against synthetic collections (see :py:func:`register_collection`), keeping
+count of the work done so benchmarks can compare the request size and
+evaluation cost of different ways of computing the same thing.
+"""
+import datetime as dt
+import json
+
+#: dict[str, list[dict]]: Image properties of collections "on the server"
+COLLECTIONS = {}
+
+
+def register_collection(name, properties):
+    """ Add a synthetic collection of images, given their properties
+    """
+    COLLECTIONS[name] = [dict(p) for p in properties]
+
+
+def make_properties(n_images, keys, start=dt.datetime(1985, 1, 1)):
+    """ Return properties of ``n_images`` synthetic images, ~2 per date
+
+    Parameters
+    ----------
+    n_images : int
+        Number of images
+    keys : Sequence[str]
+        Metadata keys, each given some value
+    start : dt.datetime, optional
+        Date of first image
+
+    Returns
+    -------
+    list[dict]
+        Image properties
+    """
+    epoch = dt.datetime(1970, 1, 1)
+    properties = []
+    for i in range(n_images):
+        date = start + dt.timedelta(days=8 * (i // 2))
+        props = {key: f'{key}_{i}' for key in keys}
+        props['system:index'] = f'IMAGE_{i:06d}'
+        props['system:time_start'] = (date - epoch) // dt.timedelta(
+            milliseconds=1)
+        properties.append(props)
+    return properties
+
+
+# =============================================================================
+# Expressions
+class ComputedObject(object):
+    """ An object computed by calling ``func`` with ``args`` "on the server"
+    """
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+
+    @classmethod
+    def _cast(cls, obj):
+        new = object.__new__(cls)
+        new.func, new.args = obj.func, obj.args
+        return new
+
+    def serialize(self):
+        """ Return the request for this object, encoded as JSON
+        """
+        return json.dumps(_encode(self), sort_keys=True)
+
+    def getInfo(self):
+        """ Evaluate this object, returning the result
+
+        The :py:class:`Evaluator` used is kept as ``last_evaluator``
+        """
+        global last_evaluator
+        last_evaluator = Evaluator()
+        return last_evaluator.evaluate(self)
+
+
+#: Evaluator: Evaluator used by the last call to ``getInfo``
+last_evaluator = None
+
+
+class Function(object):
+    """ A client-side function, traced as an expression of its arguments
+
+    Parameters
+    ----------
+    func : callable
+        Function to trace
+    types : Sequence[type]
+        Type of each argument
+    """
+    def __init__(self, func, types):
+        self.params = [f'_arg{i}' for i in range(len(types))]
+        self.body = func(*[
+            type_._cast(ComputedObject('Variable', {'name': param}))
+            for param, type_ in zip(self.params, types)
+        ])
+
+
+def _init(obj, value, func='Constant', key='value'):
+    if isinstance(value, ComputedObject):
+        obj.func, obj.args = value.func, value.args
+    else:
+        obj.func, obj.args = func, {key: value}
+
+
+def _encode(value):
+    if isinstance(value, ComputedObject):
+        if value.func == 'Constant':
+            return {'constantValue': _encode(value.args['value'])}
+        if value.func == 'Variable':
+            return {'argumentReference': value.args['name']}
+        return {'functionInvocationValue': {
+            'functionName': value.func,
+            'arguments': {k: _encode(v) for k, v in value.args.items()}
+        }}
+    if isinstance(value, Function):
+        return {'functionDefinitionValue': {
+            'argumentNames': value.params,
+            'body': _encode(value.body)
+        }}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    return value
+
+
+class Element(ComputedObject):
+    def get(self, key):
+        return ComputedObject('Element.get', {'object': self, 'property': key})
+
+    def toDictionary(self, properties=None):
+        return Dictionary._cast(ComputedObject('Element.toDictionary', {
+            'element': self, 'properties': properties}))
+
+
+class Image(Element):
+    def __init__(self, obj):
+        _init(self, obj)
+
+    def date(self):
+        return Date._cast(ComputedObject('Image.date', {'image': self}))
+
+
+class ImageCollection(ComputedObject):
+    def __init__(self, obj):
+        _init(self, obj, func='ImageCollection.load', key='id')
+
+    def iterate(self, algorithm, first=None):
+        return ComputedObject('Collection.iterate', {
+            'collection': self,
+            'function': Function(algorithm, [Image, ComputedObject]),
+            'first': first
+        })
+
+    def aggregate_array(self, property):
+        return List._cast(ComputedObject('AggregateFeatureCollection.array', {
+            'collection': self,
+            'property': property
+        }))
+
+    def size(self):
+        return ComputedObject('Collection.size', {'collection': self})
+
+    def toList(self, count, offset=0):
+        return List._cast(ComputedObject('Collection.toList', {
+            'collection': self,
+            'count': count,
+            'offset': offset
+        }))
+
+    def reduceColumns(self, reducer, selectors):
+        return Dictionary._cast(ComputedObject('Collection.reduceColumns', {
+            'collection': self,
+            'reducer': reducer,
+            'selectors': list(selectors)
+        }))
+
+
+class List(ComputedObject):
+    def __init__(self, obj):
+        _init(self, obj)
+
+    def add(self, element):
+        return List._cast(ComputedObject('List.add', {'list': self,
+                                                      'element': element}))
+
+    def map(self, baseAlgorithm):
+        return List._cast(ComputedObject('List.map', {
+            'list': self,
+            'baseAlgorithm': Function(baseAlgorithm, [ComputedObject])
+        }))
+
+
+class Dictionary(ComputedObject):
+    def __init__(self, obj=None):
+        _init(self, {} if obj is None else obj)
+
+    def set(self, key, value):
+        return Dictionary._cast(ComputedObject('Dictionary.set', {
+            'dictionary': self, 'key': key, 'value': value}))
+
+    def get(self, key):
+        return ComputedObject('Dictionary.get', {'dictionary': self,
+                                                 'key': key})
+
+    @staticmethod
+    def fromLists(keys, values):
+        return Dictionary._cast(ComputedObject('Dictionary.fromLists', {
+            'keys': keys, 'values': values}))
+
+
+class Date(ComputedObject):
+    def __init__(self, obj):
+        _init(self, ComputedObject('Date', {'value': obj}))
+
+    def format(self, format=None):
+        return ComputedObject('Date.format', {'date': self, 'format': format})
+
+
+class Reducer(ComputedObject):
+    @staticmethod
+    def toList(tupleSize=None):
+        return Reducer._cast(ComputedObject('Reducer.toList',
+                                            {'tupleSize': tupleSize}))
+
+
+# =============================================================================
+# Evaluation
+#: dict[str, str]: Joda time patterns (used by EE) to ``strftime`` patterns
+_DATE_PATTERNS = {'YYYY': '%Y', 'yyyy': '%Y', 'MM': '%m', 'dd': '%d'}
+
+
+class Evaluator(object):
+    """ Evaluates expressions, counting the work done
+
+    Attributes
+    ----------
+    n_calls : int
+        Number of function calls evaluated
+    n_copied : int
+        Number of list items or dictionary entries copied to create new
+        lists or dictionaries (server-side objects are immutable)
+    """
+    def __init__(self):
+        self.n_calls = 0
+        self.n_copied = 0
+
+    def evaluate(self, value, env=None):
+        env = env or {}
+        if isinstance(value, ComputedObject):
+            if value.func == 'Constant':
+                return self.evaluate(value.args['value'], env)
+            if value.func == 'Variable':
+                return env[value.args['name']]
+            self.n_calls += 1
+            method = getattr(self, '_' + value.func.replace('.', '_'))
+            return method(value.args, env)
+        if isinstance(value, (list, tuple)):
+            return [self.evaluate(v, env) for v in value]
+        if isinstance(value, dict):
+            return {k: self.evaluate(v, env) for k, v in value.items()}
+        return value
+
+    def _apply(self, function, args, env):
+        env_ = dict(env)
+        env_.update(zip(function.params, args))
+        return self.evaluate(function.body, env_)
+
+    def _ImageCollection_load(self, args, env):
+        return COLLECTIONS[self.evaluate(args['id'], env)]
+
+    def _Element_get(self, args, env):
+        obj = self.evaluate(args['object'], env)
+        return obj.get(self.evaluate(args['property'], env))
+
+    def _Image_date(self, args, env):
+        return self.evaluate(args['image'], env)['system:time_start']
+
+    def _Date(self, args, env):
+        value = self.evaluate(args['value'], env)
+        if isinstance(value, str):
+            value = dt.datetime.strptime(value, '%Y-%m-%d')
+            value = (value - dt.datetime(1970, 1, 1)) // dt.timedelta(
+                milliseconds=1)
+        return value
+
+    def _Date_format(self, args, env):
+        date = dt.datetime(1970, 1, 1) + dt.timedelta(
+            milliseconds=self.evaluate(args['date'], env))
+        pattern = self.evaluate(args['format'], env)
+        for joda, strf in _DATE_PATTERNS.items():
+            pattern = pattern.replace(joda, strf)
+        return date.strftime(pattern)
+
+    def _Collection_iterate(self, args, env):
+        collection = self.evaluate(args['collection'], env)
+        result = self.evaluate(args['first'], env)
+        for image in collection:
+            result = self._apply(args['function'], [image, result], env)
+        return result
+
+    def _AggregateFeatureCollection_array(self, args, env):
+        collection = self.evaluate(args['collection'], env)
+        key = self.evaluate(args['property'], env)
+        self.n_copied += len(collection)
+        return [image[key] for image in collection if key in image]
+
+    def _Collection_reduceColumns(self, args, env):
+        collection = self.evaluate(args['collection'], env)
+        reducer = self.evaluate(args['reducer'], env)
+        selectors = self.evaluate(args['selectors'], env)
+        assert reducer['tupleSize'] in (None, len(selectors))
+        self.n_copied += len(collection) * len(selectors)
+        # Like Earth Engine, skip images missing any selected property
+        return {'list': [[image[key] for key in selectors]
+                         for image in collection
+                         if all(image.get(key) is not None
+                                for key in selectors)]}
+
+    def _Collection_size(self, args, env):
+        return len(self.evaluate(args['collection'], env))
+
+    def _Collection_toList(self, args, env):
+        collection = self.evaluate(args['collection'], env)
+        offset = self.evaluate(args['offset'], env)
+        list_ = collection[offset:offset + self.evaluate(args['count'], env)]
+        self.n_copied += len(list_)
+        return list_
+
+    def _Element_toDictionary(self, args, env):
+        element = self.evaluate(args['element'], env)
+        properties = self.evaluate(args['properties'], env)
+        if properties is None:
+            properties = [k for k in element if not k.startswith('system:')]
+        # Missing (or null) properties are left out
+        dictionary = {k: element[k] for k in properties
+                      if element.get(k) is not None}
+        self.n_copied += len(dictionary)
+        return dictionary
+
+    def _Reducer_toList(self, args, env):
+        return self.evaluate(args, env)
+
+    def _List_add(self, args, env):
+        list_ = self.evaluate(args['list'], env)
+        self.n_copied += len(list_) + 1
+        return list_ + [self.evaluate(args['element'], env)]
+
+    def _List_map(self, args, env):
+        list_ = self.evaluate(args['list'], env)
+        self.n_copied += len(list_)
+        return [self._apply(args['baseAlgorithm'], [item], env)
+                for item in list_]
+
+    def _Dictionary_set(self, args, env):
+        dictionary = self.evaluate(args['dictionary'], env)
+        self.n_copied += len(dictionary) + 1
+        dictionary = dict(dictionary)
+        dictionary[self.evaluate(args['key'], env)] = self.evaluate(
+            args['value'], env)
+        return dictionary
+
+    def _Dictionary_get(self, args, env):
+        dictionary = self.evaluate(args['dictionary'], env)
+        return dictionary[self.evaluate(args['key'], env)]
+
+    def _Dictionary_fromLists(self, args, env):
+        keys = self.evaluate(args['keys'], env)
+        values = self.evaluate(args['values'], env)
+        self.n_copied += len(keys)
+        return dict(zip(keys, values))
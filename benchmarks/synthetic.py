@@ -0,0 +1,175 @@
+""" Create synthetic "pre-ARD" orders (GeoTIFF shards and metadata JSON)
+"""
+import datetime as dt
+import json
+from pathlib import Path
+
+import numpy as np
+
+#: str: CRS of synthetic pre-ARD (CONUS Albers)
+CRS = 'EPSG:5070'
+#: tuple[float, float]: Upper left coordinate of synthetic tile
+UL = (-2565585.0, 3314805.0)
+#: float: Pixel size of synthetic pre-ARD
+RES = 30.
+#: int: NoData value of synthetic pre-ARD
+NODATA = -9999
+#: str: Name of synthetic pre-ARD orders
+NAME = 'LANDSAT_LC08_C01_T1_SR_h001v001_2018-01-01_2019-01-01'
+
+
+def make_preard(path, name=NAME, size=512, n_band=7, n_time=10,
+                shard_size=None, blocksize=256, dtype='int16',
+                interleave='pixel', compress='deflate', seed=42):
+    """ Write a synthetic pre-ARD order to a directory
+
+    Images are written like Earth Engine writes them: pixel interleaved,
+    tiled, compressed GeoTIFFs, split into "shards" named with a
+    "-{ymin}-{xmin}" suffix if the image is larger than ``shard_size``.
+    Pixels are random valid values, with about 20% set to NoData.
+
+    Parameters
+    ----------
+    path : str or Path
+        Directory to write order into
+    name : str, optional
+        Order name
+    size : int, optional
+        Number of rows and columns in the tile
+    n_band : int, optional
+        Number of bands per time step
+    n_time : int, optional
+        Number of time steps
+    shard_size : int, optional
+        Number of rows and columns in each shard. If ``None``, writes one
+        image
+    blocksize : int, optional
+        GeoTIFF internal tile size
+    dtype : str, optional
+        Image data type
+    interleave : {'pixel', 'band'}, optional
+        GeoTIFF interleaving
+    compress : str, optional
+        GeoTIFF compression
+    seed : int, optional
+        Random seed
+
+    Returns
+    -------
+    Path
+        Metadata filename
+    list[Path]
+        Image filename(s)
+    """
+    import rasterio
+    from affine import Affine
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    rng = np.random.RandomState(seed)
+
+    count = n_band * n_time
+    shard_size = shard_size or size
+    transform = Affine(RES, 0, UL[0], 0, -RES, UL[1])
+    profile = {
+        'driver': 'GTiff',
+        'count': count,
+        'dtype': dtype,
+        'crs': CRS,
+        'nodata': NODATA,
+        'tiled': True,
+        'blockxsize': blocksize,
+        'blockysize': blocksize,
+        'interleave': interleave,
+        'compress': compress
+    }
+
+    images = []
+    for row in range(0, size, shard_size):
+        for col in range(0, size, shard_size):
+            h, w = min(shard_size, size - row), min(shard_size, size - col)
+            if shard_size < size:
+                filename = path.joinpath(f'{name}-{row:010d}-{col:010d}.tif')
+            else:
+                filename = path.joinpath(f'{name}.tif')
+            data = rng.randint(0, 10000, (count, h, w)).astype(dtype)
+            data[rng.rand(count, h, w) < 0.2] = NODATA
+            with rasterio.open(str(filename), 'w', height=h, width=w,
+                               transform=transform * Affine.translation(col,
+                                                                        row),
+                               **profile) as dst:
+                dst.write(data)
+            images.append(filename)
+
+    metadata = make_metadata(name, size=size, n_band=n_band, n_time=n_time)
+    metadata_filename = path.joinpath(f'{name}.json')
+    with open(str(metadata_filename), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    return metadata_filename, images
+
+
+def make_metadata(name, size=512, n_band=7, n_time=10,
+                  collection='LANDSAT/LC08/C01/T1_SR'):
+    """ Return metadata for a synthetic pre-ARD order
+
+    Parameters
+    ----------
+    name : str
+        Order name
+    size : int, optional
+        Number of rows and columns in the tile
+    n_band : int, optional
+        Number of bands per time step
+    n_time : int, optional
+        Number of time steps
+    collection : str, optional
+        Image collection name
+
+    Returns
+    -------
+    dict
+        Pre-ARD metadata
+    """
+    import cedar
+    from rasterio.crs import CRS as _CRS
+
+    start = dt.datetime(2018, 1, 1)
+    images = []
+    for i in range(n_time):
+        time_start = start + dt.timedelta(days=16 * i)
+        images.append([{
+            'system:id': f'{collection}/SCENE_{i:03d}',
+            'system:time_start': int(time_start.timestamp() * 1e3),
+            'CLOUD_COVER': float(i % 10 * 10),
+            'LANDSAT_ID': f'SCENE_{i:03d}',
+            'WRS_PATH': 12,
+            'WRS_ROW': 31
+        }])
+
+    bounds = (UL[0], UL[1] - size * RES, UL[0] + size * RES, UL[1])
+    return {
+        'program': {'name': 'cedar', 'version': cedar.__version__},
+        'order': {
+            'submitted': '2019-01-01T00:00:00',
+            'collection': collection,
+            'date_start': '2018-01-01',
+            'date_end': '2019-01-01',
+            'filters': []
+        },
+        'tile': {
+            'index': (1, 1),
+            'crs': _CRS.from_string(CRS).wkt,
+            'bounds': bounds,
+            'res': (RES, RES),
+            'size': (size, size)
+        },
+        'store': {'service': 'GCSStore', 'export_image_kwds': {}},
+        'task': {'name': name, 'prefix': 'CEDAR_PREARD',
+                 'status': {'state': 'COMPLETED'}},
+        'image': {
+            'bands': [f'b{i + 1}' for i in range(n_band)],
+            'nodata': NODATA,
+            'images': images
+        }
+    }
@@ -0,0 +1,314 @@
+""" Open ARD split across many files (e.g., one per order or year)
+
+Reading the full history of a tile usually means opening dozens of ARD
+converted from separate orders. Instead of opening every file to find the
+ones covering a date range, a small JSON index ("sidecar") is kept next to
+the ARD recording the size, modification time, variables, and time
+coordinates of each file. Only files that were added or changed since the
+index was written are opened to update it, and only the files overlapping
+the requested dates are opened and concatenated (lazily, using Dask).
+"""
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import defaults
+
+logger = logging.getLogger(__name__)
+
+#: int: Version of the ARD index format
+INDEX_VERSION = 1
+
+#: tuple[str]: Metadata files of Zarr stores (format 2 and 3)
+_ZARR_METADATA = ('.zmetadata', '.zgroup', '.zattrs', '.zarray',
+                  'zarr.json')
+
+
+def open_ard(paths, start=None, end=None, index=None, chunks=None,
+             **open_kwds):
+    """ Open ARD from one or more files, selecting those within a date range
+
+    Parameters
+    ----------
+    paths : str, Path, or Sequence[str or Path]
+        ARD NetCDF4 files or Zarr stores, or a directory containing them
+    start : str or datetime, optional
+        Select time slices on or after this date
+    end : str or datetime, optional
+        Select time slices on or before this date
+    index : str, Path, or bool, optional
+        Filename of the ARD time index. If ``None``, uses
+        :py:data:`cedar.defaults.ARD_INDEX_FILENAME` in the directory
+        containing the ARD. If ``False``, every ARD is opened without using
+        an index
+    chunks : dict, optional
+        Chunks to use when opening each ARD. Defaults to the chunks of the
+        files (``{}``)
+    open_kwds
+        Additional keyword arguments to :py:func:`xarray.open_dataset` or
+        :py:func:`xarray.open_zarr`
+
+    Returns
+    -------
+    xr.Dataset
+        ARD, concatenated along "time" in order
+
+    Raises
+    ------
+    FileNotFoundError
+        Raised if no ARD are found, or none are within the date range
+    """
+    import xarray as xr
+
+    paths = find_ard(paths)
+    if not paths:
+        raise FileNotFoundError('Could not find any ARD to open')
+
+    if index is not False:
+        if index is None or index is True:
+            index = default_index_filename(paths)
+        entries = update_ard_index(index, paths)
+        selected = [p for p in paths
+                    if _overlaps(entries[_index_key(index, p)], start, end)]
+        logger.debug(f'Opening {len(selected)} of {len(paths)} ARD '
+                     f'overlapping {start} to {end}')
+    else:
+        selected = paths
+
+    chunks = {} if chunks is None else chunks
+    datasets = []
+    for path in selected:
+        ds = open_ard_file(path, chunks=chunks, **open_kwds)
+        if start is not None or end is not None:
+            ds = ds.sel(time=slice(start, end))
+        if ds.sizes.get('time', 0):
+            datasets.append(ds)
+
+    if not datasets:
+        raise FileNotFoundError(f'None of the {len(paths)} ARD have data '
+                                f'between {start} and {end}')
+    if len(datasets) == 1:
+        return datasets[0]
+
+    ds = xr.concat(datasets, dim='time', data_vars='minimal',
+                   coords='minimal', compat='override',
+                   combine_attrs='override')
+    if not ds.indexes['time'].is_monotonic_increasing:
+        ds = ds.sortby('time')
+    return ds
+
+
+def open_ard_file(path, chunks=None, **open_kwds):
+    """ Open an ARD NetCDF4 file or Zarr store
+
+    Parameters
+    ----------
+    path : str or Path
+        ARD filename
+    chunks : dict, optional
+        Chunks to use when opening the ARD. Defaults to the chunks of the
+        file (``{}``)
+    open_kwds
+        Additional keyword arguments to :py:func:`xarray.open_dataset` or
+        :py:func:`xarray.open_zarr`
+
+    Returns
+    -------
+    xr.Dataset
+        ARD
+    """
+    import xarray as xr
+
+    path = Path(path)
+    chunks = {} if chunks is None else chunks
+    if path.is_dir():
+        return xr.open_zarr(str(path), chunks=chunks, **open_kwds)
+    else:
+        return xr.open_dataset(str(path), chunks=chunks, **open_kwds)
+
+
+def find_ard(paths):
+    """ Find ARD files and stores
+
+    Parameters
+    ----------
+    paths : str, Path, or Sequence[str or Path]
+        ARD NetCDF4 files or Zarr stores, or a directory containing them
+
+    Returns
+    -------
+    list[Path]
+        ARD filenames, sorted
+    """
+    if isinstance(paths, (str, Path)):
+        paths = [paths]
+
+    extensions = set(defaults.ARD_EXTENSIONS.values())
+    found = []
+    for path in map(Path, paths):
+        if path.is_dir() and path.suffix not in extensions:
+            found.extend(p for p in path.iterdir()
+                         if p.suffix in extensions)
+        else:
+            found.append(path)
+    return sorted(set(found))
+
+
+def default_index_filename(paths):
+    """ Return the default ARD index filename for some ARD
+
+    Parameters
+    ----------
+    paths : Sequence[Path]
+        ARD filenames
+
+    Returns
+    -------
+    Path
+        Index filename in the directory containing all of the ARD
+    """
+    parent = os.path.commonpath([str(Path(p).absolute().parent)
+                                 for p in paths])
+    return Path(parent).joinpath(defaults.ARD_INDEX_FILENAME)
+
+
+def read_ard_index(filename):
+    """ Read an ARD index, returning an empty index if it doesn't exist
+
+    Parameters
+    ----------
+    filename : str or Path
+        Index filename
+
+    Returns
+    -------
+    dict
+        Index entries for each ARD, by filename relative to the index
+    """
+    filename = Path(filename)
+    if not filename.exists():
+        return {}
+    try:
+        with filename.open('r') as f:
+            index = json.load(f)
+    except ValueError as e:
+        logger.warning(f'Ignoring unreadable ARD index "{filename}": {e}')
+        return {}
+    if index.get('version') != INDEX_VERSION:
+        return {}
+    return index['ard']
+
+
+def write_ard_index(entries, filename):
+    """ Write an ARD index, replacing any existing index
+
+    Parameters
+    ----------
+    entries : dict
+        Index entries for each ARD
+    filename : str or Path
+        Index filename
+    """
+    filename = Path(filename)
+    tmp = filename.with_name(filename.name + f'.tmp.{os.getpid()}')
+    with tmp.open('w') as f:
+        json.dump({'version': INDEX_VERSION, 'ard': entries}, f, indent=2)
+    tmp.replace(filename)
+
+
+def update_ard_index(filename, paths):
+    """ Add or update the index entries of ARD that are new or changed
+
+    Parameters
+    ----------
+    filename : str or Path
+        Index filename
+    paths : Sequence[str or Path]
+        ARD filenames
+
+    Returns
+    -------
+    dict
+        Index entries for each ARD, by filename relative to the index
+    """
+    entries = read_ard_index(filename)
+
+    changed = False
+    for key in list(entries):
+        if not Path(filename).parent.joinpath(key).exists():
+            del entries[key]
+            changed = True
+
+    for path in paths:
+        key = _index_key(filename, path)
+        stat = _stat(path)
+        entry = entries.get(key)
+        if (entry is None or entry['size'] != stat['size'] or
+                entry['mtime'] != stat['mtime']):
+            logger.debug(f'Indexing time coordinates of ARD "{path}"')
+            entries[key] = ard_index_entry(path)
+            changed = True
+
+    if changed:
+        write_ard_index(entries, filename)
+    return entries
+
+
+def ard_index_entry(path):
+    """ Describe the size, modification time, variables, and time of an ARD
+
+    Parameters
+    ----------
+    path : str or Path
+        ARD filename
+
+    Returns
+    -------
+    dict
+        Index entry
+    """
+    with open_ard_file(path) as ds:
+        times = ds.indexes['time'] if 'time' in ds.indexes else []
+        time = [str(t) for t in
+                np.datetime_as_string(np.asarray(times, 'datetime64[s]'))]
+        entry = _stat(path)
+        entry.update({
+            'variables': sorted(ds.data_vars),
+            'time': time,
+            'start': time[0] if time else None,
+            'end': time[-1] if time else None
+        })
+    return entry
+
+
+def _stat(path):
+    path = Path(path)
+    if not path.is_dir():
+        stat = path.stat()
+        return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+    # Zarr stores rewrite the metadata of their arrays (e.g., the shape of
+    # "time") when appended to, with or without consolidated metadata
+    stats = [p.stat() for name in _ZARR_METADATA
+             for p in itertools.chain(path.glob(name),
+                                      path.glob(f'*/{name}'))]
+    if not stats:
+        stats = [path.stat()]
+    return {'size': sum(stat.st_size for stat in stats),
+            'mtime': max(stat.st_mtime for stat in stats)}
+
+
+def _index_key(filename, path):
+    return os.path.relpath(str(Path(path).absolute()),
+                           str(Path(filename).absolute().parent))
+
+
+def _overlaps(entry, start, end):
+    # Same (partial string) date selection as ``ds.sel(time=slice(...))``
+    times = pd.DatetimeIndex(entry['time']).sort_values()
+    return len(times[times.slice_indexer(start, end)]) > 0
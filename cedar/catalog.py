@@ -0,0 +1,259 @@
+""" Catalog of converted ARD, stored in a local SQLite database
+
+Each ARD written by ``cedar convert`` is registered in the catalog with its
+collection, tile, order period, time coverage, size, format, encoding, and
+the pre-ARD it was converted from. Scheduling and analysis jobs can then
+find which tiles, collections, and periods have been converted, and where
+they are, using indexed queries instead of walking the ARD directories.
+"""
+import datetime as dt
+import json
+import logging
+from pathlib import Path
+import sqlite3
+
+from . import defaults
+
+logger = logging.getLogger(__name__)
+
+#: list[str]: Columns of the ARD catalog table, in order
+CATALOG_COLUMNS = [
+    'path', 'collection', 'tile_horizontal', 'tile_vertical',
+    'date_start', 'date_end', 'time_start', 'time_end', 'n_time',
+    'variables', 'size', 'format', 'encoding', 'tracking', 'preard',
+    'updated'
+]
+_JSON_COLUMNS = ('variables', 'encoding')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ard (
+    path TEXT PRIMARY KEY,
+    collection TEXT NOT NULL,
+    tile_horizontal INTEGER NOT NULL,
+    tile_vertical INTEGER NOT NULL,
+    date_start TEXT,
+    date_end TEXT,
+    time_start TEXT,
+    time_end TEXT,
+    n_time INTEGER,
+    variables TEXT,
+    size INTEGER,
+    format TEXT,
+    encoding TEXT,
+    tracking TEXT,
+    preard TEXT,
+    updated TEXT
+);
+CREATE INDEX IF NOT EXISTS ard_tile
+    ON ard (collection, tile_horizontal, tile_vertical, date_start);
+CREATE INDEX IF NOT EXISTS ard_date ON ard (date_start, date_end);
+CREATE INDEX IF NOT EXISTS ard_tracking ON ard (tracking);
+"""
+
+
+class ARDCatalog(object):
+    """ Catalog of converted ARD
+
+    Parameters
+    ----------
+    filename : str or Path
+        SQLite database filename. It is created if it doesn't exist
+    timeout : float, optional
+        Seconds to wait for other processes (e.g., orders converted at once)
+        to finish writing to the catalog
+    """
+    def __init__(self, filename, timeout=30.0):
+        self.filename = Path(filename)
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.filename), timeout=timeout)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self._conn.execute('SELECT COUNT(*) FROM ard').fetchone()[0]
+
+    def close(self):
+        """ Close the connection to the catalog database
+        """
+        self._conn.close()
+
+    def register(self, entry):
+        """ Add or replace the catalog entry for an ARD
+
+        Parameters
+        ----------
+        entry : dict
+            Catalog entry (see :py:func:`catalog_entry`)
+        """
+        entry = entry.copy()
+        entry.setdefault('updated', dt.datetime.now().isoformat())
+        for key in _JSON_COLUMNS:
+            entry[key] = json.dumps(entry.get(key), sort_keys=True)
+        values = [entry.get(col) for col in CATALOG_COLUMNS]
+        sql = (f'INSERT OR REPLACE INTO ard ({", ".join(CATALOG_COLUMNS)}) '
+               f'VALUES ({", ".join("?" * len(CATALOG_COLUMNS))})')
+        with self._conn:
+            self._conn.execute(sql, values)
+        logger.debug(f'Registered ARD "{entry["path"]}" in catalog')
+
+    def remove(self, path):
+        """ Remove an ARD from the catalog, returning True if it was listed
+        """
+        with self._conn:
+            cursor = self._conn.execute('DELETE FROM ard WHERE path = ?',
+                                        (str(path), ))
+        return cursor.rowcount > 0
+
+    def get(self, path):
+        """ Return the catalog entry for an ARD, or ``None`` if not listed
+        """
+        row = self._conn.execute('SELECT * FROM ard WHERE path = ?',
+                                 (str(path), )).fetchone()
+        return _row_to_entry(row) if row is not None else None
+
+    def query(self, collection=None, tiles=None, start=None, end=None,
+              format=None, tracking=None):
+        """ Find ARD in the catalog
+
+        Parameters
+        ----------
+        collection : str, optional
+            Only find ARD of this image collection
+        tiles : Sequence[tuple[int, int]], optional
+            Only find ARD for these tiles, given as (horizontal, vertical)
+        start : str or datetime, optional
+            Only find ARD for order periods ending on or after this date
+        end : str or datetime, optional
+            Only find ARD for order periods starting on or before this date
+        format : {'netcdf', 'zarr'}, optional
+            Only find ARD in this format
+        tracking : str, optional
+            Only find ARD converted from this tracked order
+
+        Returns
+        -------
+        list[dict]
+            Catalog entries, sorted by collection, tile, and date
+        """
+        where, params = [], []
+        if collection is not None:
+            where.append('collection = ?')
+            params.append(collection)
+        if tiles:
+            where.append('(' + ' OR '.join(
+                ['(tile_horizontal = ? AND tile_vertical = ?)'] * len(tiles)
+            ) + ')')
+            for h, v in tiles:
+                params.extend([int(h), int(v)])
+        if start is not None:
+            where.append('date_end >= ?')
+            params.append(_isoformat(start))
+        if end is not None:
+            where.append('date_start <= ?')
+            params.append(_isoformat(end))
+        if format is not None:
+            where.append('format = ?')
+            params.append(format)
+        if tracking is not None:
+            where.append('tracking = ?')
+            params.append(tracking)
+
+        sql = 'SELECT * FROM ard'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += (' ORDER BY collection, tile_horizontal, tile_vertical, '
+                'date_start, path')
+        return [_row_to_entry(row) for row in
+                self._conn.execute(sql, params)]
+
+
+def default_catalog_filename():
+    """ Return the default ARD catalog filename, in the user's config folder
+    """
+    return Path(defaults.CEDAR_ROOT_CONFIG[0]).joinpath(
+        defaults.ARD_CATALOG_FILENAME)
+
+
+def catalog_entry(dest, metadata, metadata_filename=None,
+                  format=defaults.ARD_FORMAT, encoding=None, existing=None):
+    """ Describe converted ARD for the catalog
+
+    Parameters
+    ----------
+    dest : str or Path
+        ARD filename
+    metadata : dict
+        Pre-ARD image metadata of the order converted
+    metadata_filename : str or Path, optional
+        Pre-ARD image metadata filename. The name of its directory is
+        recorded as the tracking name of the order (e.g., as downloaded by
+        ``cedar download``)
+    format : {'netcdf', 'zarr'}, optional
+        ARD file format
+    encoding : dict, optional
+        Encoding options used for the ARD format
+    existing : dict, optional
+        Existing catalog entry for the ARD (e.g., when appending orders),
+        used to extend the order period
+
+    Returns
+    -------
+    dict
+        Catalog entry
+    """
+    from stems.gis.grids import Tile
+    from .ard import ard_index_entry
+    from .profiling import _size
+
+    dest = Path(dest).absolute()
+    tile = Tile.from_dict(metadata['tile'])
+    info = ard_index_entry(dest)
+
+    date_start = _isoformat(metadata['order']['date_start'])
+    date_end = _isoformat(metadata['order']['date_end'])
+    if existing:
+        date_start = min(date_start, existing['date_start'])
+        date_end = max(date_end, existing['date_end'])
+
+    tracking = preard = None
+    if metadata_filename is not None:
+        metadata_filename = Path(metadata_filename).absolute()
+        tracking = metadata_filename.parent.name
+        preard = str(metadata_filename)
+
+    return {
+        'path': str(dest),
+        'collection': metadata['order']['collection'],
+        'tile_horizontal': tile.horizontal,
+        'tile_vertical': tile.vertical,
+        'date_start': date_start,
+        'date_end': date_end,
+        'time_start': info['start'],
+        'time_end': info['end'],
+        'n_time': len(info['time']),
+        'variables': info['variables'],
+        'size': _size(dest),
+        'format': format,
+        'encoding': encoding or {},
+        'tracking': tracking,
+        'preard': preard
+    }
+
+
+def _isoformat(date):
+    import pandas as pd
+    return pd.Timestamp(date).isoformat()
+
+
+def _row_to_entry(row):
+    entry = dict(zip(row.keys(), row))
+    for key in _JSON_COLUMNS:
+        entry[key] = json.loads(entry[key]) if entry[key] else None
+    return entry
@@ -0,0 +1,302 @@
+""" Plan chunks for reading "pre-ARD" and writing ARD
+"""
+import logging
+from math import gcd as _gcd
+import os
+from pathlib import Path
+
+import numpy as np
+
+from . import defaults
+from .exceptions import MemoryLimitError
+
+logger = logging.getLogger(__name__)
+
+
+def read_preard_layout(filenames):
+    """ Return information about how pre-ARD GeoTIFF(s) are stored
+
+    Parameters
+    ----------
+    filenames : Sequence[str or Path]
+        Pre-ARD file name(s)
+
+    Returns
+    -------
+    dict
+        The "block_shape" (y, x) of internal tiles and the "interleave"
+        ("pixel" or "band") of the first file, and band "count", "dtype",
+        "height", and "width" of the mosaic of all files
+    """
+    import rasterio
+    from .preard import index_preard_shards
+
+    if isinstance(filenames, (str, Path)):
+        filenames = (filenames, )
+    mosaic = index_preard_shards(filenames)
+
+    with rasterio.open(str(filenames[0]), 'r') as src:
+        interleave = (src.interleaving.name.lower() if src.interleaving
+                      else None)
+        block_shape = src.block_shapes[0]
+
+    return {
+        'block_shape': block_shape,
+        'interleave': interleave,
+        'count': mosaic['count'],
+        'dtype': mosaic['dtype'],
+        'height': mosaic['height'],
+        'width': mosaic['width']
+    }
+
+
+def plan_preard_chunks(layout, n_band, output_chunks=None,
+                       chunk_bytes=defaults.PREARD_CHUNK_BYTES):
+    """ Plan chunks for reading pre-ARD aligned to its tiles and ARD chunks
+
+    Each spatial read chunk is a multiple of the ARD (output) chunk size so
+    every output chunk is written from exactly one read chunk. If a multiple
+    of the output chunk size is also a multiple of the GeoTIFF tile size (and
+    not too large), that multiple is used so reads cover whole tiles.
+    Otherwise, chunks are made as large as possible within ``chunk_bytes``
+    to limit how many tiles are partially read by more than one chunk.
+
+    Along the "band" dimension (bands x time), pixel interleaved GeoTIFFs
+    are always read in one chunk because reading fewer bands would still
+    decompress all of them. For band interleaved files, chunks hold the
+    bands from as many time steps as the output "time" chunk size.
+
+    Parameters
+    ----------
+    layout : dict
+        Pre-ARD storage information (see :py:func:`read_preard_layout`)
+    n_band : int
+        Number of bands per time step
+    output_chunks : dict, optional
+        ARD chunk sizes, mapping dimension name to size (e.g., from the
+        ``ard.encoding.chunks`` configuration section)
+    chunk_bytes : int, optional
+        Target maximum number of bytes per read chunk
+
+    Returns
+    -------
+    dict
+        Read chunks for "band", "y", and "x"
+    """
+    output_chunks = output_chunks or {}
+    itemsize = np.dtype(layout['dtype']).itemsize
+    count = layout['count']
+
+    # Band x time
+    out_time = output_chunks.get('time', None)
+    if layout.get('interleave') == 'pixel' or not out_time or out_time < 0:
+        band = count
+    else:
+        band = min(count, n_band * out_time)
+
+    # Y/X -- find the size that chunks must be a multiple of
+    align = {}
+    for dim, block, size in zip(('y', 'x'), layout['block_shape'],
+                                (layout['height'], layout['width'])):
+        out = output_chunks.get(dim, None)
+        if not out or out < 0:
+            align[dim] = block
+        else:
+            lcm = block * out // _gcd(block, out)
+            align[dim] = lcm if lcm <= max(block, out) * 4 else out
+        align[dim] = min(align[dim], size)
+
+    # Grow by the same multiple in y/x while under budget
+    k = 1
+    while True:
+        k_ = k + 1
+        y, x = align['y'] * k_, align['x'] * k_
+        if (band * y * x * itemsize > chunk_bytes or
+                (y >= layout['height'] and x >= layout['width'])):
+            break
+        k = k_
+
+    chunks = {
+        'band': band if band < count else -1,
+        'y': min(align['y'] * k, layout['height']),
+        'x': min(align['x'] * k, layout['width'])
+    }
+
+    mib = band * chunks['y'] * chunks['x'] * itemsize / 2 ** 20
+    logger.info(
+        f'Reading pre-ARD with chunks {chunks} (~{mib:.1f} MiB per chunk) '
+        f'for GeoTIFF tiles of {tuple(layout["block_shape"])} '
+        f'({layout.get("interleave")} interleaved) and ARD chunks '
+        f'{output_chunks or "unspecified"}'
+    )
+    for dim in ('y', 'x'):
+        out = output_chunks.get(dim, None)
+        if out and out > 0 and chunks[dim] % out:
+            logger.warning(f'Read chunks along "{dim}" ({chunks[dim]}) are '
+                           f'not aligned with ARD chunks ({out})')
+
+    return chunks
+
+
+def plan_time_series_chunks(sizes, itemsize, time=-1,
+                            chunk_bytes=defaults.RECHUNK_CHUNK_BYTES):
+    """ Plan chunks for reading time series of pixels from ARD
+
+    Chunks contain the entire time series (or ``time`` steps of it) of
+    square windows of pixels, as large as possible within ``chunk_bytes``.
+
+    Parameters
+    ----------
+    sizes : dict[str, int]
+        Sizes of the "time", "y", and "x" dimensions
+    itemsize : int
+        Number of bytes per pixel
+    time : int, optional
+        Number of time steps per chunk, or -1 for all
+    chunk_bytes : int, optional
+        Target maximum number of bytes per chunk
+
+    Returns
+    -------
+    dict
+        Chunks for "time", "y", and "x"
+    """
+    n_time = sizes['time'] if time is None or time < 0 else \
+        min(time, sizes['time'])
+    side = int((chunk_bytes / (max(n_time, 1) * itemsize)) ** 0.5)
+    return {
+        'time': n_time,
+        'y': max(1, min(side, sizes['y'])),
+        'x': max(1, min(side, sizes['x']))
+    }
+
+
+def estimate_task_memory(layout, chunks):
+    """ Estimate the peak memory used by one task converting pre-ARD
+
+    Each task reads one chunk of pre-ARD, which is held in memory until all
+    of the ARD variables sliced from it have been written. Peak memory is
+    estimated as :py:data:`cedar.defaults.PREARD_TASK_MEMORY_FACTOR` times
+    the size of the chunk, accounting for the shard(s) read, the mosaicked
+    chunk, and copies made while encoding and writing.
+
+    Parameters
+    ----------
+    layout : dict
+        Pre-ARD storage information (see :py:func:`read_preard_layout`)
+    chunks : dict
+        Read chunks for "band", "y", and "x"
+
+    Returns
+    -------
+    int
+        Estimated peak memory of one task, in bytes
+    """
+    itemsize = np.dtype(layout['dtype']).itemsize
+    n = itemsize * defaults.PREARD_TASK_MEMORY_FACTOR
+    for dim, size in (('band', layout['count']), ('y', layout['height']),
+                      ('x', layout['width'])):
+        chunk = chunks.get(dim, -1)
+        n *= size if chunk is None or chunk < 0 else min(chunk, size)
+    return int(n)
+
+
+def plan_memory(layout, n_band, memory_limit, n_threads=None,
+                output_chunks=None, chunk_bytes=defaults.PREARD_CHUNK_BYTES):
+    """ Plan read chunks and threads to convert pre-ARD within a memory limit
+
+    Chunks are first planned (see :py:func:`plan_preard_chunks`) to be no
+    larger than an equal share of the memory limit per thread. If the
+    smallest chunks aligned with the GeoTIFF tiles and ARD chunks leave
+    fewer threads within the limit, fewer threads are used. If even one
+    task would not fit, chunks are split into fewer time steps and GeoTIFF
+    tiles than the alignment would use, which reads the same data more than
+    once.
+
+    Parameters
+    ----------
+    layout : dict
+        Pre-ARD storage information (see :py:func:`read_preard_layout`)
+    n_band : int
+        Number of bands per time step
+    memory_limit : int
+        Memory limit, in bytes
+    n_threads : int, optional
+        Maximum number of threads to compute with. Defaults to the number of
+        CPUs
+    output_chunks : dict, optional
+        ARD chunk sizes, mapping dimension name to size
+    chunk_bytes : int, optional
+        Target maximum number of bytes per read chunk
+
+    Returns
+    -------
+    dict
+        Read "chunks", number of threads ("n_threads"), and the estimated
+        peak memory of each task ("task_bytes")
+
+    Raises
+    ------
+    cedar.exceptions.MemoryLimitError
+        Raised if the bands of one time step from one GeoTIFF tile would not
+        fit within the memory limit
+    """
+    n_threads = n_threads or os.cpu_count() or 1
+    budget = memory_limit // (n_threads * defaults.PREARD_TASK_MEMORY_FACTOR)
+    chunks = plan_preard_chunks(layout, n_band, output_chunks=output_chunks,
+                                chunk_bytes=max(1, min(chunk_bytes, budget)))
+
+    task_bytes = estimate_task_memory(layout, chunks)
+    if task_bytes > memory_limit:
+        chunks = _split_chunks(layout, n_band, chunks, memory_limit)
+        task_bytes = estimate_task_memory(layout, chunks)
+
+    n_threads_ = min(n_threads, memory_limit // task_bytes)
+    if n_threads_ < n_threads:
+        logger.info(f'Using {n_threads_} of {n_threads} threads to stay '
+                    f'within the memory limit ({_mib(memory_limit)})')
+
+    logger.debug(f'Planned {n_threads_} threads each using up to '
+                 f'{_mib(task_bytes)} to read chunks {chunks}')
+    return {
+        'chunks': chunks,
+        'n_threads': int(n_threads_),
+        'task_bytes': task_bytes
+    }
+
+
+def _split_chunks(layout, n_band, chunks, memory_limit):
+    """ Split read chunks below their alignment until one task fits
+    """
+    sizes, minimum = {}, {}
+    for dim, size, smallest in (
+            ('band', layout['count'], n_band),
+            ('y', layout['height'], layout['block_shape'][0]),
+            ('x', layout['width'], layout['block_shape'][1])):
+        chunk = chunks.get(dim, -1)
+        sizes[dim] = size if chunk is None or chunk < 0 else min(chunk, size)
+        minimum[dim] = min(smallest, sizes[dim])
+
+    # Halve the dimension with the most multiples of its smallest size
+    while estimate_task_memory(layout, sizes) > memory_limit:
+        splittable = [dim for dim in sizes if sizes[dim] > minimum[dim]]
+        if not splittable:
+            raise MemoryLimitError(
+                f'Cannot convert pre-ARD within a memory limit of '
+                f'{_mib(memory_limit)}: reading {n_band} band(s) of one '
+                f'time step from one GeoTIFF tile needs '
+                f'{_mib(estimate_task_memory(layout, sizes))}'
+            )
+        dim = max(splittable, key=lambda d: sizes[d] / minimum[d])
+        sizes[dim] = max(1, sizes[dim] // minimum[dim] // 2) * minimum[dim]
+
+    logger.warning(f'Splitting read chunks {chunks} into {sizes} to fit '
+                   f'within the memory limit ({_mib(memory_limit)}). '
+                   'Data may be read more than once')
+    if sizes['band'] == layout['count']:
+        sizes['band'] = -1
+    return sizes
+
+
+def _mib(n):
+    return f'{n / 2 ** 20:.1f} MiB'
@@ -0,0 +1,86 @@
+""" CLI for querying the catalog of converted ARD
+"""
+import json
+from pathlib import Path
+
+import click
+
+from . import options
+
+
+opt_catalog = click.option(
+    '--catalog', type=click.Path(dir_okay=False, resolve_path=True),
+    help='ARD catalog filename [default: from config file "ard.catalog", '
+         'or "ard_catalog.sqlite" in the user config directory]')
+
+
+def _catalog_filename(ctx, catalog):
+    if catalog:
+        return catalog
+    return options.fetch_catalog(ctx, fail_if_missing=False)
+
+
+@click.group('catalog', short_help='Query the catalog of converted ARD')
+@click.pass_context
+def group_catalog(ctx):
+    """ Query and maintain the catalog of ARD registered by ``cedar convert``
+    """
+    pass
+
+
+@group_catalog.command('query', short_help='Find converted ARD')
+@opt_catalog
+@click.option('--collection', type=str, help='Image collection')
+@click.option('--tile', 'tiles', type=(int, int), multiple=True,
+              metavar='H V',
+              help='Tile horizontal and vertical index (may be repeated)')
+@click.option('--start', type=str,
+              help='Find orders with periods ending on or after this date')
+@click.option('--end', type=str,
+              help='Find orders with periods starting on or before this date')
+@click.option('--format', 'format_', type=click.Choice(['netcdf', 'zarr']),
+              help='ARD file format')
+@click.option('--tracking', type=str, help='Tracking name of the order')
+@click.option('--json', 'json_', is_flag=True,
+              help='Print catalog entries as JSON')
+@click.pass_context
+def query(ctx, catalog, collection, tiles, start, end, format_, tracking,
+          json_):
+    """ Find ARD in the catalog, printing their filenames or entries
+    """
+    from cedar.catalog import ARDCatalog
+
+    catalog = _catalog_filename(ctx, catalog)
+    with ARDCatalog(catalog) as cat:
+        entries = cat.query(collection=collection, tiles=tiles,
+                            start=start, end=end, format=format_,
+                            tracking=tracking)
+
+    if json_:
+        click.echo(json.dumps(entries, indent=2))
+    else:
+        for entry in entries:
+            click.echo(f'{entry["collection"]} '
+                       f'h{entry["tile_horizontal"]:03d}'
+                       f'v{entry["tile_vertical"]:03d} '
+                       f'{entry["date_start"][:10]} {entry["date_end"][:10]} '
+                       f'{entry["n_time"]:>4d} {entry["path"]}')
+
+
+@group_catalog.command('prune',
+                       short_help='Remove ARD that no longer exist')
+@opt_catalog
+@click.pass_context
+def prune(ctx, catalog):
+    """ Remove catalog entries for ARD that have been deleted
+    """
+    from cedar.catalog import ARDCatalog
+
+    catalog = _catalog_filename(ctx, catalog)
+    n_removed = 0
+    with ARDCatalog(catalog) as cat:
+        for entry in cat.query():
+            if not Path(entry['path']).exists():
+                click.echo(f'Removing "{entry["path"]}"')
+                n_removed += cat.remove(entry['path'])
+    click.echo(f'Removed {n_removed} ARD from the catalog')
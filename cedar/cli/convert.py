@@ -1,36 +1,62 @@
 """ CLI for converting "pre-ARD" to ARD data cubes
 """
-import json
 import logging
 import os.path
-from pathlib import Path
 
 import click
 
 from stems.cli import options as cli_options
 
+from .. import defaults
 from . import options
 
 
 @click.command('convert',
-               short_help='Convert downloaded "pre-ARD" data to ARD NetCDFs')
+               short_help='Convert downloaded "pre-ARD" data to ARD')
 @click.argument('preard', type=click.Path(exists=True, resolve_path=True))
+@click.option('--recursive', '-r', is_flag=True,
+              help='Find pre-ARD in all directories inside PREARD')
 @click.option('--dest', type=click.Path(file_okay=False, resolve_path=True),
               help='Override config file destination directory')
+@click.option('--format', 'format_', type=click.Choice(['netcdf', 'zarr']),
+              help='Override config file ARD file format')
 @cli_options.opt_executor
 @options.opt_overwrite
 @click.option('--skip-metadata', is_flag=True,
               help='Skip copying the metadata')
+@click.option('--skip-manifest', is_flag=True,
+              help='Skip writing and checking manifests that are used to '
+                   'convert out of date ARD again')
+@click.option('--append', is_flag=True,
+              help='Append new time slices onto the ARD for each tile and '
+                   'collection instead of writing ARD per order (Zarr only)')
+@click.option('--resume', is_flag=True,
+              help='Resume converting orders interrupted while writing, '
+                   'checkpointing progress by region (Zarr only)')
+@click.option('--profile', is_flag=True,
+              help='Write a JSON report of time, memory, and I/O used to '
+                   'convert each order next to its ARD')
+@click.option('--parallel-orders', type=click.IntRange(min=1), default=1,
+              show_default=True,
+              help='Number of pre-ARD orders to convert at once')
+@click.option('--max-workers', type=click.IntRange(min=1), default=None,
+              help='Total number of threads shared by orders converted at '
+                   'once with `--parallel-orders` [default: number of CPUs]')
+@options.opt_memory_limit
+@options.opt_empty_slices
+@options.opt_empty_threshold
+@options.opt_statistics
+@options.opt_decode_qa
+@options.opt_skip_catalog
 @click.pass_context
-def convert(ctx, preard, dest, overwrite, executor, skip_metadata):
-    """ Convert "pre-ARD" GeoTIFF(s) to ARD data cubes in NetCDF4 format
+def convert(ctx, preard, recursive, dest, format_, overwrite, executor,
+            skip_metadata, skip_manifest, append, resume, profile,
+            parallel_orders, max_workers, memory_limit, empty_slices,
+            empty_threshold, statistics, decode_qa, skip_catalog):
+    """ Convert "pre-ARD" GeoTIFF(s) to ARD data cubes in NetCDF4 or Zarr
     """
-    from dask.diagnostics import ProgressBar
-    from stems.utils import renamed_upon_completion
-
-    from cedar.preard import (ard_netcdf_encoding, find_preard,
-                              process_preard, read_metadata)
-    from cedar.utils import EE_STATES
+    from cedar.convert import convert_preard_orders
+    from cedar.preard import find_preard
 
     # Provide debug info for the executor
     logger = ctx.obj['logger']
@@ -44,8 +70,19 @@ def convert(ctx, preard, dest, overwrite, executor, skip_metadata):
     cfg = options.fetch_config(ctx)
     ard_cfg = cfg['ard']
     encoding_cfg = ard_cfg.get('encoding', {})
-
-    preard_files = find_preard(preard)
+    format_ = format_ or ard_cfg.get('format', defaults.ARD_FORMAT)
+    append_name = ard_cfg.get('append_name', defaults.ARD_APPEND_NAME)
+    if memory_limit is None and ard_cfg.get('memory_limit', None):
+        from dask.utils import parse_bytes
+        memory_limit = parse_bytes(ard_cfg['memory_limit'])
+    if append and format_ != 'zarr':
+        raise click.BadParameter('Can only append to ARD in "zarr" format',
+                                 param_hint='--append')
+    if resume and format_ != 'zarr':
+        raise click.BadParameter('Can only resume writing ARD in "zarr" '
+                                 'format', param_hint='--resume')
+
+    preard_files = find_preard(preard, recursive=recursive)
     if len(preard_files) == 0:
         raise FileNotFoundError('Could not find pre-ARD files to process')
     click.echo(f"Found metadata for {len(preard_files)} pre-ARD to convert")
@@ -54,60 +91,78 @@ def convert(ctx, preard, dest, overwrite, executor, skip_metadata):
     dest_dir_tmpl = dest or ard_cfg['destination']
     dest_dir_tmpl = os.path.expandvars(dest_dir_tmpl)
 
-    for i, (meta, images) in enumerate(preard_files.items()):
-        # Read metadata first so we know what is in order
-        metadata = read_metadata(meta)
-
-        # Destination can depend on info in metadata - format it
-        dest_dir = create_dest_dir(dest_dir_tmpl, metadata)
-        dest_dir.mkdir(parents=True, exist_ok=True)
-
-        # Create metadata/image names
-        dest_metadata = dest_dir.joinpath(meta.name)
-        dest_ard = dest_dir.joinpath(meta.stem + '.nc')
-
-        # Check if empty and bail
-        state = metadata['task']['status'].get('state', EE_STATES.EMPTY)
-        if state == EE_STATES.EMPTY:
-            click.echo('Not attempting to convert empty pre-ARD order '
-                       f'{meta.stem}')
-        elif dest_ard.exists() and not overwrite:
-            click.echo(f'Already processed "{meta.stem}" to "{dest_ard}"')
-        else:
-            # Try to convert
-            click.echo(f'Processing pre-ARD "{meta.stem}" to destination '
-                       f'"{dest_ard}"')
-
-            # Read TIFF files into ARD-like xr.Dataset
-            ard_ds = process_preard(metadata, images)
-
-            # Determine encoding
-            encoding = ard_netcdf_encoding(ard_ds, metadata, **encoding_cfg)
-
-            with renamed_upon_completion(dest_ard) as tmp:
-                ard_ds_ = ard_ds.to_netcdf(tmp, encoding=encoding,
-                                           compute=False)
-                # Write with progressbar
-                with ProgressBar(dt=10):  # 10 second update
-                    out = ard_ds_.compute()
-
-        if not skip_metadata:
-            if dest_metadata.exists() and not overwrite:
-                click.echo(f'Already copied "{meta.stem}" to "{dest_metadata}"')
-            else:
-                # Always write metadata
-                with dest_metadata.open('w') as f:
-                    json.dump(metadata, f, indent=2, sort_keys=False)
-                click.echo(f'Copied metadata to destination "{dest_metadata}"')
+    # Orders share a Distributed cluster from threads, otherwise each
+    # order gets its own process
+    order_pool = 'threads' if executor is not None else 'processes'
+
+    results = convert_preard_orders(
+        preard_files, dest_dir_tmpl,
+        n_orders=parallel_orders,
+        n_workers=max_workers,
+        order_pool=order_pool,
+        format=format_,
+        encoding=encoding_cfg,
+        overwrite=overwrite,
+        skip_metadata=skip_metadata,
+        manifest=not skip_manifest,
+        progress=True,
+        append=append,
+        append_name=append_name,
+        resume=resume,
+        profile=profile,
+        memory_limit=memory_limit,
+        empty_slices=empty_slices,
+        empty_threshold=empty_threshold,
+        statistics=statistics,
+        decode_qa=decode_qa,
+        catalog=None if skip_catalog else options.fetch_catalog(ctx)
+    )
+
+    failed = []
+    for result in results:
+        if not echo_convert_result(result):
+            failed.append(result['preard'])
+
+    if failed:
+        raise click.ClickException(
+            f'Failed to convert {len(failed)} of {len(preard_files)} pre-ARD')
 
     click.echo('Complete')
 
 
-def create_dest_dir(dest_dir_template, metadata):
-    """ Create str format metadata and return formatted template
+def echo_convert_result(result):
+    """ Report the result of converting an order, returning False if failed
     """
-    from stems.gis.grids import Tile
-    namespace = metadata['order'].copy()
-    namespace['tile'] = Tile.from_dict(metadata['tile'])
-    dest_dir = Path(dest_dir_template.format(**namespace))
-    return dest_dir
+    from cedar.convert import CONVERT_STATES
+
+    name = os.path.basename(result['preard'])
+    state = result['state']
+    if state == CONVERT_STATES.EMPTY:
+        click.echo(f'Not attempting to convert empty pre-ARD order {name}')
+    elif state == CONVERT_STATES.EXISTS:
+        click.echo(f'Already processed "{name}" to '
+                   f'"{result["destination"]}"')
+    elif state == CONVERT_STATES.APPENDED:
+        click.echo(f'Appended {result["appended"]} time slices from '
+                   f'pre-ARD "{name}" to "{result["destination"]}"')
+    elif state == CONVERT_STATES.CONVERTED:
+        if result.get('stale'):
+            click.echo(f'Processed out of date ARD again because of: '
+                       f'{", ".join(result["stale"])}')
+        click.echo(f'Processed pre-ARD "{name}" to destination '
+                   f'"{result["destination"]}"')
+    elif state == CONVERT_STATES.INCOMPLETE:
+        click.echo(f'Not converting pre-ARD "{name}" because its order has '
+                   'not completed')
+    else:
+        click.echo(options.STYLE_ERROR(
+            f'Could not convert pre-ARD "{name}": {result["error"]}'))
+        return False
+
+    if result.get('dropped'):
+        click.echo(f'Dropped {result["dropped"]} empty time slices')
+    if result['metadata']:
+        click.echo(f'Copied metadata to destination "{result["metadata"]}"')
+    if result.get('profile'):
+        click.echo(f'Wrote profile report to "{result["profile"]}"')
+    return True
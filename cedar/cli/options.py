@@ -24,6 +24,47 @@ opt_overwrite = click.option('--overwrite', is_flag=True,
                              help='Overwrite existing files')
 
 
+def _callback_memory_limit(ctx, param, value):
+    if value is None:
+        return None
+    from dask.utils import parse_bytes
+    try:
+        return parse_bytes(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e), ctx=ctx, param=param)
+
+
+opt_memory_limit = click.option(
+    '--memory-limit', callback=_callback_memory_limit, metavar='SIZE',
+    help='Memory limit for converting (e.g., "48GB"), used to plan chunks '
+         'and threads [default: from config file "ard.memory_limit", or no '
+         'limit]')
+
+
+opt_empty_slices = click.option(
+    '--empty-slices', type=click.Choice(['flag', 'drop']), default=None,
+    help='Flag time slices with few or no valid pixels using coordinates '
+         'calculated while writing, or drop them (which reads the pre-ARD '
+         'one extra time)')
+opt_empty_threshold = click.option(
+    '--empty-threshold', type=click.FloatRange(0, 1),
+    default=defaults.ARD_EMPTY_THRESHOLD, show_default=True,
+    help='Time slices with this fraction of valid pixels, or less, are '
+         'empty')
+opt_statistics = click.option(
+    '--statistics', is_flag=True,
+    help='Add the count, minimum, maximum, and mean of valid pixels in each '
+         'band and time slice, computed while writing')
+opt_decode_qa = click.option(
+    '--decode-qa', is_flag=True,
+    help='Decode the Landsat "pixel_qa" band into a "qa_mask" variable with '
+         'one bit per flag (e.g., cloud, cloud shadow)')
+
+opt_skip_catalog = click.option(
+    '--skip-catalog', is_flag=True,
+    help='Skip registering ARD in the ARD catalog (see `cedar catalog`)')
+
+
 opt_update_order = click.option(
     '--update', 'update_', is_flag=True,
     help='Update the tracking info before continuing')
@@ -81,6 +122,31 @@ def fetch_config(ctx, fail_if_missing=True):
         return {}
 
 
+def fetch_catalog(ctx, fail_if_missing=True):
+    """ Return the ARD catalog filename from the configuration file
+
+    Parameters
+    ----------
+    ctx : click.Context
+        Click CLI context
+    fail_if_missing : bool, optional
+        Raise an exception if config is missing. Otherwise uses the default
+        catalog
+
+    Returns
+    -------
+    str
+        ARD catalog filename from the ``ard.catalog`` configuration, or the
+        default catalog (see :py:func:`cedar.catalog.default_catalog_filename`)
+    """
+    from ..catalog import default_catalog_filename
+    cfg = fetch_config(ctx, fail_if_missing=fail_if_missing) or {}
+    catalog = cfg.get('ard', {}).get('catalog', None)
+    if catalog:
+        return os.path.expanduser(os.path.expandvars(catalog))
+    return str(default_catalog_filename())
+
+
 opt_config_file = click.option(
     '--config_file', '-C',
     default=lambda: os.environ.get(defaults.ENVVAR_CONFIG_FILE, None),
@@ -0,0 +1,158 @@
+""" CLI for downloading, converting, and cleaning "pre-ARD" in one pass
+"""
+import logging
+import os.path
+from pathlib import Path
+
+import click
+
+from stems.cli import options as cli_options
+
+from .. import defaults
+from . import options
+from .convert import echo_convert_result
+
+
+@click.command('pipeline',
+               short_help='Download, convert, and clean "pre-ARD" order by '
+                          'order')
+@options.arg_tracking_name
+@options.opt_update_order
+@click.option('--clean', 'clean_', is_flag=True,
+              help='Clean each order from storage after it is converted')
+@click.option('--download-dir', 'download_dir',
+              type=click.Path(file_okay=False, resolve_path=True),
+              help='Root directory to download pre-ARD into before '
+                   'converting. If not specified, downloads into the '
+                   'current directory')
+@click.option('--keep-downloads', is_flag=True,
+              help='Keep downloaded pre-ARD after it is converted')
+@click.option('--dest', type=click.Path(file_okay=False, resolve_path=True),
+              help='Override config file destination directory')
+@click.option('--format', 'format_', type=click.Choice(['netcdf', 'zarr']),
+              help='Override config file ARD file format')
+@cli_options.opt_executor
+@options.opt_overwrite
+@click.option('--skip-metadata', is_flag=True,
+              help='Skip copying the metadata')
+@click.option('--skip-manifest', is_flag=True,
+              help='Skip writing and checking manifests that are used to '
+                   'convert out of date ARD again')
+@click.option('--append', is_flag=True,
+              help='Append new time slices onto the ARD for each tile and '
+                   'collection instead of writing ARD per order (Zarr only)')
+@click.option('--profile', is_flag=True,
+              help='Write a JSON report of time, memory, and I/O used to '
+                   'convert each order next to its ARD')
+@click.option('--parallel-orders', type=click.IntRange(min=1), default=1,
+              show_default=True,
+              help='Number of pre-ARD orders to convert at once')
+@click.option('--max-workers', type=click.IntRange(min=1), default=None,
+              help='Total number of threads shared by orders converted at '
+                   'once [default: number of CPUs]')
+@options.opt_memory_limit
+@options.opt_empty_slices
+@options.opt_empty_threshold
+@options.opt_statistics
+@options.opt_decode_qa
+@options.opt_skip_catalog
+@click.pass_context
+def pipeline(ctx, tracking_name, update_, clean_, download_dir,
+             keep_downloads, dest, format_, executor, overwrite,
+             skip_metadata, skip_manifest, append, profile,
+             parallel_orders, max_workers, memory_limit, empty_slices,
+             empty_threshold, statistics, decode_qa, skip_catalog):
+    """ Download, convert, and clean pre-ARD for a tracked order
+
+    Each order is converted as soon as it has been downloaded, while the
+    next order downloads. Downloaded pre-ARD is deleted once converted
+    (unless ``--keep-downloads``), so only the orders in progress are
+    stored locally at any time.
+    """
+    from cedar.pipeline import pipeline_tracked
+    from cedar.utils import load_ee
+
+    # Provide debug info for the executor
+    logger = ctx.obj['logger']
+    if executor is not None and logger.level == logging.DEBUG:
+        from stems.executor import executor_info
+        info = executor_info(executor)
+        for i in info:
+            logger.debug(i)
+
+    config = options.fetch_config(ctx)
+    tracker = config.get_tracker()
+
+    ard_cfg = config['ard']
+    encoding_cfg = ard_cfg.get('encoding', {})
+    format_ = format_ or ard_cfg.get('format', defaults.ARD_FORMAT)
+    append_name = ard_cfg.get('append_name', defaults.ARD_APPEND_NAME)
+    if memory_limit is None and ard_cfg.get('memory_limit', None):
+        from dask.utils import parse_bytes
+        memory_limit = parse_bytes(ard_cfg['memory_limit'])
+    if append and format_ != 'zarr':
+        raise click.BadParameter('Can only append to ARD in "zarr" format',
+                                 param_hint='--append')
+
+    dest_dir_tmpl = os.path.expandvars(dest or ard_cfg['destination'])
+
+    # Rename to remove .json
+    tracking_name = tracking_name.rstrip('.json')
+
+    # Download directory defaults to tracking_name in current directory
+    if download_dir is None:
+        download_dir = Path('.').resolve()
+    else:
+        download_dir = Path(download_dir)
+    download_dir = download_dir.joinpath(tracking_name)
+
+    click.echo(f'Retrieving pre-ARD from tracking info: {tracking_name}')
+    if update_:
+        load_ee(True)  # authenticate against EE API
+        tracking_info = tracker.update(tracking_name)
+    else:
+        tracking_info = tracker.read(tracking_name)
+
+    n_tasks = len(tracking_info['orders'])
+    click.echo(f'Downloading and converting data for {n_tasks} tasks')
+
+    # Orders share a Distributed cluster from threads, otherwise each
+    # order gets its own process
+    order_pool = 'threads' if executor is not None else 'processes'
+
+    results = pipeline_tracked(
+        tracking_info, tracker.store, download_dir, dest_dir_tmpl,
+        n_orders=parallel_orders,
+        n_workers=max_workers,
+        order_pool=order_pool,
+        clean=clean_,
+        keep_downloads=keep_downloads,
+        overwrite=overwrite,
+        format=format_,
+        encoding=encoding_cfg,
+        skip_metadata=skip_metadata,
+        manifest=not skip_manifest,
+        progress=True,
+        append=append,
+        append_name=append_name,
+        profile=profile,
+        memory_limit=memory_limit,
+        empty_slices=empty_slices,
+        empty_threshold=empty_threshold,
+        statistics=statistics,
+        decode_qa=decode_qa,
+        catalog=None if skip_catalog else options.fetch_catalog(ctx)
+    )
+
+    failed = []
+    for result in results:
+        if not echo_convert_result(result):
+            failed.append(result['preard'])
+        if result['cleaned']:
+            click.echo(f'Cleaned {len(result["cleaned"])} files from storage')
+
+    if failed:
+        raise click.ClickException(
+            f'Failed to convert {len(failed)} of {n_tasks} pre-ARD')
+
+    click.echo('Complete!')
@@ -0,0 +1,61 @@
+""" CLI for rechunking ARD data cubes for time series analysis
+"""
+import click
+
+from .. import defaults
+from . import options
+
+
+def _callback_max_mem(ctx, param, value):
+    from dask.utils import parse_bytes
+    try:
+        return parse_bytes(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e), ctx=ctx, param=param)
+
+
+@click.command('rechunk',
+               short_help='Rechunk ARD into a time-contiguous Zarr store')
+@click.argument('sources', nargs=-1, required=True,
+                type=click.Path(exists=True, resolve_path=True))
+@click.argument('dest', type=click.Path(resolve_path=True))
+@click.option('--time-chunk', type=int, default=-1, show_default=True,
+              help='Number of time steps per chunk, or -1 for all')
+@click.option('--space-chunk', type=click.IntRange(min=1), default=None,
+              help='Number of rows and columns per chunk [default: planned '
+                   f'to be about {defaults.RECHUNK_CHUNK_BYTES // 2 ** 20} '
+                   'MiB per chunk]')
+@click.option('--max-mem', callback=_callback_max_mem, metavar='SIZE',
+              default=f'{defaults.RECHUNK_MAX_MEM // 2 ** 30}GiB',
+              show_default=True,
+              help='Memory limit for rechunking (e.g., "4GB")')
+@click.option('--temp-dir', type=click.Path(file_okay=False,
+                                            resolve_path=True),
+              help='Directory for intermediate data spilled to disk '
+                   '[default: directory containing DEST]')
+@click.option('--compressor',
+              type=click.Choice(['zstd', 'lz4', 'blosc', 'zlib', 'none']),
+              default=None, help='Compressor for the rechunked ARD '
+                                 '[default: Zarr default]')
+@options.opt_overwrite
+@click.pass_context
+def rechunk(ctx, sources, dest, time_chunk, space_chunk, max_mem, temp_dir,
+            compressor, overwrite):
+    """ Rechunk ARD (e.g., yearly ARD for a tile) to time-contiguous Zarr
+
+    Reads one or more ARD (NetCDF4 or Zarr) from SOURCES, combines them
+    along "time", and writes them to a Zarr store at DEST with chunks that
+    contain the entire time series of small windows of pixels.
+    """
+    from cedar.rechunk import rechunk_ard
+
+    click.echo(f'Rechunking {len(sources)} ARD to "{dest}"')
+    dest = rechunk_ard(sources, dest,
+                       time_chunk=time_chunk,
+                       space_chunk=space_chunk,
+                       max_mem=max_mem,
+                       temp_dir=temp_dir,
+                       compressor=compressor,
+                       overwrite=overwrite,
+                       progress=True)
+    click.echo(f'Wrote rechunked ARD to "{dest}"')
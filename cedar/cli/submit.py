@@ -41,13 +41,23 @@ def _check_imgcol(ctx, param, image_collection):
   help='Ending time period for submission')
 @click.option('--period_freq', type=str, default=defaults.PREARD_FREQ,
   help='Split start/end time into periods of this frequency')
+@click.option('--max-workers', type=click.IntRange(min=1),
+              default=defaults.ORDER_MAX_WORKERS, show_default=True,
+              help='Number of pre-ARD images to create at once')
+@click.option('--skip-inventory', is_flag=True,
+              help='Ask Earth Engine for the images to order instead of '
+                   'using cached scene inventories')
+@click.option('--refresh-inventory', is_flag=True,
+              help='Ask Earth Engine for the images to order, replacing '
+                   'any cached scene inventories')
 @cli_options.opt_date_format
 @click.pass_context
 def submit(ctx, image_collection, index, row, col,
-           period_start, period_end, period_freq, date_format):
+           period_start, period_end, period_freq, max_workers,
+           skip_inventory, refresh_inventory, date_format):
     """ Submit "pre-ARD" processing orders and create tracking metadata
     """
-    from cedar.exceptions import EmptyOrderError
+    from cedar.exceptions import EmptyOrderError, OrderAddError
     from cedar.sensors import CREATE_ARD_COLLECTION
     from cedar.utils import load_ee
 
@@ -84,6 +94,9 @@ def submit(ctx, image_collection, index, row, col,
     # Get parse(d) config and build tracker
     config = options.fetch_config(ctx)
     tracker = config.get_tracker()
+    if not skip_inventory:
+        from cedar.sensors.inventory import SceneInventory
+        tracker.inventory = SceneInventory(refresh=refresh_inventory)
 
     # Login to EE
     ee = load_ee(True)
@@ -103,7 +116,8 @@ def submit(ctx, image_collection, index, row, col,
             image_collection,
             index,
             period_start, period_end,
-            period_freq=period_freq
+            period_freq=period_freq,
+            max_workers=max_workers
         )
         click.echo('Wrote job tracking to store object named '
                    f'"{tracking_info_name}" ({tracking_info_id})')
@@ -111,6 +125,9 @@ def submit(ctx, image_collection, index, row, col,
         click.echo(repr(ece))
         click.echo('Did not find data to order. Check your search parameters')
         raise click.Abort()
+    except OrderAddError as oae:
+        click.echo(options.STYLE_ERROR(str(oae)))
+        raise click.Abort()
     except Exception as e:
         click.echo('Unknown error occurred. See exception printed below')
         raise e
@@ -0,0 +1,1023 @@
+""" Convert "pre-ARD" orders to ARD, one or many orders at a time
+"""
+from collections import defaultdict
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed)
+from concurrent.futures.process import BrokenProcessPool
+import contextlib
+import hashlib
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import traceback
+
+import numpy as np
+
+from . import defaults
+from .utils import EE_STATES
+
+logger = logging.getLogger(__name__)
+
+
+# Conversion states
+# Note: Not using Enum for the same reason as ``EE_STATES``
+class CONVERT_STATES(object):
+    # Order was converted to ARD
+    CONVERTED = 'CONVERTED'
+    # New time slices were appended to existing ARD
+    APPENDED = 'APPENDED'
+    # ARD already exists and was not overwritten (or has nothing to append)
+    EXISTS = 'EXISTS'
+    # Order exported 0 images, so there is nothing to convert
+    EMPTY = 'EMPTY'
+    # Conversion raised an exception
+    FAILED = 'FAILED'
+    # Order has not finished exporting, so it was not downloaded or converted
+    INCOMPLETE = 'INCOMPLETE'
+
+
+def convert_preard(metadata_filename, images, dest_dir_template,
+                   format=defaults.ARD_FORMAT, encoding=None,
+                   overwrite=False, skip_metadata=False, progress=False,
+                   append=False, append_name=defaults.ARD_APPEND_NAME,
+                   manifest=True, resume=False, profile=False,
+                   memory_limit=None, empty_slices=None,
+                   empty_threshold=defaults.ARD_EMPTY_THRESHOLD,
+                   statistics=False, decode_qa=False, catalog=None):
+    """ Convert one "pre-ARD" order (image metadata and images) to ARD
+
+    Unless appending, a manifest describing the pre-ARD and encoding used is
+    written next to the ARD (see :py:mod:`cedar.manifest`). Existing ARD is
+    converted again if it is out of date with its manifest, even if not
+    using ``overwrite``.
+
+    Parameters
+    ----------
+    metadata_filename : str or Path
+        Pre-ARD image metadata filename
+    images : Sequence[str or Path]
+        Pre-ARD image filename(s)
+    dest_dir_template : str
+        Destination directory template, formatted using the order
+        metadata (see :py:func:`create_dest_dir`)
+    format : {'netcdf', 'zarr'}, optional
+        ARD file format
+    encoding : dict, optional
+        Encoding options for the ARD format (e.g., the ``ard.encoding``
+        configuration file section)
+    overwrite : bool, optional
+        Overwrite existing ARD and metadata. When appending, only the
+        metadata is overwritten
+    skip_metadata : bool, optional
+        Skip copying the pre-ARD metadata to the destination directory
+    progress : bool, optional
+        Display a progress bar while writing
+    append : bool, optional
+        Append the time slices of this order onto the ARD for the order's
+        collection and tile instead of writing ARD for just this order (see
+        :py:func:`append_ard_zarr`). Requires the "zarr" format
+    append_name : str, optional
+        Filename template for the ARD to append onto, formatted using the
+        order metadata (see :py:func:`create_append_name`)
+    manifest : bool, optional
+        Write a manifest next to the ARD, and use existing manifests to
+        decide if existing ARD needs to be converted again
+    resume : bool, optional
+        Resume writing ARD from where a previous, interrupted attempt
+        stopped (see :py:func:`write_ard_zarr`). Requires the "zarr" format
+    profile : bool, optional
+        Record the time spent in each stage of conversion, Dask task and
+        memory profiles, and bytes read and written, in a JSON report
+        written next to the ARD (see :py:mod:`cedar.profiling`)
+    memory_limit : int, optional
+        Memory limit, in bytes, for converting this order. Read chunks and
+        the number of threads used by the local Dask scheduler are planned
+        to stay within the limit (see :py:func:`cedar.chunks.plan_memory`)
+    empty_slices : {None, 'flag', 'drop'}, optional
+        Flag time slices with ``empty_threshold`` or fewer valid pixels as
+        coordinates of the ARD, or drop them from the ARD (see
+        :py:func:`cedar.preard.process_preard`)
+    empty_threshold : float, optional
+        Time slices with this fraction of valid pixels, or less, are empty
+    statistics : bool, optional
+        Add statistics of the valid pixels in each band and time slice to
+        the ARD, computed while writing (see
+        :py:func:`cedar.preard.ard_statistics`)
+    decode_qa : bool, optional
+        Decode the Landsat ``pixel_qa`` band into a packed mask of flags
+        (see :py:mod:`cedar.qa`)
+    catalog : str or Path, optional
+        Register the ARD in the catalog stored in this SQLite database after
+        converting or appending (see :py:mod:`cedar.catalog`). Existing ARD
+        are registered if they aren't already
+
+    Returns
+    -------
+    dict
+        Conversion result, including the "state" (see
+        :py:class:`CONVERT_STATES`), and the "preard", "destination",
+        and "metadata" filenames. If existing ARD was converted again
+        because it was out of date, the reasons are listed in "stale". If
+        profiled, the profile report filename is in "profile". If dropping
+        empty time slices, the number dropped is in "dropped"
+
+    Raises
+    ------
+    cedar.exceptions.MemoryLimitError
+        Raised if the order cannot be converted within ``memory_limit``
+    """
+    import dask
+    from .manifest import (check_manifest, create_manifest,
+                           manifest_filename, write_manifest)
+    from .preard import ard_encoding, process_preard, read_metadata
+    from .profiling import ConversionProfiler, profile_filenames
+
+    metadata_filename = Path(metadata_filename)
+    profiler = ConversionProfiler(metadata_filename.stem, enabled=profile)
+
+    # Read metadata first so we know what is in order
+    with profiler.stage('read_metadata'):
+        metadata = read_metadata(metadata_filename)
+
+    # Destination can depend on info in metadata - format it
+    dest_dir = create_dest_dir(dest_dir_template, metadata)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+
+    # Create metadata/image names
+    dest_metadata = dest_dir.joinpath(metadata_filename.name)
+    if resume and format != 'zarr':
+        raise ValueError('Can only resume writing ARD in the "zarr" format')
+    if append:
+        if format != 'zarr':
+            raise ValueError('Can only append to ARD in the "zarr" format')
+        dest_name = create_append_name(append_name, metadata)
+    else:
+        dest_name = metadata_filename.stem
+    dest_ard = dest_dir.joinpath(dest_name + defaults.ARD_EXTENSIONS[format])
+    dest_profile, dest_report = profile_filenames(dest_ard)
+
+    # Read chunks are planned to line up with the ARD chunks
+    output_chunks = (encoding or {}).get('chunks', None)
+
+    # Check if existing ARD is out of date
+    dest_manifest = manifest_filename(dest_ard)
+    manifest = manifest and not append
+    options = _manifest_options(empty_slices=empty_slices,
+                                empty_threshold=empty_threshold,
+                                statistics=statistics, decode_qa=decode_qa)
+    stale = []
+    if (manifest and not overwrite and dest_ard.exists() and
+            dest_manifest.exists()):
+        stale = check_manifest(dest_manifest, metadata_filename, images,
+                               format=format, encoding=encoding,
+                               options=options)
+
+    result = {
+        'preard': str(metadata_filename),
+        'destination': str(dest_ard),
+        'metadata': None
+    }
+
+    # Check if empty and bail
+    state = metadata['task']['status'].get('state', EE_STATES.EMPTY)
+    if state == EE_STATES.EMPTY:
+        logger.debug('Not attempting to convert empty pre-ARD order '
+                     f'{metadata_filename.stem}')
+        result['state'] = CONVERT_STATES.EMPTY
+    elif append:
+        logger.debug(f'Appending pre-ARD "{metadata_filename.stem}" to '
+                     f'destination "{dest_ard}"')
+        with profiler.stage('plan_memory'):
+            chunks, compute_config = _plan_memory(metadata, images,
+                                                  memory_limit, output_chunks)
+        with profiler.stage('process_preard'):
+            ard_ds = process_preard(metadata, images, chunks=chunks,
+                                    output_chunks=output_chunks,
+                                    empty_slices=empty_slices,
+                                    empty_threshold=empty_threshold,
+                                    statistics=statistics,
+                                    decode_qa=decode_qa)
+        _count_dropped(result, metadata, ard_ds, empty_slices)
+        with profiler.stage('encoding'):
+            encoding_ = ard_encoding(ard_ds, metadata, format=format,
+                                     **(encoding or {}))
+        with profiler.stage('write'), profiler.compute(dest_report), \
+                dask.config.set(compute_config):
+            n_appended = append_ard_zarr(ard_ds, dest_ard, encoding_,
+                                         progress=progress)
+        profiler.read([metadata_filename] + list(images))
+        profiler.written(dest_ard)
+        result['appended'] = n_appended
+        result['state'] = (CONVERT_STATES.APPENDED if n_appended else
+                           CONVERT_STATES.EXISTS)
+    elif dest_ard.exists() and not overwrite and not stale:
+        logger.debug(f'Already processed "{metadata_filename.stem}" to '
+                     f'"{dest_ard}"')
+        result['state'] = CONVERT_STATES.EXISTS
+    else:
+        if stale:
+            logger.info(f'Converting "{metadata_filename.stem}" again '
+                        f'because it is out of date: {", ".join(stale)}')
+            result['stale'] = stale
+        logger.debug(f'Processing pre-ARD "{metadata_filename.stem}" to '
+                     f'destination "{dest_ard}"')
+        if dest_manifest.exists():
+            dest_manifest.unlink()
+
+        # Plan chunks and threads to fit within any memory limit
+        with profiler.stage('plan_memory'):
+            chunks, compute_config = _plan_memory(metadata, images,
+                                                  memory_limit, output_chunks)
+
+        # Read TIFF files into ARD-like xr.Dataset
+        with profiler.stage('process_preard'):
+            ard_ds = process_preard(metadata, images, chunks=chunks,
+                                    output_chunks=output_chunks,
+                                    empty_slices=empty_slices,
+                                    empty_threshold=empty_threshold,
+                                    statistics=statistics,
+                                    decode_qa=decode_qa)
+        _count_dropped(result, metadata, ard_ds, empty_slices)
+
+        # Determine encoding
+        with profiler.stage('encoding'):
+            encoding_ = ard_encoding(ard_ds, metadata, format=format,
+                                     **(encoding or {}))
+
+        write_kwds = {'resume': True} if resume else {}
+        if ard_ds['time'].size == 0:
+            logger.info(f'Not writing ARD for "{metadata_filename.stem}" '
+                        'because all time slices are empty')
+            result['state'] = CONVERT_STATES.EMPTY
+            manifest = False
+        else:
+            with profiler.stage('write'), profiler.compute(dest_report), \
+                    dask.config.set(compute_config):
+                write_ard(ard_ds, dest_ard, encoding_, format=format,
+                          progress=progress, **write_kwds)
+            result['state'] = CONVERT_STATES.CONVERTED
+            profiler.read([metadata_filename] + list(images))
+            profiler.written(dest_ard)
+
+        if manifest:
+            with profiler.stage('manifest'):
+                write_manifest(
+                    create_manifest(metadata_filename, images,
+                                    format=format, encoding=encoding,
+                                    options=options),
+                    dest_manifest
+                )
+
+    if catalog is not None and result['state'] in (
+            CONVERT_STATES.CONVERTED, CONVERT_STATES.APPENDED,
+            CONVERT_STATES.EXISTS):
+        with profiler.stage('catalog'):
+            _register_ard(catalog, dest_ard, metadata, metadata_filename,
+                          result['state'], format=format, encoding=encoding)
+
+    if not skip_metadata:
+        if dest_metadata.exists() and not overwrite and not stale:
+            logger.debug(f'Already copied "{metadata_filename.stem}" to '
+                         f'"{dest_metadata}"')
+        else:
+            with dest_metadata.open('w') as f:
+                json.dump(metadata, f, indent=2, sort_keys=False)
+            result['metadata'] = str(dest_metadata)
+
+    if profile and result['state'] in (CONVERT_STATES.CONVERTED,
+                                       CONVERT_STATES.APPENDED):
+        result['profile'] = profiler.write(dest_profile)
+
+    return result
+
+
+def convert_preard_orders(preard, dest_dir_template,
+                          n_orders=1, n_workers=None, order_pool='processes',
+                          **convert_kwds):
+    """ Convert many "pre-ARD" orders to ARD, running orders concurrently
+
+    Each order is isolated from the others -- an exception raised while
+    converting one order is logged and reported in its result (with
+    ``state`` set to :py:attr:`CONVERT_STATES.FAILED`) instead of stopping
+    the conversion of the other orders. If a worker process dies (e.g.,
+    killed for using too much memory), the orders lost with the process
+    pool are retried one at a time, each in a new process, so only the
+    orders that kill their worker fail.
+
+    Parameters
+    ----------
+    preard : dict[Path, list[Path]]
+        Pairs of metadata filename to image filename(s), as returned by
+        :py:func:`cedar.preard.find_preard`
+    dest_dir_template : str
+        Destination directory template
+    n_orders : int, optional
+        Number of orders to convert at once. If 1, orders are converted one
+        after another in this process using the currently configured Dask
+        scheduler
+    n_workers : int, optional
+        Total number of worker threads to share among the orders running at
+        once (the "worker budget"). Each order is given
+        ``max(1, n_workers // n_orders)`` threads. Defaults to the number of
+        CPUs. Ignored if ``n_orders`` is 1 or ``order_pool`` is "threads"
+    order_pool : {'processes', 'threads'}, optional
+        Run concurrent orders in separate processes (the default, since
+        writing NetCDF4 files requires a per-process lock), or in threads of
+        this process. Use "threads" when computation is sent elsewhere, e.g.,
+        to a Distributed cluster
+    convert_kwds
+        Additional keyword arguments passed to :py:func:`convert_preard`.
+        When appending (``append=True``), orders appending to the same ARD
+        are converted one after another, in order of their starting date.
+        Any ``memory_limit`` is split evenly among the orders running at
+        once
+
+    Yields
+    ------
+    dict
+        Conversion result for each order, in the order they complete
+    """
+    if convert_kwds.get('append', False):
+        name = convert_kwds.get('append_name', defaults.ARD_APPEND_NAME)
+        groups = _group_preard_by_append(preard, dest_dir_template, name)
+    else:
+        groups = [[(meta, images)] for meta, images in preard.items()]
+
+    if n_orders is None or n_orders <= 1:
+        for group in groups:
+            yield from _convert_preard_group(group, dest_dir_template,
+                                             **convert_kwds)
+        return
+
+    # Progress bars from concurrent orders would interleave
+    convert_kwds['progress'] = False
+
+    pool, n_threads = _make_order_pool(n_orders, n_workers, order_pool)
+    if n_threads:
+        convert_kwds['n_threads'] = n_threads
+    _share_memory_limit(convert_kwds, n_orders)
+
+    broken = []
+    with pool:
+        futures = {
+            pool.submit(_convert_preard_group,
+                        group, dest_dir_template, **convert_kwds): group
+            for group in groups
+        }
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except BrokenProcessPool:
+                broken.append(futures[future])
+                continue
+            except Exception as e:
+                results = _failed_group(futures[future], e)
+            yield from results
+
+    if broken:
+        logger.warning(f'A worker process died, so retrying {len(broken)} '
+                       'order(s) one at a time')
+    for group in broken:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(_convert_preard_group,
+                                 group, dest_dir_template, **convert_kwds)
+            try:
+                results = future.result()
+            except Exception as e:
+                results = _failed_group(group, e)
+        yield from results
+
+
+def write_ard(ard_ds, dest, encoding, format=defaults.ARD_FORMAT,
+              progress=False, **write_kwds):
+    """ Write ARD in some format, moving it into place once complete
+
+    Parameters
+    ----------
+    ard_ds : xr.Dataset
+        ARD as a XArray Dataset
+    dest : str or Path
+        Destination filename
+    encoding : dict
+        Encoding for the format (see :py:func:`cedar.preard.ard_encoding`)
+    format : {'netcdf', 'zarr'}, optional
+        ARD file format
+    progress : bool, optional
+        Display a progress bar while writing
+    write_kwds
+        Additional keyword arguments for the format's writer (e.g.,
+        ``resume`` for :py:func:`write_ard_zarr`)
+    """
+    try:
+        func = _ARD_WRITERS[format]
+    except KeyError:
+        raise KeyError(f'Unknown ARD format "{format}"')
+    return func(ard_ds, dest, encoding, progress=progress, **write_kwds)
+
+
+def write_ard_netcdf(ard_ds, dest, encoding, progress=False):
+    """ Write ARD to a NetCDF4 file, renaming it into place once complete
+
+    Parameters
+    ----------
+    ard_ds : xr.Dataset
+        ARD as a XArray Dataset
+    dest : str or Path
+        Destination filename
+    encoding : dict
+        NetCDF encoding to use with :py:meth:`xarray.Dataset.to_netcdf`
+    progress : bool, optional
+        Display a progress bar while writing
+    """
+    from dask.diagnostics import ProgressBar
+    from stems.utils import renamed_upon_completion
+
+    with renamed_upon_completion(dest) as tmp:
+        ard_ds_ = ard_ds.to_netcdf(tmp, encoding=encoding, compute=False)
+        # Write with progressbar
+        with (ProgressBar(dt=10) if progress else contextlib.suppress()):
+            ard_ds_.compute()
+
+
+def write_ard_zarr(ard_ds, dest, encoding, progress=False, resume=False,
+                   n_regions=None):
+    """ Write ARD to a Zarr store, renaming it into place once complete
+
+    Unlike NetCDF4, chunks of a Zarr store are separate files and are
+    written in parallel without a lock.
+
+    When ``resume`` is used, the store is written to a temporary store with
+    a fixed name (ending in :py:data:`cedar.defaults.ARD_RESUME_SUFFIX`)
+    one spatial region at a time, and each completed region is recorded in
+    a checkpoint file next to it. If writing is interrupted, writing the
+    same ARD again with ``resume`` only writes the regions not yet
+    completed.
+
+    Parameters
+    ----------
+    ard_ds : xr.Dataset
+        ARD as a XArray Dataset
+    dest : str or Path
+        Destination Zarr store directory. If it exists, it is replaced once
+        the new store has been written
+    encoding : dict
+        Zarr encoding to use with :py:meth:`xarray.Dataset.to_zarr`
+    progress : bool, optional
+        Display a progress bar while writing
+    resume : bool, optional
+        Write region by region, resuming from a previous attempt if
+        possible. Requires ``xarray>=0.16.2``
+    n_regions : int, optional
+        When resuming, the number of regions to write at once between
+        checkpoints. Defaults to the number of Dask workers (or CPUs)
+    """
+    from dask.diagnostics import ProgressBar
+    from .preard import zarr_format_kwds
+
+    dest = Path(dest)
+
+    # Each Dask chunk must cover whole Zarr chunks to write in parallel
+    ard_ds = _align_zarr_chunks(ard_ds, {
+        var: enc['chunks'] for var, enc in encoding.items() if 'chunks' in enc
+    })
+
+    if resume:
+        suffix = defaults.ARD_RESUME_SUFFIX
+        checkpoint = dest.with_name(dest.name + suffix +
+                                    defaults.ARD_CHECKPOINT_SUFFIX)
+        with _replaced_upon_completion(dest, suffix=suffix) as tmp:
+            _write_zarr_regions(ard_ds, tmp, encoding, checkpoint,
+                                progress=progress, n_regions=n_regions)
+        checkpoint.unlink()
+    else:
+        with _replaced_upon_completion(dest) as tmp:
+            ard_ds_ = ard_ds.to_zarr(tmp, encoding=encoding, mode='w',
+                                     compute=False, **zarr_format_kwds())
+            with (ProgressBar(dt=10) if progress else contextlib.suppress()):
+                ard_ds_.compute()
+
+
+def append_ard_zarr(ard_ds, dest, encoding, progress=False):
+    """ Append the new time slices of some ARD onto an existing Zarr store
+
+    Time slices already in ``dest`` are skipped, so appending the same ARD
+    twice does nothing the second time. The remaining time slices are
+    written onto the end of the existing "time" dimension, so they must all
+    come after the times already stored. If ``dest`` does not exist yet, it
+    is created from ``ard_ds`` (see :py:func:`write_ard_zarr`).
+
+    Parameters
+    ----------
+    ard_ds : xr.Dataset
+        ARD as a XArray Dataset
+    dest : str or Path
+        Destination Zarr store directory
+    encoding : dict
+        Zarr encoding used if creating the store (see
+        :py:func:`cedar.preard.ard_zarr_encoding`). Existing stores keep
+        the encoding they were created with
+    progress : bool, optional
+        Display a progress bar while writing
+
+    Returns
+    -------
+    int
+        Number of time slices written
+
+    Raises
+    ------
+    ValueError
+        Raised if the new time slices would not come after the existing
+        ones, or if the ARD has different variables than the existing store
+        (e.g., it was converted with different options)
+    """
+    import xarray as xr
+    from dask.diagnostics import ProgressBar
+
+    dest = Path(dest)
+    if ard_ds['time'].size == 0:
+        logger.debug(f'No time slices to append to "{dest}"')
+        return 0
+    if not dest.exists():
+        logger.debug(f'Creating Zarr store "{dest}" to append onto later')
+        write_ard_zarr(ard_ds, dest, encoding, progress=progress)
+        return ard_ds.time.size
+
+    with xr.open_zarr(str(dest)) as existing:
+        existing_times = existing['time'].values
+        existing_attrs = existing.attrs.copy()
+        existing_chunks = {
+            var: existing[var].encoding['chunks']
+            for var in existing.data_vars if 'chunks' in existing[var].encoding
+        }
+        existing_vars = {
+            name: existing[name] for name in existing.variables
+            if name != 'time' and 'time' in existing[name].dims
+        }
+
+    # De-duplicate
+    is_new = ~np.isin(ard_ds['time'].values, existing_times)
+    n_new = int(is_new.sum())
+    if n_new == 0:
+        logger.debug(f'All {ard_ds.time.size} time slices already exist in '
+                     f'"{dest}"')
+        return 0
+    new_ds = ard_ds.isel(time=np.flatnonzero(is_new))
+
+    last_time = existing_times.max() if existing_times.size else None
+    if last_time is not None and new_ds['time'].values.min() <= last_time:
+        raise ValueError(
+            f'Cannot append time slices to "{dest}" because some are before '
+            f'the last time already stored ({last_time}). Only new time '
+            'slices after the existing ones can be appended')
+
+    new_ds = _align_append_variables(new_ds, existing_vars, dest)
+    new_ds.attrs = _merge_append_attrs(existing_attrs, new_ds.attrs)
+    new_ds = _align_zarr_chunks(new_ds, existing_chunks,
+                                offsets={'time': existing_times.size})
+
+    logger.debug(f'Appending {n_new} of {ard_ds.time.size} time slices to '
+                 f'"{dest}"')
+    new_ds_ = new_ds.to_zarr(str(dest), mode='a', append_dim='time',
+                             compute=False)
+    with (ProgressBar(dt=10) if progress else contextlib.suppress()):
+        new_ds_.compute()
+
+    return n_new
+
+
+def create_append_name(append_name_template, metadata):
+    """ Return the ARD filename to append an order to, without extension
+    """
+    from stems.gis.grids import Tile
+    namespace = metadata['order'].copy()
+    namespace['collection'] = namespace['collection'].replace('/', '_')
+    namespace['tile'] = Tile.from_dict(metadata['tile'])
+    return append_name_template.format(**namespace)
+
+
+def create_dest_dir(dest_dir_template, metadata):
+    """ Create str format metadata and return formatted template
+    """
+    from stems.gis.grids import Tile
+    namespace = metadata['order'].copy()
+    namespace['tile'] = Tile.from_dict(metadata['tile'])
+    dest_dir = Path(dest_dir_template.format(**namespace))
+    return dest_dir
+
+
+_ARD_WRITERS = {
+    'netcdf': write_ard_netcdf,
+    'zarr': write_ard_zarr
+}
+
+
+def _group_preard_by_append(preard, dest_dir_template, append_name):
+    """ Group pre-ARD that append to the same ARD, sorted by date
+    """
+    from .preard import read_metadata
+
+    groups = defaultdict(list)
+    for meta, images in preard.items():
+        metadata = read_metadata(meta)
+        key = (str(create_dest_dir(dest_dir_template, metadata)),
+               create_append_name(append_name, metadata))
+        groups[key].append((metadata['order']['date_start'], meta, images))
+
+    return [[(meta, images) for _, meta, images in sorted(group)]
+            for group in groups.values()]
+
+
+@contextlib.contextmanager
+def _replaced_upon_completion(dest, suffix=None):
+    """ Yield a temporary store name, replacing ``dest`` with it once complete
+
+    Like :py:func:`stems.utils.renamed_upon_completion`, but ``dest`` may be
+    an existing directory (e.g., a Zarr store). It is only removed once the
+    new store is complete, so failed writes keep the existing store.
+    """
+    dest = Path(dest)
+    if suffix is None:
+        suffix = f'.tmp.{os.getpid()}'
+    tmp = dest.with_name(dest.name + suffix)
+
+    yield str(tmp)
+
+    if dest.is_dir():
+        logger.debug(f'Replacing existing Zarr store "{dest}"')
+        shutil.rmtree(str(dest))
+    shutil.move(str(tmp), str(dest))
+
+
+def _write_zarr_regions(ard_ds, store, encoding, checkpoint, progress=False,
+                        n_regions=None):
+    """ Write ARD to a Zarr store by region, recording regions in checkpoint
+
+    The checkpoint file is JSON lines. The first line is a signature of
+    the ARD and encoding being written, and each other line is a completed
+    region. If the checkpoint doesn't match ``ard_ds``, the store is
+    started again from scratch.
+    """
+    import dask
+    from dask.diagnostics import ProgressBar
+    from .preard import zarr_format_kwds
+
+    store, checkpoint = Path(store), Path(checkpoint)
+    regions = _zarr_regions(ard_ds)
+    signature = _checkpoint_signature(ard_ds, encoding, regions)
+
+    region_dims = set(regions[0]) if regions else set()
+
+    completed = _read_checkpoint(checkpoint, signature)
+    if completed is None or not store.is_dir():
+        logger.debug(f'Starting Zarr store "{store}" for {len(regions)} '
+                     'regions')
+        if store.is_dir():
+            shutil.rmtree(str(store))
+        # Variables outside of the regions (e.g., flags calculated for each
+        # time) aren't written by region, so compute them now
+        ard_ds = ard_ds.copy()
+        for name, var in ard_ds.variables.items():
+            if not region_dims & set(var.dims) and var.chunks is not None:
+                var.load()
+        # Writes metadata and coordinates, but not data
+        ard_ds.to_zarr(str(store), encoding=encoding, mode='w',
+                       compute=False, **zarr_format_kwds())
+        with checkpoint.open('w') as f:
+            f.write(json.dumps({'signature': signature}) + '\n')
+        completed = set()
+    else:
+        logger.info(f'Resuming writing "{store}" with {len(completed)} of '
+                    f'{len(regions)} regions already completed')
+
+    todo = [r for r in regions if _region_key(r) not in completed]
+
+    # Only write variables in the region (e.g., not "time")
+    ds = ard_ds.drop_vars([name for name, var in ard_ds.variables.items()
+                           if not region_dims & set(var.dims)])
+
+    n_regions = (n_regions or dask.config.get('num_workers', None) or
+                 os.cpu_count() or 1)
+    for i in range(0, len(todo), n_regions):
+        batch = todo[i:i + n_regions]
+        writes = [ds.isel(region).to_zarr(str(store), region=region,
+                                          compute=False)
+                  for region in batch]
+        with (ProgressBar(dt=10) if progress else contextlib.suppress()):
+            dask.compute(*writes)
+        with checkpoint.open('a') as f:
+            for region in batch:
+                f.write(json.dumps(_region_key(region)) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        logger.debug(f'Completed {i + len(batch)} of {len(todo)} regions')
+
+
+def _zarr_regions(ds, dims=('y', 'x')):
+    """ Return regions of ``ds`` covering each of its Dask chunks in ``dims``
+    """
+    chunks = ds.chunks
+    edges = []
+    for dim in dims:
+        stops = np.cumsum(chunks[dim]) if dim in chunks else [ds.sizes[dim]]
+        starts = np.concatenate(([0], stops[:-1]))
+        edges.append([slice(int(a), int(b)) for a, b in zip(starts, stops)])
+    return [dict(zip(dims, slices)) for slices in itertools.product(*edges)]
+
+
+def _region_key(region):
+    return tuple((region[dim].start, region[dim].stop)
+                 for dim in sorted(region))
+
+
+def _checkpoint_signature(ds, encoding, regions):
+    """ Return a hash identifying the contents and layout of ARD to write
+    """
+    info = {
+        'sizes': dict(ds.sizes),
+        'dtypes': {name: str(var.dtype) for name, var in ds.data_vars.items()},
+        'time': [str(t) for t in ds['time'].values] if 'time' in ds else [],
+        'attrs': ds.attrs,
+        'encoding': encoding,
+        'regions': [_region_key(r) for r in regions]
+    }
+    data = json.dumps(info, sort_keys=True, default=str).encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read_checkpoint(checkpoint, signature):
+    """ Return completed regions from a checkpoint, or None if it doesn't
+    exist or is for different ARD
+    """
+    checkpoint = Path(checkpoint)
+    if not checkpoint.exists():
+        return None
+
+    with checkpoint.open('r') as f:
+        lines = f.read().splitlines()
+    try:
+        header = json.loads(lines[0])
+    except (IndexError, ValueError):
+        return None
+    if header.get('signature') != signature:
+        logger.debug(f'Checkpoint "{checkpoint}" is for different ARD')
+        return None
+
+    completed = set()
+    for line in lines[1:]:
+        try:
+            key = json.loads(line)
+        except ValueError:  # partially written line from a crash
+            continue
+        completed.add(tuple(map(tuple, key)))
+    return completed
+
+
+def _make_order_pool(n_orders, n_workers=None, order_pool='processes'):
+    """ Return an executor for converting orders, and threads per order
+    """
+    if order_pool == 'processes':
+        n_workers = n_workers or os.cpu_count() or 1
+        n_threads = max(1, n_workers // n_orders)
+        logger.debug(f'Converting {n_orders} orders at once using '
+                     f'{n_threads} threads each')
+        return ProcessPoolExecutor(max_workers=n_orders), n_threads
+    elif order_pool == 'threads':
+        logger.debug(f'Converting {n_orders} orders at once in threads')
+        return ThreadPoolExecutor(max_workers=n_orders), None
+    else:
+        raise ValueError(f'Unknown order pool type "{order_pool}"')
+
+
+def _count_dropped(result, metadata, ard_ds, empty_slices):
+    """ Record the number of empty time slices dropped in a result
+    """
+    if empty_slices == 'drop':
+        n_time = len(metadata['image']['images'])
+        result['dropped'] = n_time - ard_ds['time'].size
+
+
+def _manifest_options(empty_slices=None,
+                      empty_threshold=defaults.ARD_EMPTY_THRESHOLD,
+                      statistics=False, decode_qa=False):
+    """ Return the conversion options used that change the ARD written
+    """
+    options = {}
+    if empty_slices:
+        options['empty_slices'] = empty_slices
+        options['empty_threshold'] = empty_threshold
+    if statistics:
+        options['statistics'] = True
+    if decode_qa:
+        options['decode_qa'] = True
+    return options
+
+
+def _share_memory_limit(convert_kwds, n_orders):
+    """ Split any memory limit evenly between orders converted at once
+    """
+    memory_limit = convert_kwds.get('memory_limit', None)
+    if memory_limit:
+        convert_kwds['memory_limit'] = memory_limit // n_orders
+        logger.debug(f'Converting {n_orders} orders at once with a memory '
+                     f'limit of {convert_kwds["memory_limit"]} bytes each')
+
+
+def _plan_memory(metadata, images, memory_limit, output_chunks=None):
+    """ Return read chunks and Dask config to convert within a memory limit
+    """
+    import dask
+    from .chunks import plan_memory, read_preard_layout
+
+    if not memory_limit:
+        return None, {}
+    plan = plan_memory(read_preard_layout(images),
+                       len(metadata['image']['bands']),
+                       memory_limit,
+                       n_threads=dask.config.get('num_workers', None),
+                       output_chunks=output_chunks)
+    return plan['chunks'], {'num_workers': plan['n_threads']}
+
+
+def _register_ard(catalog, dest, metadata, metadata_filename, state,
+                  format=defaults.ARD_FORMAT, encoding=None):
+    """ Register converted or appended ARD, and unlisted existing ARD
+    """
+    from .catalog import ARDCatalog, catalog_entry
+
+    with ARDCatalog(catalog) as cat:
+        existing = cat.get(dest.absolute())
+        if state == CONVERT_STATES.EXISTS and existing is not None:
+            return
+        cat.register(catalog_entry(
+            dest, metadata,
+            metadata_filename=metadata_filename,
+            format=format,
+            encoding=encoding,
+            existing=existing if state == CONVERT_STATES.APPENDED else None
+        ))
+
+
+def _convert_preard_group(group, dest_dir_template, **convert_kwds):
+    """ Convert a group of pre-ARD in order, returning a list of results
+    """
+    return [
+        _convert_preard_isolated(meta, images, dest_dir_template,
+                                 **convert_kwds)
+        for meta, images in group
+    ]
+
+
+def _align_zarr_chunks(ds, var_chunks, offsets=None):
+    """ Rechunk variables so each Dask chunk covers whole Zarr chunk(s)
+
+    ``offsets`` gives the position of ``ds`` along any dimensions within the
+    Zarr array (e.g., the existing size of the dimension appended to), so
+    the first chunk only fills out the partial Zarr chunk at that position.
+    """
+    offsets = offsets or {}
+    ds = ds.copy()
+    for var, chunks in var_chunks.items():
+        if var not in ds.data_vars or ds[var].chunks is None:
+            continue
+        xarr = ds[var]
+        dask_chunks = {}
+        for dim, size, chunk in zip(xarr.dims, xarr.shape, chunks):
+            first = chunk - offsets.get(dim, 0) % chunk
+            sizes = [min(first, size)]
+            while sum(sizes) < size:
+                sizes.append(min(chunk, size - sum(sizes)))
+            dask_chunks[dim] = tuple(sizes)
+        ds[var] = xarr.chunk(dask_chunks)
+    return ds
+
+
+def _merge_append_attrs(existing, new):
+    """ Merge history attributes for appended ARD
+    """
+    attrs = existing.copy()
+    history = [h for h in (existing.get('history'), new.get('history')) if h]
+    attrs['history'] = '\n'.join(history)
+    return attrs
+
+
+def _is_image_coord(name, xarr):
+    """ Return True if a variable is image metadata from the pre-ARD
+
+    See :py:func:`cedar.preard.preard_image_coords`
+    """
+    long_name = xarr.attrs.get('long_name', '')
+    return (xarr.dims == ('time', ) and
+            long_name.replace(':', '_') == name)
+
+
+#: str: NumPy dtype kinds of string data
+_STRING_KINDS = 'OUST'
+
+
+def _align_append_variables(ds, existing_vars, dest):
+    """ Align variables along "time" to those in a Zarr store appended to
+
+    Image metadata differs between orders, so metadata missing from ``ds``
+    is filled with ``NaN``, ``NaT``, or an empty string, and metadata not in
+    the store is dropped. Any other difference means the ARD was converted
+    differently, and can't be appended.
+    """
+    ds_vars = {name: ds[name] for name in ds.variables
+               if name != 'time' and 'time' in ds[name].dims}
+
+    extra = [name for name in ds_vars if name not in existing_vars]
+    missing = [name for name in existing_vars if name not in ds_vars]
+    mismatch = [name for name in extra + missing
+                if not _is_image_coord(name, ds_vars[name] if name in extra
+                                       else existing_vars[name])]
+    if mismatch:
+        raise ValueError(
+            f'Cannot append to "{dest}" because the ARD has different '
+            f'variables than it does ({", ".join(sorted(mismatch))}). Convert '
+            'the pre-ARD using the same options as the existing ARD')
+
+    if extra:
+        logger.warning(f'Not appending image metadata not in "{dest}": '
+                       f'{", ".join(extra)}')
+        ds = ds.drop_vars(extra)
+
+    coords = {}
+    for name in missing:
+        dtype = existing_vars[name].dtype
+        if dtype.kind == 'f':
+            fill = np.nan
+        elif dtype.kind == 'M':
+            fill = np.datetime64('NaT')
+        elif dtype.kind in _STRING_KINDS:
+            fill = ''
+        else:
+            raise ValueError(
+                f'Cannot append to "{dest}" because the ARD is missing image '
+                f'metadata "{name}", which has no missing value for its data '
+                f'type ({dtype})')
+        coords[name] = ('time', np.full(ds['time'].size, fill, dtype=dtype),
+                        existing_vars[name].attrs)
+
+    for name, xarr in ds_vars.items():
+        if name in extra:
+            continue
+        dtype = existing_vars[name].dtype
+        if xarr.dtype == dtype or (xarr.dtype.kind in _STRING_KINDS and
+                                   dtype.kind in _STRING_KINDS):
+            continue
+        values = xarr.values
+        with np.errstate(invalid='ignore'):
+            lossless = np.array_equal(
+                values.astype(dtype).astype(values.dtype), values)
+        if not _is_image_coord(name, xarr) or not lossless:
+            raise ValueError(
+                f'Cannot append to "{dest}" because "{name}" has a different '
+                f'data type ({xarr.dtype}) than it does ({dtype})')
+        coords[name] = ('time', values.astype(dtype), xarr.attrs)
+
+    return ds.assign_coords(**coords)
+
+
+def _convert_preard_isolated(metadata_filename, images, dest_dir_template,
+                             n_threads=None, **convert_kwds):
+    """ Run :py:func:`convert_preard`, catching and reporting any errors
+    """
+    import dask
+
+    if n_threads:
+        # Don't inherit a scheduler pool from our parent process
+        config = {'scheduler': 'threads', 'pool': None,
+                  'num_workers': n_threads}
+    else:
+        config = {}
+
+    try:
+        with dask.config.set(config):
+            return convert_preard(metadata_filename, images,
+                                  dest_dir_template, **convert_kwds)
+    except Exception as e:
+        logger.exception(f'Could not convert "{metadata_filename}"')
+        return _failed_result(metadata_filename, e)
+
+
+def _failed_group(group, exc):
+    """ Return failed results for a group of pre-ARD that couldn't be run
+    """
+    logger.error(f'Could not convert {len(group)} order(s): {exc!r}')
+    return [_failed_result(meta, exc) for meta, _ in group]
+
+
+def _failed_result(metadata_filename, exc):
+    """ Return the result of a conversion that raised ``exc``
+    """
+    return {
+        'preard': str(metadata_filename),
+        'destination': None,
+        'metadata': None,
+        'state': CONVERT_STATES.FAILED,
+        'error': ''.join(traceback.format_exception_only(type(exc), exc))
+    }
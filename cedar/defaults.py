@@ -14,7 +14,7 @@ CEDAR_ROOT_CONFIG = [
     os.getcwd()
 ]
 if 'CEDAR_ROOT_CONFIG' in os.environ:
-    CEDAR_ROOT_CONFIG.insert(0, os.environment['CEDAR_ROOT_CONFIG'])
+    CEDAR_ROOT_CONFIG.insert(0, os.environ['CEDAR_ROOT_CONFIG'])
 
 
 # =============================================================================
@@ -30,6 +30,17 @@ PREARD_PREFIX = "CEDAR_PREARD"
 PREARD_TRACKING = 'TRACKING_PERIOD{date_start}-{date_end}_TASK{today}'
 #: str: Default pre-ARD task tracking prefix/path
 PREARD_TRACKING_PREFIX = 'CEDAR_TRACKING'
+#: int: Default number of pre-ARD images created at once when submitting
+ORDER_MAX_WORKERS = 8
+#: int: Number of pre-ARD images to find dates for per Earth Engine request
+ORDER_PLAN_BATCH_SIZE = 100
+#: str: Filename of the scene inventory cache, in the first CEDAR_ROOT_CONFIG
+INVENTORY_FILENAME = 'scene_inventory.sqlite'
+#: float: Seconds before cached scene inventories expire (default: 90 days)
+INVENTORY_TTL = 90 * 24 * 60 * 60.
+#: float: Only cache scene inventories of periods ended this many seconds ago
+#:     (default: 60 days)
+INVENTORY_MIN_AGE = 60 * 24 * 60 * 60.
 
 
 EXPORT_IMAGE_STRFTIME = '%Y%m%d'
@@ -44,3 +55,43 @@ GDRIVE_USE_APPPROPERTIES = False
 # Pre-ARD Ingest
 #: dict: Chunks to use when opening Pre-ARD images
 PREARD_CHUNKS = {'y': 256, 'x': 256, 'band': -1}
+#: int: Target maximum size (in bytes) of chunks when reading Pre-ARD images
+PREARD_CHUNK_BYTES = 128 * 2 ** 20
+#: int: Estimated peak memory of a conversion task, in multiples of its chunk
+PREARD_TASK_MEMORY_FACTOR = 3
+
+
+# =============================================================================
+# ARD
+#: str: Default ARD file format ("netcdf" or "zarr")
+ARD_FORMAT = 'netcdf'
+#: dict[str, str]: ARD filename extensions for each format
+ARD_EXTENSIONS = {'netcdf': '.nc', 'zarr': '.zarr'}
+#: str: Default ARD filename template when appending orders to the same ARD
+ARD_APPEND_NAME = "{collection}_h{tile.horizontal:03d}v{tile.vertical:03d}"
+#: str: Suffix added to ARD filenames to name their manifest
+ARD_MANIFEST_SUFFIX = '.manifest.json'
+#: str: Suffix added to ARD filenames to name their profile report
+ARD_PROFILE_SUFFIX = '.profile.json'
+#: str: Suffix added to ARD filenames to name Distributed performance reports
+ARD_PROFILE_REPORT_SUFFIX = '.profile.html'
+#: str: Suffix of temporary Zarr stores written when resuming is enabled
+ARD_RESUME_SUFFIX = '.partial'
+#: str: Suffix added to temporary Zarr stores to name their checkpoint file
+ARD_CHECKPOINT_SUFFIX = '.checkpoint'
+#: str: Filename of the ARD catalog, in the first ``CEDAR_ROOT_CONFIG``
+ARD_CATALOG_FILENAME = 'ard_catalog.sqlite'
+#: float: Time slices with this fraction of valid pixels or less are "empty"
+ARD_EMPTY_THRESHOLD = 0.0
+#: str: Default compressor for Zarr format ARD
+ARD_ZARR_COMPRESSOR = 'zstd'
+#: int: Default compression level for Zarr format ARD
+ARD_ZARR_COMPLEVEL = 3
+#: int: Zarr format version of ARD stores (readable by ``zarr`` 2 and 3)
+ARD_ZARR_FORMAT = 2
+#: int: Target size (in bytes) of time-contiguous chunks when rechunking ARD
+RECHUNK_CHUNK_BYTES = 16 * 2 ** 20
+#: int: Default memory limit (in bytes) when rechunking ARD
+RECHUNK_MAX_MEM = 2 * 2 ** 30
+#: str: Filename of the index of ARD time coordinates, kept next to the ARD
+ARD_INDEX_FILENAME = '.cedar_ard_index.json'
@@ -12,3 +12,43 @@ class EmptyOrderError(ValueError):
     """ Raised when trying to submit an empty pre-ARD order
     """
     pass
+
+
+class MemoryLimitError(MemoryError):
+    """ Raised when work cannot be planned to fit within a memory limit
+    """
+    pass
+
+
+class OrderAddError(RuntimeError):
+    """ Raised when one or more pre-ARD images could not be added to an order
+
+    Parameters
+    ----------
+    errors : list[tuple[dict, Exception]]
+        Pre-ARD image requests that failed, and their errors
+    """
+    def __init__(self, errors):
+        self.errors = errors
+        msg = ''.join(f'\n    {_describe_request(request)}: {error!r}'
+                      for request, error in errors)
+        super(OrderAddError, self).__init__(
+            f'Could not add {len(errors)} pre-ARD image(s) to order:{msg}')
+
+
+class OrderEmptyCollectionError(OrderAddError, EmptyCollectionError):
+    """ Raised when pre-ARD images could not be added to an order only
+    because their image collection results were empty
+
+    This is both an :py:class:`OrderAddError` and an
+    :py:class:`EmptyCollectionError`, so either may be caught.
+    """
+    pass
+
+
+def _describe_request(request):
+    tile = request.get('tile', None)
+    tile = (f'h{tile.horizontal:03d}v{tile.vertical:03d}'
+            if hasattr(tile, 'horizontal') else tile)
+    return (f'"{request.get("collection")}" {tile} '
+            f'{request.get("date_start")} to {request.get("date_end")}')
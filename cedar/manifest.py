@@ -0,0 +1,250 @@
+""" Manifests describing the inputs and options used to create ARD
+
+A manifest is written next to each ARD output after it is converted. It
+records the size, modification time, and hash of the pre-ARD metadata and
+image(s), and the format, encoding, conversion options, and ``cedar``
+version used to convert them. When converting again, the manifest is
+compared against the current inputs and options to determine if the ARD is
+out of date ("stale").
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+from . import defaults, __version__
+
+logger = logging.getLogger(__name__)
+
+#: str: Hash algorithm used for files in manifests
+HASH_ALGORITHM = 'sha256'
+#: int: Number of bytes to read at a time when hashing files
+_HASH_BLOCKSIZE = 2 ** 20
+
+
+def manifest_filename(dest):
+    """ Return the manifest filename for an ARD file or store
+
+    Parameters
+    ----------
+    dest : str or Path
+        ARD filename
+
+    Returns
+    -------
+    Path
+        Manifest filename (e.g., "ARD.nc.manifest.json" for "ARD.nc")
+    """
+    dest = Path(dest)
+    return dest.with_name(dest.name + defaults.ARD_MANIFEST_SUFFIX)
+
+
+def create_manifest(metadata_filename, images, format=defaults.ARD_FORMAT,
+                    encoding=None, options=None):
+    """ Describe the inputs and options used to convert pre-ARD
+
+    Parameters
+    ----------
+    metadata_filename : str or Path
+        Pre-ARD image metadata filename
+    images : Sequence[str or Path]
+        Pre-ARD image filename(s)
+    format : {'netcdf', 'zarr'}, optional
+        ARD file format
+    encoding : dict, optional
+        Encoding options used for the ARD format
+    options : dict, optional
+        Other conversion options that change the ARD written (e.g.,
+        ``statistics``)
+
+    Returns
+    -------
+    dict
+        Manifest with the "cedar" version, ARD "format", "encoding",
+        conversion "options", and information about the "metadata" and
+        "images" files
+    """
+    return {
+        'cedar': __version__,
+        'format': format,
+        'encoding': _normalize(encoding),
+        'options': _normalize(options),
+        'metadata': file_info(metadata_filename),
+        'images': [file_info(image) for image in sorted(map(str, images))]
+    }
+
+
+def read_manifest(filename):
+    """ Read a manifest, returning ``None`` if it doesn't exist
+
+    Parameters
+    ----------
+    filename : str or Path
+        Manifest filename
+
+    Returns
+    -------
+    dict or None
+        Manifest, if it exists
+    """
+    filename = Path(filename)
+    if not filename.exists():
+        return None
+    with filename.open('r') as f:
+        return json.load(f)
+
+
+def write_manifest(manifest, filename):
+    """ Write a manifest, replacing any existing manifest
+
+    Parameters
+    ----------
+    manifest : dict
+        Manifest to write
+    filename : str or Path
+        Manifest filename
+    """
+    filename = Path(filename)
+    tmp = filename.with_name(filename.name + f'.tmp.{os.getpid()}')
+    with tmp.open('w') as f:
+        json.dump(manifest, f, indent=2)
+    tmp.replace(filename)
+
+
+def check_manifest(filename, metadata_filename, images,
+                   format=defaults.ARD_FORMAT, encoding=None, options=None):
+    """ Return reasons why the ARD described by a manifest is out of date
+
+    Files are only hashed when their size is the same but their
+    modification time has changed (e.g., if they were downloaded again).
+    If all files are unchanged, the manifest is updated with any new
+    modification times so they aren't hashed again next time. A different
+    ``cedar`` version does not make ARD out of date.
+
+    Parameters
+    ----------
+    filename : str or Path
+        Manifest filename
+    metadata_filename : str or Path
+        Pre-ARD image metadata filename
+    images : Sequence[str or Path]
+        Pre-ARD image filename(s)
+    format : {'netcdf', 'zarr'}, optional
+        ARD file format
+    encoding : dict, optional
+        Encoding options for the ARD format
+    options : dict, optional
+        Other conversion options that change the ARD written
+
+    Returns
+    -------
+    list[str]
+        Reasons the ARD is out of date, or an empty list if the ARD is
+        up to date
+    """
+    manifest = read_manifest(filename)
+    if manifest is None:
+        return ['no manifest']
+
+    reasons = []
+    if manifest.get('format') != format:
+        reasons.append(f'format changed from "{manifest.get("format")}"')
+    if manifest.get('encoding') != _normalize(encoding):
+        reasons.append('encoding changed')
+    previous_options = manifest.get('options', {})
+    options = _normalize(options)
+    for key in sorted(set(previous_options) | set(options)):
+        if previous_options.get(key) != options.get(key):
+            reasons.append(f'"{key}" option changed')
+
+    touched = False
+    previous = [manifest['metadata']] + manifest['images']
+    current = [metadata_filename] + sorted(map(str, images))
+    if ([Path(info['name']).name for info in previous] !=
+            [Path(f).name for f in current]):
+        reasons.append('pre-ARD files changed')
+    else:
+        for info, current_ in zip(previous, current):
+            change = _file_changed(info, current_)
+            if change is True:
+                reasons.append(f'"{Path(current_).name}" changed')
+            elif change is None:
+                touched = True
+
+    if not reasons and touched:
+        logger.debug(f'Updating modification times in manifest "{filename}"')
+        write_manifest(manifest, filename)
+
+    return reasons
+
+
+def file_info(filename, hash_=True):
+    """ Return the name, size, modification time, and hash of a file
+
+    Parameters
+    ----------
+    filename : str or Path
+        Filename
+    hash_ : bool, optional
+        Calculate the hash of the file's contents
+
+    Returns
+    -------
+    dict
+        File "name", "size", "mtime", and hash (if calculated, named after
+        :py:data:`HASH_ALGORITHM`)
+    """
+    filename = Path(filename)
+    stat = filename.stat()
+    info = {
+        'name': filename.name,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime
+    }
+    if hash_:
+        info[HASH_ALGORITHM] = hash_file(filename)
+    return info
+
+
+def hash_file(filename, algorithm=HASH_ALGORITHM):
+    """ Return the hex digest hash of a file's contents
+
+    Parameters
+    ----------
+    filename : str or Path
+        Filename
+    algorithm : str, optional
+        Name of a :py:mod:`hashlib` algorithm
+
+    Returns
+    -------
+    str
+        Hash of the file's contents
+    """
+    h = hashlib.new(algorithm)
+    with open(str(filename), 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCKSIZE), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _file_changed(info, filename):
+    """ Return True if changed, False if not, or None if only touched
+
+    Updates ``info`` with the new modification time if only touched
+    """
+    stat = Path(filename).stat()
+    if stat.st_size != info['size']:
+        return True
+    if stat.st_mtime == info['mtime']:
+        return False
+    if hash_file(filename) != info.get(HASH_ALGORITHM):
+        return True
+    info['mtime'] = stat.st_mtime
+    return None
+
+
+def _normalize(encoding):
+    # Round trip to compare with encoding read from a manifest
+    return json.loads(json.dumps(encoding or {}, sort_keys=True))
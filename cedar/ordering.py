@@ -11,14 +11,15 @@ from stems.gis.grids import Tile
 
 from . import __version__
 from . import defaults
-from .exceptions import EmptyCollectionError, EmptyOrderError
+from .exceptions import (EmptyCollectionError, EmptyOrderError,
+                         OrderAddError, OrderEmptyCollectionError)
 from .metadata import (TrackingMetadata,
                        get_order_metadata,
                        get_program_metadata,
                        get_task_metadata,
                        get_tracking_metadata)
 
-from .sensors import CREATE_ARD_COLLECTION
+from .sensors import CREATE_ARD_COLLECTION, PLAN_ARD_COLLECTION
 from .utils import EE_STATES
 
 logger = logging.getLogger(__name__)
@@ -58,7 +59,7 @@ class Order(object):
         return set([item['tile'] for item in self._items])
 
     def add(self, collection, tile, date_start, date_end, filters=None,
-            error_if_empty=False):
+            error_if_empty=False, inventory=None):
         """ Add a "pre-ARD" image to the order
 
         Parameters
@@ -75,10 +76,106 @@ class Order(object):
             Earth Engine filters to apply to image collection before
             creating image
         error_if_empty : bool, optional
-            If True, ``Order.add`` and other methods will raise an
-            EmptyCollectionError if the image collection result has no images. The
-            default behavior is to log, but skip, these empty results
+            If True, raise an EmptyCollectionError if the image collection
+            result has no images. The default behavior is to log, but skip,
+            these empty results
+        inventory : cedar.sensors.inventory.SceneInventory, optional
+            Cache of scene inventories to find the images in before asking
+            Earth Engine
 
+        """
+        self._items.append(self._create_item(
+            collection, tile, date_start, date_end,
+            filters=filters, error_if_empty=error_if_empty,
+            inventory=inventory))
+
+    def add_many(self, requests, error_if_empty=False,
+                 max_workers=defaults.ORDER_MAX_WORKERS, plan=True,
+                 batch_size=defaults.ORDER_PLAN_BATCH_SIZE, inventory=None):
+        """ Add many "pre-ARD" images to the order, creating them concurrently
+
+        Creating each image waits on several requests to Earth Engine, so
+        images are created using a pool of threads. Images are added in the
+        same order as ``requests``. If any fail, none are added and the
+        errors from every failed request are raised together.
+
+        When planning, the dates and metadata of images for all requests are
+        first found using a few batched requests (see
+        :py:data:`cedar.sensors.PLAN_ARD_COLLECTION`) instead of several
+        requests per image.
+
+        Parameters
+        ----------
+        requests : Sequence[dict]
+            Pre-ARD image requests, given as keyword arguments to
+            :py:meth:`Order.add` ("collection", "tile", "date_start",
+            "date_end", and optionally "filters")
+        error_if_empty : bool, optional
+            If True, requests whose image collection result has no images
+            fail with an EmptyCollectionError (see "Raises")
+        max_workers : int, optional
+            Number of images to create at once
+        plan : bool, optional
+            Find the dates and metadata for all images in batches before
+            creating them
+        batch_size : int, optional
+            Number of images to plan per request to Earth Engine
+        inventory : cedar.sensors.inventory.SceneInventory, optional
+            Cache of scene inventories to find the images in before asking
+            Earth Engine
+
+        Raises
+        ------
+        cedar.exceptions.OrderAddError
+            Raised if any images could not be created, listing the errors
+        cedar.exceptions.OrderEmptyCollectionError
+            Raised instead if images could not be created only because their
+            image collection results were empty. It is also an
+            EmptyCollectionError
+        """
+        requests = list(requests)
+        if not requests:
+            return
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        if plan:
+            plans = _plan_requests(requests, batch_size=batch_size,
+                                   inventory=inventory)
+        else:
+            plans = [None] * len(requests)
+
+        n_workers = max(1, min(max_workers or 1, len(requests)))
+        logger.debug(f'Creating {len(requests)} pre-ARD images using '
+                     f'{n_workers} threads')
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            futures = [
+                plan_ if isinstance(plan_, Exception) else
+                pool.submit(self._create_item, error_if_empty=error_if_empty,
+                            plan=plan_, inventory=inventory, **request)
+                for request, plan_ in zip(requests, plans)
+            ]
+
+        items, errors = [], []
+        for request, future in zip(requests, futures):
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                items.append(future.result())
+            except Exception as e:
+                logger.debug(f'Could not create pre-ARD image: {e!r}')
+                errors.append((request, e))
+
+        if errors:
+            if all(isinstance(e, EmptyCollectionError) for _, e in errors):
+                raise OrderEmptyCollectionError(errors) from errors[0][1]
+            raise OrderAddError(errors) from errors[0][1]
+        self._items.extend(items)
+
+    def _create_item(self, collection, tile, date_start, date_end,
+                     filters=None, error_if_empty=False, plan=None,
+                     inventory=None):
+        """ Create a "pre-ARD" image and its metadata as an order item
         """
         try:
             # Determine which function should be used for ARD generation
@@ -92,8 +189,12 @@ class Order(object):
         # Image is still "unbounded", but will be given crs, transform,
         # and size on export
         # ``image_metadata`` should have "bands", "nodata", "images"
+        plan_kwds = {'plan': plan} if plan is not None else {}
+        if inventory is not None:
+            plan_kwds['inventory'] = inventory
         image, image_metadata = func_create_ard(
-            collection, tile, date_start, date_end, filters=filters)
+            collection, tile, date_start, date_end, filters=filters,
+            **plan_kwds)
 
         # Create name/prefix from templates
         namespace = {
@@ -113,7 +214,7 @@ class Order(object):
                 f'{date_start}-{date_end}'
             )
 
-        self._items.append({
+        return {
             'collection': collection,
             'tile': tile,
             'name': name,
@@ -123,7 +224,7 @@ class Order(object):
             'date_start': date_start,
             'date_end': date_end,
             'filters': filters
-        })
+        }
 
     def submit(self, store, submission_info=None,
                save_empty_metadata=True,
@@ -222,6 +323,34 @@ class Order(object):
                 'date_start, date_end, tile, etc) to generate unique names.')
 
 
+def _plan_requests(requests, batch_size=defaults.ORDER_PLAN_BATCH_SIZE,
+                   inventory=None):
+    """ Plan requests in batches, grouped by the function that plans them
+
+    Returns the plan for each request, ``None`` if it can't be planned
+    (e.g., unknown collection), or the error raised while planning it.
+    """
+    groups = {}
+    for i, request in enumerate(requests):
+        func = PLAN_ARD_COLLECTION.get(request['collection'], None)
+        if func is not None:
+            groups.setdefault(func, []).append(i)
+
+    plans = [None] * len(requests)
+    for func, idx in groups.items():
+        logger.debug(f'Planning {len(idx)} pre-ARD images using {func}')
+        try:
+            plan_kwds = ({'inventory': inventory} if inventory is not None
+                         else {})
+            plans_ = func([requests[i] for i in idx], batch_size=batch_size,
+                          **plan_kwds)
+        except Exception as e:
+            plans_ = [e] * len(idx)
+        for i, plan in zip(idx, plans_):
+            plans[i] = plan
+    return plans
+
+
 def create_preard_task(image, image_metadata, name, prefix, tile, store,
                        order_info=None, export_image_kwds=None):
     """ Submit an EE pre-ARD processing task and store task info
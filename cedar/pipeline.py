@@ -0,0 +1,238 @@
+""" Download, convert, and clean "pre-ARD" orders as a streaming pipeline
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import logging
+from pathlib import Path
+
+from . import defaults
+from .convert import (CONVERT_STATES, _convert_preard_isolated,
+                      _failed_result, _make_order_pool, _share_memory_limit,
+                      create_append_name, create_dest_dir)
+from .utils import EE_STATES
+
+logger = logging.getLogger(__name__)
+
+#: tuple[str]: Conversion states that allow an order to be cleaned
+_CLEANABLE_STATES = (CONVERT_STATES.CONVERTED, CONVERT_STATES.APPENDED,
+                     CONVERT_STATES.EXISTS, CONVERT_STATES.EMPTY)
+
+
+def pipeline_tracked(tracking_info, store, download_dir, dest_dir_template,
+                     n_orders=1, n_workers=None, order_pool='processes',
+                     clean=False, keep_downloads=False, overwrite=False,
+                     **convert_kwds):
+    """ Download, convert, and (optionally) clean orders one at a time
+
+    Each order is downloaded from the ``store`` and handed off to be
+    converted as soon as all of its images and metadata are on disk, and
+    the next order is downloaded while it is converted. At most
+    ``n_orders`` are converted at once, and a downloaded order waits for a
+    conversion to finish before it is handed off and another order is
+    downloaded, so the local disk space needed is limited to about
+    ``n_orders + 1`` orders instead of all of the orders tracked.
+
+    Orders that have not finished exporting are skipped. Downloaded files
+    are deleted after an order is converted (unless ``keep_downloads``), but
+    are kept if the conversion fails so it can be retried. If a worker
+    process dies, its orders are retried one at a time in new processes.
+
+    When appending, the metadata of every order is downloaded first so
+    orders are converted in order of their start date, as each order
+    appended to an ARD must come after those already in it.
+
+    Parameters
+    ----------
+    tracking_info : dict
+        JSON tracking info data as a dict
+    store : cedar.stores.Store
+        A Store that "pre-ARD" were exported to
+    download_dir : str or Path
+        Directory to download "pre-ARD" into before converting
+    dest_dir_template : str
+        ARD destination directory template
+    n_orders : int, optional
+        Number of orders to convert at once
+    n_workers : int, optional
+        Total number of worker threads to share among the orders being
+        converted (see :py:func:`cedar.convert.convert_preard_orders`)
+    order_pool : {'processes', 'threads'}, optional
+        Convert orders in separate processes or in threads of this process
+    clean : bool, optional
+        Delete the order images and metadata from the ``store`` after an
+        order is successfully converted
+    keep_downloads : bool, optional
+        Keep the downloaded "pre-ARD" after converting instead of deleting
+    overwrite : bool, optional
+        Overwrite existing downloaded data and converted ARD
+    convert_kwds
+        Additional keyword arguments passed to
+        :py:func:`cedar.convert.convert_preard`. Any ``memory_limit`` is
+        split evenly among the orders converted at once
+
+    Yields
+    ------
+    dict
+        Conversion result for each order, in the order they complete.
+        Results also contain the "downloaded" filenames and the names of
+        any files "cleaned" from the store
+    """
+    from .tracker import clean_tracked, download_tracked
+
+    download_dir = Path(str(download_dir))
+    if convert_kwds.get('append', False):
+        append_name = convert_kwds.get('append_name',
+                                       defaults.ARD_APPEND_NAME)
+    else:
+        append_name = None
+
+    pool, n_threads = _make_order_pool(n_orders, n_workers, order_pool)
+    if n_threads:
+        convert_kwds['n_threads'] = n_threads
+    _share_memory_limit(convert_kwds, n_orders)
+    if n_orders > 1:
+        # Progress bars from concurrent orders would interleave
+        convert_kwds['progress'] = False
+
+    def restart_pool():
+        nonlocal pool
+        logger.warning('A worker process died, so starting a new pool of '
+                       'workers')
+        pool.shutdown(wait=False)
+        pool, _ = _make_order_pool(n_orders, n_workers, order_pool)
+
+    def submit(order, downloaded, key, meta, images):
+        try:
+            future = pool.submit(_convert_preard_isolated,
+                                 meta, images, dest_dir_template,
+                                 overwrite=overwrite, **convert_kwds)
+        except BrokenProcessPool:
+            restart_pool()
+            return submit(order, downloaded, key, meta, images)
+        pending[future] = (order, downloaded, key, pool, meta, images)
+
+    def finish(future):
+        order, downloaded, _, pool_, meta, images = pending.pop(future)
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            # Other orders in the pool fail too, so only restart it once
+            if pool_ is pool:
+                restart_pool()
+            result = _convert_alone(meta, images, dest_dir_template,
+                                    overwrite=overwrite, **convert_kwds)
+        except Exception as e:
+            logger.exception(f'Could not convert order "{order["name"]}"')
+            result = _failed_result(meta, e)
+        result['downloaded'] = [str(f) for f in downloaded]
+        result['cleaned'] = []
+        if result['state'] in _CLEANABLE_STATES:
+            if not keep_downloads:
+                for filename in downloaded:
+                    filename.unlink()
+            if clean:
+                for _, _, names in clean_tracked({'orders': [order]}, store):
+                    result['cleaned'].extend(names)
+        else:
+            logger.debug('Keeping downloaded pre-ARD for failed order '
+                         f'"{order["name"]}"')
+        return result
+
+    def wait_for(keep_waiting):
+        while pending and keep_waiting():
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                yield finish(future)
+
+    pending = {}
+    iter_download = download_tracked(tracking_info, store, download_dir,
+                                     overwrite=overwrite)
+    todo = []
+    for order, (id_, n_images, meta, images) in zip(
+            tracking_info['orders'], iter_download):
+        state = order['status'].get('state', None)
+        if state not in (EE_STATES.COMPLETED, EE_STATES.EMPTY):
+            logger.debug(f'Skipping order "{order["name"]}" in state '
+                         f'"{state}"')
+            yield {
+                'preard': order['name'],
+                'destination': None,
+                'metadata': None,
+                'state': CONVERT_STATES.INCOMPLETE,
+                'downloaded': [],
+                'cleaned': []
+            }
+            continue
+        todo.append((order, id_, n_images, meta, images))
+
+    # Orders appending to the same ARD must be converted in time order
+    if append_name:
+        todo = [(order, id_, n_images, _download_metadata(order, meta),
+                 images) for order, id_, n_images, meta, images in todo]
+        todo.sort(key=lambda item: _date_start(item[3][0]))
+
+    try:
+        for order, id_, n_images, meta, images in todo:
+            # Download while other orders are converted
+            logger.debug(f'Downloading output for task "{id_}" '
+                         f'({n_images or "unknown"} images)')
+            meta = _download_metadata(order, meta)
+            images = list(images)
+            downloaded = meta + images
+
+            # Limit downloaded, unconverted orders on disk
+            yield from wait_for(lambda: len(pending) >= n_orders)
+
+            # Orders appending to the same ARD can't be converted at once
+            if append_name:
+                key = _append_key(meta[0], dest_dir_template, append_name)
+                yield from wait_for(lambda: any(
+                    key == item[2] for item in pending.values()))
+            else:
+                key = None
+
+            submit(order, downloaded, key, meta[0], images)
+
+        yield from wait_for(lambda: True)
+    finally:
+        pool.shutdown()
+
+
+def _download_metadata(order, meta):
+    """ Download the metadata of an order, checking there is one file
+    """
+    meta = list(meta)
+    if len(meta) != 1:
+        raise ValueError(f'Expected to download 1 metadata file for '
+                         f'order "{order["name"]}" but got {len(meta)}')
+    return meta
+
+
+def _date_start(metadata_filename):
+    """ Return the start date of an order
+    """
+    from .preard import read_metadata
+    return read_metadata(metadata_filename)['order']['date_start']
+
+
+def _convert_alone(metadata_filename, images, dest_dir_template,
+                   **convert_kwds):
+    """ Convert an order in a new process, after its worker process died
+    """
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(_convert_preard_isolated, metadata_filename,
+                             images, dest_dir_template, **convert_kwds)
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f'Could not convert "{metadata_filename}": {e!r}')
+            return _failed_result(metadata_filename, e)
+
+
+def _append_key(metadata_filename, dest_dir_template, append_name):
+    """ Return the ARD an order will be appended to
+    """
+    from .preard import read_metadata
+    metadata = read_metadata(metadata_filename)
+    dest_dir = create_dest_dir(dest_dir_template, metadata)
+    return dest_dir.joinpath(create_append_name(append_name, metadata))
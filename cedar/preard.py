@@ -1,11 +1,13 @@
 """ Convert "pre-ARD" to ARD
 """
-from collections import defaultdict
+import bisect
 import datetime as dt
+import fnmatch
 import json
 import logging
 import os
 from pathlib import Path
+import re
 
 import numpy as np
 import pandas as pd
@@ -15,11 +17,15 @@ from stems.gis import convert, georeference, grids
 from stems.io.encoding import netcdf_encoding
 
 from . import defaults, __version__
+from . import qa
 
 logger = logging.getLogger(__name__)
 
 
-def process_preard(metadata, images, chunks=None):
+def process_preard(metadata, images, chunks=None, output_chunks=None,
+                   empty_slices=None,
+                   empty_threshold=defaults.ARD_EMPTY_THRESHOLD,
+                   statistics=False, decode_qa=False):
     """ Open and process pre-ARD data to ARD
 
     Parameters
@@ -30,13 +36,40 @@ def process_preard(metadata, images, chunks=None):
         Path(s) to pre-ARD imagery
     chunks : dict, optional
         Chunks to use when opening pre-ARD GeoTIFF files. If ``None``,
-        defaults to ``{'x': 256, 'y': 256, 'band': -1}``
+        chunks are planned from the internal tiling of the GeoTIFF files
+        and ``output_chunks`` (see
+        :py:func:`cedar.chunks.plan_preard_chunks`)
+    output_chunks : dict, optional
+        Chunks the ARD will be written with, used to plan ``chunks``
+    empty_slices : {None, 'flag', 'drop'}, optional
+        Flag time slices that are empty (all, or nearly all, NoData) using
+        coordinates calculated as the ARD is written (see
+        :py:func:`flag_empty_slices`), or drop them (see
+        :py:func:`drop_empty_slices`)
+    empty_threshold : float, optional
+        Time slices with this fraction of valid pixels, or less, are empty
+    statistics : bool, optional
+        Add the number of valid pixels, and their minimum, maximum, and mean,
+        for each band and time as coordinates calculated as the ARD is
+        written (see :py:func:`ard_statistics`)
+    decode_qa : bool, optional
+        Decode the Landsat ``pixel_qa`` band into a packed ``uint8`` mask
+        variable, "qa_mask" (see :py:func:`cedar.qa.decode_qa`)
 
     Returns
     -------
     xr.Dataset
         pre-ARD processed to (in memory) ARD format that can be written to disk
+
+    Raises
+    ------
+    ValueError
+        Raised if ``empty_slices`` is not a known option
     """
+    if empty_slices is not None and empty_slices not in _EMPTY_SLICES:
+        known = ', '.join([f'"{k}"' for k in _EMPTY_SLICES])
+        raise ValueError(f'Unknown option for empty time slices '
+                         f'"{empty_slices}". Must be one of {known}')
 
     image_metadata = metadata['image']
     # Read metadata and determine key attributes
@@ -44,6 +77,13 @@ def process_preard(metadata, images, chunks=None):
                             for images in image_metadata['images']]).values
     bands = image_metadata['bands']
 
+    # Plan chunks from file layout and output chunks
+    if chunks is None:
+        from .chunks import plan_preard_chunks, read_preard_layout
+        layout = read_preard_layout(images)
+        chunks = plan_preard_chunks(layout, len(bands),
+                                    output_chunks=output_chunks)
+
     # Create pre-ARD DataArray
     preard_da = read_preard(images, chunks=chunks)
 
@@ -53,6 +93,10 @@ def process_preard(metadata, images, chunks=None):
     # Convert to Dataset
     ard_ds = preard_to_ard(preard_da, times, bands)
 
+    # Add per-time image metadata as coordinates
+    ard_ds = ard_ds.assign_coords(
+        **preard_image_coords(image_metadata['images']))
+
     # Attach attribute metadata
     version = metadata['program']['version']
     order_metadata = metadata['order']
@@ -70,8 +114,7 @@ def process_preard(metadata, images, chunks=None):
              f'`cedar={version}`'),
              f'{dt_now} - Converted to ARD using `cedar={__version__}`'
         ]),
-        'source': f'Google Earth Engine Collection "{collection}"',
-        'images': json.dumps(image_metadata['images'])
+        'source': f'Google Earth Engine Collection "{collection}"'
     }
     ard_ds.attrs = attrs
 
@@ -79,12 +122,37 @@ def process_preard(metadata, images, chunks=None):
     tile_ = grids.Tile.from_dict(metadata['tile'])
     ard_ds = georeference(ard_ds, tile_.crs, tile_.transform)
 
+    nodata = image_metadata.get('nodata', None)
+
+    # Valid data statistics for each band and time
+    if statistics:
+        ard_ds = ard_ds.assign_coords(**ard_statistics(ard_ds, nodata=nodata))
+
+    # Flag or drop empty time slices
+    if empty_slices is not None:
+        ard_ds = _EMPTY_SLICES[empty_slices](ard_ds, nodata=nodata,
+                                             threshold=empty_threshold)
+
+    # Decode QA band into mask flags
+    if decode_qa:
+        if qa.PIXEL_QA_BAND in ard_ds.data_vars:
+            ard_ds[qa.QA_MASK_NAME] = qa.decode_qa(ard_ds[qa.PIXEL_QA_BAND],
+                                                   nodata=nodata)
+        else:
+            logger.warning(f'Not decoding QA because there is no '
+                           f'"{qa.PIXEL_QA_BAND}" band in {bands}')
+
     return ard_ds
 
 
-def find_preard(path, metadata_pattern='*.json'):
+def find_preard(path, metadata_pattern='*.json', recursive=False):
     """ Match pre-ARD metadata with imagery in some location
 
+    Image(s) for a metadata file are the GeoTIFFs in the same directory
+    whose names start with the name of the metadata file (without its
+    extension). Each directory is only listed once, so finding pre-ARD in
+    directories with many files is fast.
+
     Parameters
     ----------
     path : str or Path
@@ -93,33 +161,139 @@ def find_preard(path, metadata_pattern='*.json'):
     metadata_pattern : str, optional
         If ``path`` is a directory, this value is used as a glob inside
         ``path`` to locate metadata files
+    recursive : bool, optional
+        If ``path`` is a directory, also find pre-ARD in all directories
+        beneath it (e.g., a directory of downloaded tracking orders)
 
     Returns
     -------
-    dict[str, list[str]]
-        Pairs of metadata filename to image filename(s)
+    dict[Path, list[Path]]
+        Pairs of metadata filename to image filename(s), sorted by metadata
+        filename
     """
     path = Path(path)
     if path.is_dir():
-        metadata = list(path.glob(metadata_pattern))
+        directory, only = path, None
     else:
-        metadata = [path]
+        directory, only, recursive = path.parent, path.name, False
 
     preard = {}
-    for meta in metadata:
-        images = sorted(meta.parent.glob(meta.stem + '*.tif'))
-        if images:
-            preard[meta] = images
+    for dirpath, filenames in _scan_dirs(directory, recursive=recursive):
+        if only is None:
+            metadata = sorted(fnmatch.filter(filenames, metadata_pattern))
         else:
-            logger.debug(f'Could not find images for metadata file {meta}')
-            preard[meta] = []
+            metadata = [only]
+        images = sorted(f for f in filenames if f.endswith('.tif'))
+
+        for meta in metadata:
+            stem = Path(meta).stem
+            # Images are sorted, so all images starting with stem are
+            # together starting at where stem would be inserted
+            start = stop = bisect.bisect_left(images, stem)
+            while stop < len(images) and images[stop].startswith(stem):
+                stop += 1
+            matches = [dirpath.joinpath(img) for img in images[start:stop]]
+            if not matches:
+                logger.debug('Could not find images for metadata file '
+                             f'{dirpath.joinpath(meta)}')
+            preard[dirpath.joinpath(meta)] = matches
+
+    return dict(sorted(preard.items()))
+
+
+def _scan_dirs(path, recursive=False):
+    """ Yield directories and the names of files inside, listing each once
+    """
+    stack = [Path(path)]
+    while stack:
+        dirpath = stack.pop()
+        filenames = []
+        with os.scandir(str(dirpath)) as it:
+            for entry in it:
+                if entry.is_file():
+                    filenames.append(entry.name)
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    stack.append(dirpath.joinpath(entry.name))
+        yield dirpath, filenames
+
+
+def preard_image_coords(images):
+    """ Return image metadata for each time as typed coordinate variables
+
+    Each time may be a mosaic of more than one image (e.g., from
+    neighboring WRS-2 rows), so the metadata of the images in each time are
+    combined, depending on the metadata key rather than the type of its
+    values (Earth Engine returns all numbers as floats):
+
+    * Timestamps in milliseconds (see :py:data:`IMAGE_TIMESTAMP_KEYS`) use
+      the earliest timestamp, converted to a datetime
+    * Numeric identifiers (see :py:data:`IMAGE_ID_KEYS`) use the value of
+      the first image, as integers if possible
+    * Other numeric values (measurements like "CLOUD_COVER") are averaged
+    * String values are combined into a list of the unique values, joined
+      by ","
+
+    Metadata missing from some images is ``NaN``, ``NaT``, or an empty
+    string.
 
-    return preard
+    Parameters
+    ----------
+    images : list[list[dict]]
+        Metadata for the image(s) in each time (the "images" in pre-ARD
+        image metadata)
+
+    Returns
+    -------
+    dict[str, xr.DataArray]
+        Metadata coordinates, named after the metadata key (with ":"
+        replaced by "_", e.g., "system:id" becomes "system_id")
+    """
+    keys = []
+    for images_ in images:
+        for image in images_:
+            keys.extend(k for k in image if k not in keys)
+
+    coords = {}
+    for key in keys:
+        values = [[image[key] for image in images_
+                   if image.get(key, None) is not None]
+                  for images_ in images]
+        flat = [v for v_ in values for v in v_]
+        numeric = bool(flat) and all(
+            isinstance(v, (int, float)) and not isinstance(v, bool)
+            for v in flat)
+
+        if numeric and key in IMAGE_TIMESTAMP_KEYS:
+            data = pd.to_datetime([min(v_) if v_ else np.nan
+                                   for v_ in values], unit='ms').values
+        elif numeric and key in IMAGE_ID_KEYS:
+            data = np.array([v_[0] if v_ else np.nan for v_ in values],
+                            dtype=np.float64)
+            if not np.isnan(data).any() and (data == np.round(data)).all():
+                data = data.astype(np.int64)
+        elif numeric:
+            data = np.array([np.mean(v_) if v_ else np.nan
+                             for v_ in values], dtype=np.float64)
+        else:
+            data = np.array([','.join(dict.fromkeys(str(v) for v in v_))
+                             for v_ in values], dtype=object)
+
+        name = key.replace(':', '_')
+        coords[name] = xr.DataArray(data, dims=('time', ),
+                                    attrs={'long_name': key})
+
+    return coords
 
 
 def preard_to_ard(xarr, time, bands):
     """ Convert a "pre-ARD" DataArray to an ARD xr.Dataset
 
+    The "band" dimension of pre-ARD contains all bands of the first
+    observation, followed by all bands of the second, and so on. It is
+    reshaped into separate "time" and "band" dimensions without copying
+    (or, for Dask arrays, without re-reading) the data, and then each band
+    is selected as a simple slice.
+
     Parameters
     ----------
     xarr : xarray.DataArray
@@ -143,24 +317,229 @@ def preard_to_ard(xarr, time, bands):
     """
     n_band = len(bands)
     n_time = len(time)
-    n_band_time = n_band * n_time
 
     if n_band * n_time != xarr.band.size:
         raise ValueError('Number of bands x time specified does not match '
-                         'input data ({xarr.band.size})')
+                         f'input data ({xarr.band.size})')
+
+    dims = [dim for dim in xarr.dims if dim != 'band']
+    data = xarr.transpose('band', *dims).data
+
+    # Keep each time step's bands within one chunk so reshaping is cheap
+    chunks = getattr(data, 'chunks', None)
+    if chunks and any(c % n_band for c in chunks[0][:-1]):
+        n_time_chunk = max(1, chunks[0][0] // n_band)
+        data = data.rechunk({0: n_time_chunk * n_band})
+
+    # (band x time, ...) -> (time, band, ...)
+    data = data.reshape((n_time, n_band) + data.shape[1:])
+
+    coords = {'time': time}
+    coords.update({
+        name: coord for name, coord in xarr.coords.items()
+        if 'band' not in coord.dims
+    })
 
     ds_bands = {}
     for i_band, band_name in enumerate(bands):
-        # Select out this band from list of band x time
-        da_band = xarr[np.arange(i_band, n_band_time, n_band), ...]
-        # Replace "band" for "time" in two steps
-        da_band.coords['time'] = ('band', time)
-        ds_bands[band_name] = da_band.swap_dims({'band': 'time'}).drop('band')
+        ds_bands[band_name] = xr.DataArray(data[:, i_band, ...],
+                                           dims=['time'] + dims,
+                                           coords=coords,
+                                           attrs=xarr.attrs)
 
     ard_ds = xr.Dataset(ds_bands)
     return ard_ds
 
 
+def valid_fraction(ard_ds, nodata=None):
+    """ Return the fraction of pixels in each time slice that are valid
+
+    A pixel is valid if any band is not NoData.
+
+    Parameters
+    ----------
+    ard_ds : xr.Dataset
+        ARD as a XArray Dataset
+    nodata : int or float, optional
+        NoData value. If ``None``, NaN values are NoData
+
+    Returns
+    -------
+    xr.DataArray
+        Fraction of valid pixels in each time slice. Calculated lazily if
+        ``ard_ds`` contains Dask arrays
+    """
+    valid = None
+    for var in ard_ds.data_vars:
+        xarr = ard_ds[var]
+        if qa.is_flag_variable(xarr):
+            continue
+        valid_ = xarr.notnull() if nodata is None else xarr != nodata
+        valid = valid_ if valid is None else valid | valid_
+
+    dims = [dim for dim in valid.dims if dim != 'time']
+    frac = valid.mean(dim=dims).astype(np.float32)
+    frac.attrs = {'long_name': 'Fraction of valid pixels'}
+    return frac
+
+
+def ard_statistics(ard_ds, nodata=None):
+    """ Return statistics of the valid pixels in each band and time slice
+
+    If ``ard_ds`` contains Dask arrays, the statistics are calculated lazily
+    so they are computed from the same chunks as the ARD when it is written,
+    without reading the pre-ARD again. Integer data are not converted to
+    floating point to calculate them.
+
+    Parameters
+    ----------
+    ard_ds : xr.Dataset
+        ARD as a XArray Dataset
+    nodata : int or float, optional
+        NoData value. If ``None``, NaN values are NoData
+
+    Returns
+    -------
+    dict[str, xr.DataArray]
+        Number of valid pixels ("{band}_count"), and their minimum
+        ("{band}_min"), maximum ("{band}_max"), and mean ("{band}_mean")
+        along "time" for each band. The minimum, maximum, and mean are
+        ``NaN`` for time slices without valid pixels
+    """
+    stats = {}
+    for var in ard_ds.data_vars:
+        xarr = ard_ds[var]
+        if qa.is_flag_variable(xarr):
+            continue
+        dims = [dim for dim in xarr.dims if dim != 'time']
+        valid = xarr.notnull() if nodata is None else xarr != nodata
+
+        count = valid.sum(dim=dims)
+        if np.issubdtype(xarr.dtype, np.integer):
+            info = np.iinfo(xarr.dtype)
+            min_ = xarr.where(valid, info.max).min(dim=dims)
+            max_ = xarr.where(valid, info.min).max(dim=dims)
+            total = xarr.where(valid, 0).sum(dim=dims, dtype=np.int64)
+        else:
+            xarr_ = xarr.where(valid)
+            min_, max_ = xarr_.min(dim=dims), xarr_.max(dim=dims)
+            total = xarr_.sum(dim=dims)
+
+        has_valid = count > 0
+        for stat, data, desc in (
+                ('count', count, 'Number of valid'),
+                ('min', min_.where(has_valid), 'Minimum of valid'),
+                ('max', max_.where(has_valid), 'Maximum of valid'),
+                ('mean', (total / count).where(has_valid), 'Mean of valid')):
+            data.attrs = {'long_name': f'{desc} "{var}" pixels'}
+            stats[f'{var}_{stat}'] = data
+
+    return stats
+
+
+def flag_empty_slices(ard_ds, nodata=None,
+                      threshold=defaults.ARD_EMPTY_THRESHOLD):
+    """ Add coordinates describing if each time slice is empty
+
+    If ``ard_ds`` contains Dask arrays, the coordinates are calculated
+    lazily so they are computed from the same chunks as the ARD when it is
+    written, without reading the pre-ARD again.
+
+    Parameters
+    ----------
+    ard_ds : xr.Dataset
+        ARD as a XArray Dataset
+    nodata : int or float, optional
+        NoData value. If ``None``, NaN values are NoData
+    threshold : float, optional
+        Time slices with this fraction of valid pixels, or less, are empty
+
+    Returns
+    -------
+    xr.Dataset
+        ARD with the fraction of valid pixels ("valid_fraction") and if
+        each time slice is empty ("empty") as coordinates along "time"
+    """
+    frac = valid_fraction(ard_ds, nodata=nodata)
+    empty = frac <= threshold
+    empty.attrs = {'long_name': 'Time slice is empty',
+                   'empty_threshold': threshold}
+    return ard_ds.assign_coords(valid_fraction=frac, empty=empty)
+
+
+def drop_empty_slices(ard_ds, nodata=None,
+                      threshold=defaults.ARD_EMPTY_THRESHOLD):
+    """ Drop time slices that are empty
+
+    The fraction of valid pixels must be known before the ARD is written,
+    so it is computed immediately. This reads the pre-ARD one extra time
+    (use :py:func:`flag_empty_slices` to avoid this).
+
+    Parameters
+    ----------
+    ard_ds : xr.Dataset
+        ARD as a XArray Dataset
+    nodata : int or float, optional
+        NoData value. If ``None``, NaN values are NoData
+    threshold : float, optional
+        Time slices with this fraction of valid pixels, or less, are empty
+
+    Returns
+    -------
+    xr.Dataset
+        ARD without empty time slices, with the fraction of valid pixels
+        ("valid_fraction") as a coordinate along "time"
+    """
+    frac = valid_fraction(ard_ds, nodata=nodata).compute()
+    keep = (frac > threshold).values
+    n_empty = int((~keep).sum())
+    if n_empty:
+        logger.info(f'Dropping {n_empty} of {keep.size} time slices with '
+                    f'{threshold:.0%} or fewer valid pixels')
+    return ard_ds.assign_coords(valid_fraction=frac).isel(time=keep)
+
+
+_EMPTY_SLICES = {
+    'flag': flag_empty_slices,
+    'drop': drop_empty_slices
+}
+
+
+def ard_encoding(ard_ds, metadata, format=defaults.ARD_FORMAT,
+                 **encoding_kwds):
+    """ Return encoding for ARD in some format
+
+    Parameters
+    ----------
+    ard_ds : xr.Dataset
+        ARD as a XArray Dataset
+    metadata : dict
+        Metadata about ARD
+    format : {'netcdf', 'zarr'}, optional
+        ARD file format
+    encoding_kwds
+        Additional encoding options for the format (see
+        :py:func:`ard_netcdf_encoding` and :py:func:`ard_zarr_encoding`)
+
+    Returns
+    -------
+    dict
+        Encoding to use when writing ``ard_ds``
+
+    Raises
+    ------
+    KeyError
+        Raised if the format is unknown
+    """
+    try:
+        func = _ARD_ENCODINGS[format]
+    except KeyError:
+        known = ', '.join([f'"{k}"' for k in _ARD_ENCODINGS])
+        raise KeyError(f'Unknown ARD format "{format}". Must be one of '
+                       f'{known}')
+    return func(ard_ds, metadata, **encoding_kwds)
+
+
 def ard_netcdf_encoding(ard_ds, metadata, **encoding_kwds):
     """ Return encoding for ARD NetCDF4 files
 
@@ -178,10 +557,175 @@ def ard_netcdf_encoding(ard_ds, metadata, **encoding_kwds):
     """
     assert 'nodata' not in encoding_kwds
     nodata = metadata['image'].get('nodata', None)
+    # Flags (e.g., QA masks) don't have NoData
+    nodata = {var: None if qa.is_flag_variable(ard_ds[var]) else nodata
+              for var in ard_ds.data_vars}
     encoding = netcdf_encoding(ard_ds, nodata=nodata, **encoding_kwds)
     return encoding
 
 
+def ard_zarr_encoding(ard_ds, metadata, chunks=None,
+                      compressor=defaults.ARD_ZARR_COMPRESSOR,
+                      complevel=defaults.ARD_ZARR_COMPLEVEL,
+                      **encoding_kwds):
+    """ Return encoding for ARD Zarr stores
+
+    Parameters
+    ----------
+    ard_ds : xr.Dataset
+        ARD as a XArray Dataset
+    metadata : dict
+        Metadata about ARD
+    chunks : dict, optional
+        Chunksizes to store in Zarr, mapping dimension name to chunk size.
+        Dimensions not given are stored in one chunk. If ``None``, uses
+        the chunks of each variable in ``ard_ds``
+    compressor : str or numcodecs.abc.Codec, optional
+        Compressor to use, either by name (see
+        :py:data:`ZARR_COMPRESSORS`) or as a ``numcodecs`` codec. Pass
+        ``None`` to store uncompressed data
+    complevel : int, optional
+        Compression level, if the compressor is given by name
+    encoding_kwds
+        Additional encoding data to pass for all variables. NetCDF4
+        specific options (e.g., ``zlib``) are ignored
+
+    Returns
+    -------
+    dict
+        Zarr encoding to use with :py:meth:`xarray.Dataset.to_zarr`
+    """
+    from stems.io.encoding import (encoding_chunksizes, guard_chunksizes,
+                                   guard_dtype)
+
+    assert 'nodata' not in encoding_kwds
+    nodata = metadata['image'].get('nodata', None)
+
+    for key in _NETCDF_ENCODING_KEYS.intersection(encoding_kwds):
+        logger.debug(f'Ignoring NetCDF4 encoding option "{key}" for Zarr')
+        encoding_kwds.pop(key)
+
+    if isinstance(compressor, str):
+        compressor = zarr_compressor(compressor, complevel)
+
+    encoding = {}
+    for var in ard_ds.data_vars:
+        xarr = ard_ds[var]
+        var_encoding = guard_dtype(xarr, {'dtype': xarr.dtype})
+
+        chunks_ = encoding_chunksizes(xarr, chunks=chunks)
+        if chunks_:
+            var_encoding['chunks'] = guard_chunksizes(xarr, chunks_)
+
+        if nodata is not None and not qa.is_flag_variable(xarr):
+            var_encoding['_FillValue'] = nodata
+        var_encoding.update(zarr_compressor_encoding(compressor))
+        var_encoding.update(encoding_kwds)
+
+        encoding[var] = var_encoding
+
+    return encoding
+
+
+def zarr_compressor(name, complevel=defaults.ARD_ZARR_COMPLEVEL):
+    """ Return a ``numcodecs`` compressor by name
+
+    Parameters
+    ----------
+    name : str
+        Compressor name (see :py:data:`ZARR_COMPRESSORS`)
+    complevel : int, optional
+        Compression level
+
+    Returns
+    -------
+    numcodecs.abc.Codec or None
+        Compressor, or ``None`` if ``name`` is "none"
+    """
+    try:
+        func = ZARR_COMPRESSORS[name.lower()]
+    except KeyError:
+        known = ', '.join([f'"{k}"' for k in ZARR_COMPRESSORS])
+        raise KeyError(f'Unknown Zarr compressor "{name}". Must be one of '
+                       f'{known}')
+    return func(complevel)
+
+
+def zarr_compressor_encoding(compressor):
+    """ Return the encoding that sets the compressor of a Zarr variable
+
+    ARD are written as Zarr format 2 stores (see
+    :py:func:`zarr_format_kwds`), whose compressor is given as
+    "compressor" by ``zarr<3`` and as "compressors" by ``zarr>=3``.
+
+    Parameters
+    ----------
+    compressor : numcodecs.abc.Codec or None
+        Compressor, or ``None`` to store uncompressed data
+
+    Returns
+    -------
+    dict
+        Encoding for the installed version of ``zarr``
+    """
+    if _zarr_major_version() >= 3:
+        return {'compressors': [compressor] if compressor else None}
+    return {'compressor': compressor}
+
+
+def zarr_format_kwds():
+    """ Return keyword arguments to ``to_zarr`` for creating ARD stores
+
+    ``zarr>=3`` creates Zarr format 3 stores by default, so it is asked for
+    :py:data:`cedar.defaults.ARD_ZARR_FORMAT` stores instead. ``zarr<3``
+    only creates Zarr format 2 stores.
+
+    Returns
+    -------
+    dict
+        Keyword arguments for :py:meth:`xarray.Dataset.to_zarr`
+    """
+    if _zarr_major_version() >= 3:
+        return {'zarr_format': defaults.ARD_ZARR_FORMAT}
+    return {}
+
+
+def _zarr_major_version():
+    import zarr
+    return int(zarr.__version__.split('.')[0])
+
+
+def _blosc(cname):
+    def inner(complevel):
+        from numcodecs import Blosc
+        return Blosc(cname=cname, clevel=complevel, shuffle=Blosc.SHUFFLE)
+    return inner
+
+
+def _zlib(complevel):
+    from numcodecs import Zlib
+    return Zlib(level=complevel)
+
+
+#: dict[str, callable]: Zarr compressors by name, created from a
+#: compression level
+ZARR_COMPRESSORS = {
+    'zstd': _blosc('zstd'),
+    'lz4': _blosc('lz4'),
+    'blosc': _blosc('lz4'),
+    'zlib': _zlib,
+    'none': lambda complevel: None
+}
+
+_ARD_ENCODINGS = {
+    'netcdf': ard_netcdf_encoding,
+    'zarr': ard_zarr_encoding
+}
+
+_NETCDF_ENCODING_KEYS = set(['zlib', 'shuffle', 'fletcher32', 'contiguous',
+                             'chunksizes'])
+
+
 def read_metadata(filename):
     """ Read pre-ARD image metadata from a file
     """
@@ -193,6 +737,10 @@ def read_metadata(filename):
 def read_preard(filenames, chunks=None):
     """ Read pre-ARD file(s) into a single DataArray
 
+    The pre-ARD file(s) are read as one mosaic, without opening each file
+    as a separate array. Each chunk of the returned DataArray is read in a
+    single task from the file(s) it overlaps.
+
     Parameters
     ----------
     filenames : Sequence[str or Path]
@@ -206,6 +754,10 @@ def read_preard(filenames, chunks=None):
     xr.DataArray
         Pre-ARD joined together as a single DataArray
     """
+    import dask.array as da
+    from dask.array.core import normalize_chunks
+    from dask.base import tokenize
+
     if isinstance(filenames, (str, Path)):
         filenames = (filenames, )
     filenames = [Path(f) for f in filenames]
@@ -213,26 +765,179 @@ def read_preard(filenames, chunks=None):
     if chunks is None:
         chunks = defaults.PREARD_CHUNKS.copy()
 
-    common = os.path.commonprefix([f.stem for f in filenames])
+    mosaic = index_preard_shards(filenames)
+    shape = (mosaic['count'], mosaic['height'], mosaic['width'])
+    dtype = np.dtype(mosaic['dtype'])
+
+    chunks_ = normalize_chunks(
+        tuple(chunks.get(dim, -1) for dim in ('band', 'y', 'x')),
+        shape=shape, dtype=dtype
+    )
+
+    # One task per chunk, reading from only the shard(s) it overlaps
+    name = 'read-preard-' + tokenize(filenames, chunks_)
+    band_slices, y_slices, x_slices = [_chunk_slices(c) for c in chunks_]
+    dsk = {}
+    for i, ys in enumerate(y_slices):
+        for j, xs in enumerate(x_slices):
+            shards = [
+                shard for shard in mosaic['shards'] if
+                shard['row_off'] < ys.stop and
+                shard['row_off'] + shard['height'] > ys.start and
+                shard['col_off'] < xs.stop and
+                shard['col_off'] + shard['width'] > xs.start
+            ]
+            for k, bs in enumerate(band_slices):
+                dsk[(name, k, i, j)] = (_read_mosaic_window, shards,
+                                        bs, ys, xs, dtype, mosaic['nodata'])
+    data = da.Array(dsk, name, chunks_, dtype)
+
+    transform = mosaic['transform']
+    coords = {
+        'band': np.arange(1, mosaic['count'] + 1),
+        'y': transform.f + (np.arange(mosaic['height']) + 0.5) * transform.e,
+        'x': transform.c + (np.arange(mosaic['width']) + 0.5) * transform.a
+    }
+    attrs = {
+        'transform': tuple(transform)[:6],
+        'crs': mosaic['crs']
+    }
+    preard = xr.DataArray(data, dims=('band', 'y', 'x'), coords=coords,
+                          attrs=attrs)
 
-    by_row = defaultdict(list)
+    return preard
+
+
+def index_preard_shards(filenames):
+    """ Locate each pre-ARD file ("shard") within the mosaic of all shards
+
+    Shard offsets are parsed from the "-{ymin}-{xmin}" suffix Earth Engine
+    appends to filenames when splitting up exports, or otherwise calculated
+    from the GeoTIFF geotransform.
+
+    Parameters
+    ----------
+    filenames : Sequence[str or Path]
+        Pre-ARD file name(s)
+
+    Returns
+    -------
+    dict
+        Mosaic "height", "width", band "count", "dtype", "nodata", "crs",
+        and "transform", and a list of "shards" with the "path", "row_off",
+        "col_off", "height", and "width" of each file
+    """
+    import rasterio
+    from affine import Affine
+
+    shards, profiles = [], []
     for fname in filenames:
-        shard = fname.stem[len(common):]
-        if not shard:  # OK if just 1 file
-            assert len(filenames) == 1
-            ymin, xmin = 0, 0
-        else:
-            ymin, xmin = map(int, shard.split('-'))
-        da = xr.open_rasterio(fname, chunks=chunks)
-        by_row[ymin].append(da)
+        with rasterio.open(str(fname), 'r') as src:
+            profiles.append({
+                'count': src.count,
+                'dtype': src.dtypes[0],
+                'nodata': src.nodata,
+                'crs': src.crs.to_wkt() if src.crs else None,
+                'transform': src.transform
+            })
+            shards.append({
+                'path': str(fname),
+                'height': src.height,
+                'width': src.width,
+                'offset': _parse_shard_offset(fname)
+            })
+
+    # Mosaic upper left from shard offsets or from the geotransforms
+    transforms = [p['transform'] for p in profiles]
+    if all(shard['offset'] is not None for shard in shards):
+        for shard in shards:
+            shard['row_off'], shard['col_off'] = shard.pop('offset')
+        ulx, uly = transforms[0] * (-shards[0]['col_off'],
+                                    -shards[0]['row_off'])
+    else:
+        logger.debug('Locating pre-ARD shards using their geotransforms')
+        ulx = min(t.c for t in transforms)
+        uly = max(t.f for t in transforms)
+        for shard, t in zip(shards, transforms):
+            shard.pop('offset')
+            shard['col_off'] = int(round((t.c - ulx) / t.a))
+            shard['row_off'] = int(round((t.f - uly) / t.e))
+
+    for key in ('count', 'dtype', 'crs'):
+        if len(set(p[key] for p in profiles)) != 1:
+            raise ValueError(f'Pre-ARD shards do not share the same "{key}"')
+
+    t = transforms[0]
+    transform = Affine(t.a, t.b, ulx, t.d, t.e, uly)
+    mosaic = {
+        'height': max(s['row_off'] + s['height'] for s in shards),
+        'width': max(s['col_off'] + s['width'] for s in shards),
+        'count': profiles[0]['count'],
+        'dtype': profiles[0]['dtype'],
+        'nodata': profiles[0]['nodata'],
+        'crs': profiles[0]['crs'],
+        'transform': transform,
+        'shards': shards
+    }
+    return mosaic
+
 
-    # Concat across columns
-    rows = {row: xr.concat(by_row[row], dim='x') for row in by_row}
+def _parse_shard_offset(filename):
+    """ Return (ymin, xmin) pixel offsets from a shard filename, or None
+    """
+    match = _RE_SHARD_OFFSET.search(Path(filename).stem)
+    if match:
+        return tuple(map(int, match.groups()))
+    return None
 
-    # Concat across rows
-    preard = xr.concat(rows.values(), dim='y')
 
-    return preard
+def _chunk_slices(chunks):
+    """ Return slices for each chunk along one dimension
+    """
+    edges = np.cumsum((0, ) + tuple(chunks))
+    return [slice(int(start), int(stop))
+            for start, stop in zip(edges[:-1], edges[1:])]
+
+
+def _read_mosaic_window(shards, bands, rows, cols, dtype, nodata=None):
+    """ Read a window of the mosaic of pre-ARD shards
+    """
+    import rasterio
+    from rasterio.windows import Window
+
+    out = np.full((bands.stop - bands.start,
+                   rows.stop - rows.start,
+                   cols.stop - cols.start),
+                  nodata if nodata is not None else 0, dtype=dtype)
+    indexes = list(range(bands.start + 1, bands.stop + 1))
+
+    for shard in shards:
+        # Overlap in mosaic coordinates
+        r0 = max(rows.start, shard['row_off'])
+        r1 = min(rows.stop, shard['row_off'] + shard['height'])
+        c0 = max(cols.start, shard['col_off'])
+        c1 = min(cols.stop, shard['col_off'] + shard['width'])
+        window = Window(c0 - shard['col_off'], r0 - shard['row_off'],
+                        c1 - c0, r1 - r0)
+        with rasterio.open(shard['path'], 'r') as src:
+            out[:, r0 - rows.start:r1 - rows.start,
+                c0 - cols.start:c1 - cols.start] = src.read(indexes,
+                                                            window=window)
+
+    return out
+
+
+#: re.Pattern: Shard offsets ("-{ymin}-{xmin}") in pre-ARD filenames
+_RE_SHARD_OFFSET = re.compile(r'-(\d{10})-(\d{10})$')
+
+
+#: set[str]: Image metadata keys containing timestamps (in milliseconds)
+IMAGE_TIMESTAMP_KEYS = {'system:time_start', 'system:time_end',
+                        'LEVEL1_PRODUCTION_DATE'}
+#: set[str]: Image metadata keys identifying each image or scene, which
+#: are not averaged when images are mosaicked
+IMAGE_ID_KEYS = {'WRS_PATH', 'WRS_ROW', 'system:id', 'system:index',
+                 'system:version', 'LANDSAT_ID', 'SATELLITE'}
 
 
 def _ard_image_timestamp(images):
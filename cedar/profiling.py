@@ -0,0 +1,246 @@
+""" Profile where time, memory, and I/O go when converting pre-ARD
+"""
+from collections import OrderedDict
+import contextlib
+import datetime as dt
+import json
+import logging
+import os
+from pathlib import Path
+import time
+
+from . import defaults, __version__
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionProfiler(object):
+    """ Record stage timings, Dask profiles, and I/O for converting an order
+
+    When not ``enabled``, all methods do nothing so the profiler can be used
+    unconditionally.
+
+    Parameters
+    ----------
+    name : str
+        Name of what is being profiled (e.g., the order name)
+    enabled : bool, optional
+        Record profiling information, or not
+
+    Attributes
+    ----------
+    stages : OrderedDict[str, dict]
+        Wall clock and CPU time, in seconds, of each stage
+    tasks : dict[str, dict]
+        Number of tasks and time spent computing tasks, grouped by their
+        Dask key name prefix (e.g., "read-preard" for reading GeoTIFFs)
+    resources : list[dict]
+        Memory (MB) and CPU (%) sampled while computing (requires
+        ``psutil``)
+    io : dict
+        Number of bytes read and written
+    performance_report : str
+        Filename of a Distributed performance report, if computation was
+        run on a Distributed cluster
+    """
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self.stages = OrderedDict()
+        self.tasks = {}
+        self.resources = []
+        self.io = {'bytes_read': 0, 'bytes_written': 0}
+        self.performance_report = None
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """ Time a stage of conversion
+
+        Parameters
+        ----------
+        name : str
+            Stage name
+        """
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.stages[name] = {
+                'wall': time.perf_counter() - wall,
+                'cpu': time.process_time() - cpu
+            }
+            logger.debug(f'Stage "{name}" of "{self.name}" took '
+                         f'{self.stages[name]["wall"]:.3f}s')
+
+    @contextlib.contextmanager
+    def compute(self, report_filename):
+        """ Profile Dask computation
+
+        Uses the Dask diagnostic profilers with local schedulers, or
+        creates a Distributed performance report (HTML) if a Distributed
+        client is being used.
+
+        Parameters
+        ----------
+        report_filename : str or Path
+            Filename for a Distributed performance report, if used
+        """
+        if not self.enabled:
+            yield
+            return
+
+        client = _get_distributed_client()
+        if client is not None:
+            from distributed import performance_report
+            with performance_report(filename=str(report_filename)):
+                yield
+            self.performance_report = str(report_filename)
+            return
+
+        from dask.diagnostics import Profiler
+        profilers = [Profiler()]
+        try:
+            import psutil  # noqa: F401
+        except ImportError:
+            logger.debug('Not profiling memory or CPU use because `psutil` '
+                         'is not installed')
+        else:
+            from dask.diagnostics import ResourceProfiler
+            profilers.append(ResourceProfiler(dt=1))
+
+        with contextlib.ExitStack() as stack:
+            for profiler in profilers:
+                stack.enter_context(profiler)
+            yield
+
+        self._add_tasks(profilers[0].results)
+        if len(profilers) > 1:
+            results = profilers[1].results
+            t0 = results[0].time if results else 0
+            self.resources.extend({'time': r.time - t0, 'mem': r.mem,
+                                   'cpu': r.cpu} for r in results)
+
+    def read(self, filenames):
+        """ Record files read
+
+        Parameters
+        ----------
+        filenames : Sequence[str or Path]
+            Files read
+        """
+        if self.enabled:
+            self.io['bytes_read'] += sum(_size(f) for f in filenames)
+
+    def written(self, filename):
+        """ Record a file or directory written
+
+        Parameters
+        ----------
+        filename : str or Path
+            File or directory (e.g., Zarr store) written
+        """
+        if self.enabled:
+            self.io['bytes_written'] += _size(filename)
+
+    def to_dict(self):
+        """ Return the profile as a dict
+
+        Returns
+        -------
+        dict
+            Profile information
+        """
+        return {
+            'name': self.name,
+            'cedar': __version__,
+            'created': dt.datetime.now().isoformat(),
+            'total': time.perf_counter() - self._start,
+            'stages': self.stages,
+            'tasks': self.tasks,
+            'resources': self.resources,
+            'peak_rss': _peak_rss(),
+            'io': self.io,
+            'performance_report': self.performance_report
+        }
+
+    def write(self, filename):
+        """ Write the profile as JSON
+
+        Parameters
+        ----------
+        filename : str or Path
+            Profile report filename
+
+        Returns
+        -------
+        str
+            Profile report filename
+        """
+        with open(str(filename), 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return str(filename)
+
+    def _add_tasks(self, results):
+        from dask.utils import key_split
+        for task in results:
+            prefix = key_split(task.key)
+            info = self.tasks.setdefault(prefix, {'n': 0, 'time': 0.})
+            info['n'] += 1
+            info['time'] += task.end_time - task.start_time
+
+
+def profile_filenames(dest):
+    """ Return the profile report filenames for an ARD file or store
+
+    Parameters
+    ----------
+    dest : str or Path
+        ARD filename
+
+    Returns
+    -------
+    Path
+        Profile report filename (e.g., "ARD.nc.profile.json" for "ARD.nc")
+    Path
+        Distributed performance report filename (e.g.,
+        "ARD.nc.profile.html" for "ARD.nc")
+    """
+    dest = Path(dest)
+    return (dest.with_name(dest.name + defaults.ARD_PROFILE_SUFFIX),
+            dest.with_name(dest.name + defaults.ARD_PROFILE_REPORT_SUFFIX))
+
+
+def _get_distributed_client():
+    try:
+        from distributed import default_client
+    except ImportError:
+        return None
+    try:
+        return default_client()
+    except ValueError:  # no client
+        return None
+
+
+def _size(filename):
+    filename = Path(filename)
+    if filename.is_dir():
+        return sum(_size(f) for f in filename.iterdir())
+    elif filename.exists():
+        return filename.stat().st_size
+    return 0
+
+
+def _peak_rss():
+    """ Return peak resident memory (MB) of this process, if known
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return rss / 2 ** 20 if os.uname().sysname == 'Darwin' else rss / 2 ** 10
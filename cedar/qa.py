@@ -0,0 +1,157 @@
+""" Decode quality assessment (QA) bands into compact mask layers
+
+Landsat Collection 1 Surface Reflectance products include a ``pixel_qa``
+band that stores several flags (e.g., cloud, cloud shadow) as bits. Instead
+of every user of the ARD decoding these bits, ``pixel_qa`` can be decoded
+once while converting pre-ARD into a single ``uint8`` mask variable with one
+bit per flag, described using the CF conventions ``flag_masks`` and
+``flag_meanings`` attributes. Decoding uses a lookup table indexed by the
+QA value, so each pixel takes one array lookup regardless of the number of
+flags.
+"""
+from collections import OrderedDict
+import logging
+
+import numpy as np
+import xarray as xr
+
+logger = logging.getLogger(__name__)
+
+#: str: Name of the Landsat QA band
+PIXEL_QA_BAND = 'pixel_qa'
+
+#: str: Name of the decoded QA mask variable
+QA_MASK_NAME = 'qa_mask'
+
+#: OrderedDict[str, tuple[int, int, int]]: Landsat Collection 1 ``pixel_qa``
+#:     flags, given as the (bit offset, number of bits, value) that must be
+#:     present in the QA band. Each flag is stored in the mask as a bit, in
+#:     this order
+PIXEL_QA_FLAGS = OrderedDict((
+    ('fill', (0, 1, 1)),
+    ('clear', (1, 1, 1)),
+    ('water', (2, 1, 1)),
+    ('cloud_shadow', (3, 1, 1)),
+    ('snow', (4, 1, 1)),
+    ('cloud', (5, 1, 1)),
+    ('cloud_high_confidence', (6, 2, 3)),
+    ('cirrus_high_confidence', (8, 2, 3)),
+))
+
+
+def qa_lookup_table(flags=PIXEL_QA_FLAGS, nbits=16):
+    """ Return a lookup table from QA values to packed flags
+
+    Parameters
+    ----------
+    flags : dict[str, tuple[int, int, int]], optional
+        Flags, given as the (bit offset, number of bits, value) that must be
+        present in the QA band, in the order they are packed
+    nbits : int, optional
+        Number of bits in the QA band
+
+    Returns
+    -------
+    np.ndarray
+        Packed flags (``uint8``) for every possible QA value (as unsigned
+        integers)
+
+    Raises
+    ------
+    ValueError
+        Raised if there are too many flags to pack into ``uint8``
+    """
+    if len(flags) > 8:
+        raise ValueError(f'Cannot pack {len(flags)} flags into "uint8"')
+
+    qa = np.arange(2 ** nbits, dtype=np.uint32)
+    lut = np.zeros(qa.size, dtype=np.uint8)
+    for i, (offset, n, value) in enumerate(flags.values()):
+        match = ((qa >> offset) & (2 ** n - 1)) == value
+        lut |= (match.astype(np.uint8) << i)
+    return lut
+
+
+def decode_qa(xarr, nodata=None, flags=PIXEL_QA_FLAGS, nbits=16):
+    """ Decode a QA band into a packed ``uint8`` mask of flags
+
+    Parameters
+    ----------
+    xarr : xr.DataArray
+        QA band (e.g., Landsat ``pixel_qa``), as integers
+    nodata : int, optional
+        NoData value of the QA band. NoData pixels only have the first flag
+        ("fill") set
+    flags : dict[str, tuple[int, int, int]], optional
+        Flags to decode (see :py:data:`PIXEL_QA_FLAGS`)
+    nbits : int, optional
+        Number of bits in the QA band
+
+    Returns
+    -------
+    xr.DataArray
+        Packed flags, with CF ``flag_masks`` and ``flag_meanings``
+        attributes describing each bit. Calculated lazily if ``xarr`` is a
+        Dask array
+    """
+    if not np.issubdtype(xarr.dtype, np.integer):
+        raise TypeError(f'Cannot decode QA from "{xarr.dtype}" data')
+
+    lut = qa_lookup_table(flags=flags, nbits=nbits)
+    utype = np.dtype(f'uint{xarr.dtype.itemsize * 8}')
+    fill = np.uint8(1)
+
+    def _decode(qa):
+        mask = lut[qa.astype(utype) & (2 ** nbits - 1)]
+        if nodata is not None:
+            mask[qa == nodata] = fill
+        return mask
+
+    mask = xr.apply_ufunc(_decode, xarr, dask='parallelized',
+                          output_dtypes=[np.uint8])
+    mask.name = QA_MASK_NAME
+    mask.attrs = {
+        'long_name': 'Quality assessment flags',
+        'flag_masks': np.array([2 ** i for i in range(len(flags))],
+                               dtype=np.uint8),
+        'flag_meanings': ' '.join(flags)
+    }
+    return mask
+
+
+def qa_flag(mask, *names):
+    """ Return where any of the named flags are set in a decoded QA mask
+
+    Parameters
+    ----------
+    mask : xr.DataArray
+        Decoded QA mask (see :py:func:`decode_qa`)
+    names : str
+        Flag names (e.g., "cloud", "cloud_shadow")
+
+    Returns
+    -------
+    xr.DataArray
+        True where any of the flags are set
+
+    Raises
+    ------
+    KeyError
+        Raised if a flag isn't in the mask
+    """
+    meanings = mask.attrs['flag_meanings'].split(' ')
+    bits = 0
+    for name in names:
+        try:
+            i = meanings.index(name)
+        except ValueError:
+            raise KeyError(f'Unknown QA flag "{name}". Must be one of '
+                           f'{", ".join(meanings)}')
+        bits |= int(mask.attrs['flag_masks'][i])
+    return (mask & bits) != 0
+
+
+def is_flag_variable(xarr):
+    """ Return True if a variable contains CF flags (e.g., a QA mask)
+    """
+    return 'flag_masks' in xarr.attrs
@@ -0,0 +1,262 @@
+""" Rechunk ARD into a layout for reading time series of pixels
+
+ARD are written in chunks covering large spatial windows and a few time
+steps, so reading the time series of a single pixel touches every chunk
+along the time dimension. Rechunking copies the ARD into a Zarr store with
+chunks containing the entire time series of small windows of pixels.
+
+Rechunking is done "out-of-core" in two steps, spilling an intermediate
+copy of the data to disk instead of holding it in memory. If the
+`rechunker <https://rechunker.readthedocs.io>`_ package is installed, it is
+used to plan and execute the intermediate step. Otherwise, the ARD is first
+written to a temporary Zarr store with chunks that are the intersection of
+the original and target chunks, and then read back in the target chunks.
+"""
+import logging
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+import numpy as np
+
+from . import defaults
+from .exceptions import MemoryLimitError
+
+logger = logging.getLogger(__name__)
+
+
+def rechunk_ard(sources, dest, time_chunk=-1, space_chunk=None,
+                max_mem=defaults.RECHUNK_MAX_MEM, temp_dir=None,
+                compressor=None, complevel=defaults.ARD_ZARR_COMPLEVEL,
+                overwrite=False, progress=False):
+    """ Rechunk ARD to a time-contiguous Zarr store for time series reads
+
+    Parameters
+    ----------
+    sources : str, Path, or Sequence[str or Path]
+        ARD to rechunk (NetCDF4 files or Zarr stores). If more than one is
+        given (e.g., yearly ARD for a tile), they are combined along "time"
+    dest : str or Path
+        Destination Zarr store
+    time_chunk : int, optional
+        Number of time steps per chunk, or -1 for all time steps
+    space_chunk : int, optional
+        Number of rows and columns per chunk. If ``None``, chunks are
+        planned to be about :py:data:`cedar.defaults.RECHUNK_CHUNK_BYTES`
+        (see :py:func:`cedar.chunks.plan_time_series_chunks`)
+    max_mem : int, optional
+        Memory limit, in bytes. The number of Dask threads is limited so
+        the chunks being read and written fit within the limit
+    temp_dir : str or Path, optional
+        Directory for the intermediate Zarr store. Defaults to the
+        directory containing ``dest``
+    compressor : str, optional
+        Compressor to use, by name (see
+        :py:data:`cedar.preard.ZARR_COMPRESSORS`). If ``None``, uses the
+        default compressor of Zarr
+    complevel : int, optional
+        Compression level, if a compressor is given
+    overwrite : bool, optional
+        Overwrite ``dest`` if it exists
+    progress : bool, optional
+        Display a progress bar while rechunking
+
+    Returns
+    -------
+    Path
+        Destination Zarr store
+
+    Raises
+    ------
+    FileExistsError
+        Raised if ``dest`` exists and not overwriting
+    cedar.exceptions.MemoryLimitError
+        Raised if one chunk does not fit within ``max_mem``
+    """
+    from stems.utils import renamed_upon_completion
+
+    dest = Path(dest)
+    if dest.exists():
+        if not overwrite:
+            raise FileExistsError(f'Rechunked ARD "{dest}" already exists')
+        logger.debug(f'Removing existing Zarr store "{dest}"')
+        shutil.rmtree(str(dest))
+
+    ds = open_ard_sources(sources)
+    target_chunks = _target_chunks(ds, time_chunk, space_chunk)
+    encoding = _rechunk_encoding(ds, target_chunks, compressor, complevel)
+    logger.info(f'Rechunking ARD with {ds.sizes["time"]} time steps to '
+                f'chunks {target_chunks}')
+
+    temp_dir = Path(temp_dir or dest.parent)
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    temp = Path(tempfile.mkdtemp(prefix=f'{dest.name}.', suffix='.tmp',
+                                 dir=str(temp_dir)))
+    try:
+        with renamed_upon_completion(dest) as tmp:
+            try:
+                import rechunker  # noqa: F401
+            except ImportError:
+                _rechunk_zarr(ds, tmp, target_chunks, encoding, temp,
+                              max_mem, progress=progress)
+            else:
+                _rechunk_rechunker(ds, tmp, target_chunks, encoding, temp,
+                                   max_mem, progress=progress)
+    finally:
+        shutil.rmtree(str(temp), ignore_errors=True)
+
+    return dest
+
+
+def open_ard_sources(sources):
+    """ Open one or more ARD, combining them along "time"
+
+    Data are opened without applying NoData masks or scaling, so they keep
+    their original data types while being rechunked.
+
+    Parameters
+    ----------
+    sources : str, Path, or Sequence[str or Path]
+        ARD NetCDF4 files or Zarr stores
+
+    Returns
+    -------
+    xr.Dataset
+        ARD sorted by "time", without any duplicated times
+    """
+    import xarray as xr
+    from .ard import open_ard_file
+
+    if isinstance(sources, (str, Path)):
+        sources = [sources]
+
+    datasets = [open_ard_file(source, mask_and_scale=False)
+                for source in sources]
+
+    if len(datasets) == 1:
+        ds = datasets[0]
+    else:
+        ds = xr.concat(datasets, dim='time', data_vars='minimal',
+                       coords='minimal', compat='override',
+                       combine_attrs='override')
+        ds = ds.sortby('time')
+        _, idx = np.unique(ds['time'].values, return_index=True)
+        if idx.size < ds['time'].size:
+            logger.warning(f'Dropping {ds["time"].size - idx.size} time '
+                           'steps repeated in more than one ARD')
+            ds = ds.isel(time=np.sort(idx))
+
+    # Encoding from the sources (e.g., NetCDF4 chunks) doesn't apply
+    for var in ds.variables.values():
+        var.encoding = {}
+
+    return ds
+
+
+def _target_chunks(ds, time_chunk=-1, space_chunk=None):
+    from .chunks import plan_time_series_chunks
+
+    itemsize = max(ds[var].dtype.itemsize for var in ds.data_vars)
+    chunks = plan_time_series_chunks(ds.sizes, itemsize, time=time_chunk)
+    if space_chunk:
+        chunks['y'] = min(space_chunk, ds.sizes['y'])
+        chunks['x'] = min(space_chunk, ds.sizes['x'])
+    return chunks
+
+
+def _rechunk_encoding(ds, target_chunks, compressor=None,
+                      complevel=defaults.ARD_ZARR_COMPLEVEL):
+    from .preard import zarr_compressor, zarr_compressor_encoding
+
+    encoding = {}
+    for var in ds.data_vars:
+        enc = {'chunks': tuple(target_chunks.get(dim, size) for dim, size in
+                               zip(ds[var].dims, ds[var].shape))}
+        if compressor is not None:
+            enc.update(zarr_compressor_encoding(
+                zarr_compressor(compressor, complevel)))
+        encoding[var] = enc
+    return encoding
+
+
+def _rechunk_zarr(ds, dest, target_chunks, encoding, temp, max_mem,
+                  progress=False):
+    """ Rechunk through an intermediate Zarr store
+    """
+    import contextlib
+    import dask
+    from dask.diagnostics import ProgressBar
+    import xarray as xr
+    from .preard import zarr_format_kwds
+
+    # Intermediate chunks split source chunks into pieces that fit inside
+    # target chunks, so each step reads and writes whole chunks
+    var = next(iter(ds.data_vars))
+    chunks = ds[var].chunks or [(size, ) for size in ds[var].shape]
+    source_chunks = {dim: max(sizes) for dim, sizes in
+                     zip(ds[var].dims, chunks)}
+    temp_chunks = {dim: min(source_chunks.get(dim, size),
+                            target_chunks.get(dim, size))
+                   for dim, size in ds.sizes.items()}
+    temp_encoding = {
+        var: {'chunks': tuple(temp_chunks[dim] for dim in ds[var].dims)}
+        for var in ds.data_vars
+    }
+
+    n_threads = _limit_threads(ds, [source_chunks, target_chunks], max_mem)
+    bar = ProgressBar(dt=10) if progress else contextlib.suppress()
+    with dask.config.set(num_workers=n_threads), bar:
+        logger.debug(f'Writing intermediate chunks {temp_chunks} to "{temp}"')
+        ds.chunk(temp_chunks).to_zarr(str(temp), mode='w',
+                                      encoding=temp_encoding,
+                                      **zarr_format_kwds())
+
+        logger.debug(f'Writing target chunks {target_chunks} to "{dest}"')
+        temp_ds = xr.open_zarr(str(temp), mask_and_scale=False,
+                               chunks=target_chunks)
+        for var in temp_ds.variables.values():
+            var.encoding = {}
+        temp_ds.to_zarr(str(dest), mode='w', encoding=encoding,
+                        **zarr_format_kwds())
+
+
+def _rechunk_rechunker(ds, dest, target_chunks, encoding, temp, max_mem,
+                       progress=False):
+    """ Rechunk using ``rechunker``
+    """
+    import contextlib
+    from dask.diagnostics import ProgressBar
+    from rechunker import rechunk
+
+    target_options = {
+        var: {k: v for k, v in enc.items() if k != 'chunks'}
+        for var, enc in encoding.items()
+    }
+    plan = rechunk(ds, target_chunks, max_mem, str(dest),
+                   target_options=target_options,
+                   temp_store=str(temp.joinpath('intermediate.zarr')))
+    logger.debug(f'Rechunking using plan: {plan}')
+    with (ProgressBar(dt=10) if progress else contextlib.suppress()):
+        plan.execute()
+
+
+def _limit_threads(ds, chunks, max_mem):
+    """ Return how many threads can hold the largest chunks in ``max_mem``
+    """
+    itemsize = max(ds[var].dtype.itemsize for var in ds.data_vars)
+    # Each task holds its input and output chunk
+    task_bytes = 2 * max(
+        itemsize * int(np.prod([c.get(dim, size)
+                                for dim, size in ds.sizes.items()
+                                if dim in ('time', 'y', 'x')]))
+        for c in chunks
+    )
+    if task_bytes > max_mem:
+        raise MemoryLimitError(
+            f'Cannot rechunk within a memory limit of {max_mem} bytes '
+            f'because one chunk needs {task_bytes} bytes. Use smaller '
+            'chunks or a larger limit')
+    n_threads = min(os.cpu_count() or 1, max_mem // task_bytes)
+    logger.debug(f'Rechunking using {n_threads} threads')
+    return int(n_threads)
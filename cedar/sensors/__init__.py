@@ -8,3 +8,9 @@ CREATE_ARD_COLLECTION = {}
 CREATE_ARD_COLLECTION.update({
     k: landsat.create_ard for k in landsat.METADATA.keys()
 })
+
+#: dict: Mapping of GEE collection to function planning many ARD at once
+PLAN_ARD_COLLECTION = {}
+PLAN_ARD_COLLECTION.update({
+    k: landsat.plan_ard for k in landsat.METADATA.keys()
+})
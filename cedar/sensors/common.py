@@ -1,10 +1,15 @@
 """ Common functions for dealing with GEE
 """
 import datetime as dt
+import logging
 
 import ee
 import shapely.geometry
 
+from .. import defaults
+
+logger = logging.getLogger(__name__)
+
 
 # ==============================================================================
 # Metadata handling
@@ -44,28 +49,190 @@ def collection_metadata(collection, key):
     ee.List
         List of metadata per item in ``collection``
     """
-    def inner(img, previous):
-        v = ee.Image(img).get(key)
-        previous_ = ee.List(previous)
-        return ee.List(previous_.add(v))
-    return collection.iterate(inner, ee.List([]))
+    return collection.aggregate_array(key)
+
+
+def images_metadata(collection, keys):
+    """ Return a ee.List of metadata dictionaries, one per image
+
+    The metadata of each image is retrieved with ``toDictionary`` while
+    mapping over the images on the server, instead of iterating over the
+    images one by one. Keys that an image doesn't have (or that are null)
+    are left out of its dictionary, so no images are dropped.
+
+    Parameters
+    ----------
+    collection : ee.ImageCollection
+        GEE collection
+    keys : Sequence[str]
+        Metadata to retrieve
+
+    Returns
+    -------
+    ee.List
+        List of metadata (``ee.Dictionary``) per image in ``collection``
+    """
+    keys = list(keys)
+
+    def inner(img):
+        return ee.Image(img).toDictionary(keys)
+    return collection.toList(collection.size()).map(inner)
 
 
 # ==============================================================================
 # Time
+#: str: Format of dates computed on the server (for ``ee.Date.format``)
+EE_DATE_FORMAT = 'YYYY-MM-dd'
+#: str: Format of dates computed on the server (for ``datetime.strptime``)
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def collection_dates(imgcol):
+    """ Return a ee.List of the date of each image in a collection
+
+    Parameters
+    ----------
+    imgcol : ee.ImageCollection
+        GEE collection
+
+    Returns
+    -------
+    ee.List
+        Date of each image (formatted using :py:data:`EE_DATE_FORMAT`)
+    """
+    def inner(time_start):
+        return ee.Date(time_start).format(EE_DATE_FORMAT)
+    return imgcol.aggregate_array('system:time_start').map(inner)
+
+
+def collection_uniq_dates(imgcol):
+    """ Return a ee.List of the unique dates of images in a collection, sorted
+    """
+    return collection_dates(imgcol).distinct().sort()
+
+
 def get_collection_dates(imgcol):
-    def inner(image, previous):
-        date = ee.Image(image).date().format('YYYY-MM-dd')
-        previous_ = ee.List(previous)
-        return ee.List(previous_.add(date))
-    dates = imgcol.iterate(inner, ee.List([])).getInfo()
-    return [dt.datetime.strptime(d, '%Y-%m-%d') for d in dates]
+    dates = collection_dates(imgcol).getInfo()
+    return [dt.datetime.strptime(d, DATE_FORMAT) for d in dates]
 
 
 def get_collection_uniq_dates(col):
     return list(sorted(set(get_collection_dates(col))))
 
 
+def collection_dates_metadata(imgcol, dates, keys):
+    """ Return a ee.List of image metadata for each date
+
+    Parameters
+    ----------
+    imgcol : ee.ImageCollection
+        GEE collection
+    dates : ee.List
+        Dates (formatted using :py:data:`EE_DATE_FORMAT`)
+    keys : Sequence[str]
+        Metadata to retrieve
+
+    Returns
+    -------
+    ee.List
+        For each date, a list of metadata for each image acquired that day
+    """
+    def inner(date):
+        date_ = ee.Date(date)
+        imgcol_ = imgcol.filterDate(date_, date_.advance(1, 'day'))
+        return images_metadata(imgcol_, keys)
+    return ee.List(dates).map(inner)
+
+
+def collection_dates_mosaic(imgcol, dates):
+    """ Return a ee.List of images, mosaicking the images from each date
+
+    The mosaics are made on the server by mapping over ``dates``, so the
+    size of the request doesn't grow with the number of dates.
+
+    Parameters
+    ----------
+    imgcol : ee.ImageCollection
+        GEE collection
+    dates : ee.List
+        Dates (formatted using :py:data:`EE_DATE_FORMAT`)
+
+    Returns
+    -------
+    ee.List
+        For each date, the mosaic of the images acquired that day (e.g.,
+        to remove the north/south overlap of adjacent scenes)
+    """
+    def inner(date):
+        date_ = ee.Date(date)
+        imgcol_ = imgcol.filterDate(date_, date_.advance(1, 'day'))
+        return imgcol_.mosaic()
+    return ee.List(dates).map(inner)
+
+
+def plan_collections(imgcols, keys=None,
+                     batch_size=defaults.ORDER_PLAN_BATCH_SIZE):
+    """ Find the unique dates, and metadata, of many collections at once
+
+    Instead of evaluating the dates of each collection separately, the
+    dates (and image metadata) of every collection are computed as one
+    ``ee.Dictionary`` on the server, keyed like ``imgcols``, and retrieved
+    with one ``getInfo`` per batch of collections.
+
+    Parameters
+    ----------
+    imgcols : dict[str, ee.ImageCollection]
+        GEE collections to plan (e.g., one per tile and period)
+    keys : Sequence[str] or dict[str, Sequence[str]], optional
+        Metadata to retrieve for the images acquired on each date, either
+        for all collections or given per collection. If ``None``, only the
+        dates are retrieved
+    batch_size : int, optional
+        Number of collections to retrieve per ``getInfo``. Very large
+        requests may exceed Earth Engine's limits
+
+    Returns
+    -------
+    dict[str, dict]
+        For each collection, the sorted unique "dates" of images (as
+        ``datetime.datetime``) and "metadata" of images acquired on each
+        date (or ``None`` if no ``keys`` are given). Collections in a batch
+        that couldn't be retrieved are left out, so they can be planned
+        some other way
+    """
+    names = list(imgcols)
+    batch_size = batch_size or len(names) or 1
+
+    plans = {}
+    for i in range(0, len(names), batch_size):
+        batch = {}
+        for name in names[i:i + batch_size]:
+            imgcol = imgcols[name]
+            dates = collection_uniq_dates(imgcol)
+            plan = {'dates': dates}
+            keys_ = keys.get(name) if isinstance(keys, dict) else keys
+            if keys_:
+                plan['metadata'] = collection_dates_metadata(imgcol, dates,
+                                                             keys_)
+            batch[name] = ee.Dictionary(plan)
+
+        logger.debug(f'Retrieving dates for {len(batch)} collections')
+        try:
+            info = ee.Dictionary(batch).getInfo()
+        except Exception as e:
+            logger.warning(f'Could not retrieve dates for {len(batch)} '
+                           f'collections: {e!r}')
+            continue
+        for name, plan in info.items():
+            plans[name] = {
+                'dates': [dt.datetime.strptime(d, DATE_FORMAT)
+                          for d in plan['dates']],
+                'metadata': plan.get('metadata', None)
+            }
+
+    return plans
+
+
 def filter_collection_time(col, d_start, d_end):
     # ee.Date should parse from str or datetime
     d_start_ = ee.Date(d_start)
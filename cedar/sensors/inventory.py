@@ -0,0 +1,227 @@
+""" Persistent cache of the scenes in image collections ("inventories")
+
+Finding which scenes exist for a tile and period, and their metadata, takes
+requests to Earth Engine that are repeated every time an order is planned,
+even though historic inventories almost never change. The inventory stores
+the unique dates and image metadata found for each collection, tile
+footprint, period, and set of filters in a SQLite database, so planning an
+order again needs no requests to Earth Engine until the entries expire.
+"""
+import contextlib
+import datetime as dt
+import hashlib
+import json
+import logging
+from pathlib import Path
+import sqlite3
+import time
+
+from .. import defaults
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS inventory (
+    key TEXT PRIMARY KEY,
+    collection TEXT NOT NULL,
+    date_start TEXT,
+    date_end TEXT,
+    plan TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS inventory_created ON inventory (created);
+"""
+
+
+class SceneInventory(object):
+    """ Cache of the dates and metadata of images found for ARD
+
+    Parameters
+    ----------
+    filename : str or Path, optional
+        SQLite database filename. Defaults to
+        :py:data:`cedar.defaults.INVENTORY_FILENAME` in the first
+        :py:data:`cedar.defaults.CEDAR_ROOT_CONFIG` directory
+    ttl : float, optional
+        Seconds before cached inventories expire, or ``None`` to never
+        expire
+    refresh : bool, optional
+        Ignore cached inventories, replacing them with new ones
+    min_age : float, optional
+        Only cache inventories for periods that ended at least this many
+        seconds ago, because newly acquired scenes are still being added
+    """
+    def __init__(self, filename=None, ttl=defaults.INVENTORY_TTL,
+                 refresh=False, min_age=defaults.INVENTORY_MIN_AGE):
+        self.filename = Path(filename or default_inventory_filename())
+        self.ttl = ttl
+        self.refresh = refresh
+        self.min_age = min_age
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def __len__(self):
+        with self._connect() as conn:
+            row = conn.execute('SELECT COUNT(*) FROM inventory').fetchone()
+        return row[0]
+
+    def _connect(self):
+        # Orders are planned from many threads, so use a connection per call
+        conn = sqlite3.connect(str(self.filename), timeout=30.0)
+        return contextlib.closing(conn)
+
+    def get(self, collection, tile, date_start, date_end, filters=None):
+        """ Return the cached plan for an ARD, or ``None`` if not cached
+
+        Parameters
+        ----------
+        collection : str
+            GEE image collection name
+        tile : stems.gis.grids.Tile
+            STEMS TileGrid tile
+        date_start : dt.datetime
+            Starting period
+        date_end : dt.datetime
+            Ending period
+        filters : Sequence[ee.Filter], optional
+            Additional filters applied over the image collection
+
+        Returns
+        -------
+        dict or None
+            Unique "dates" and image "metadata" (see
+            :py:func:`cedar.sensors.common.plan_collections`)
+        """
+        if self.refresh:
+            return None
+        key = inventory_key(collection, tile, date_start, date_end, filters)
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT plan, created FROM inventory WHERE key = ?', (key, )
+            ).fetchone()
+        if row is None:
+            return None
+        plan, created = row
+        if self.ttl is not None and time.time() - created > self.ttl:
+            logger.debug(f'Inventory for "{collection}" {date_start} to '
+                         f'{date_end} has expired')
+            return None
+        return _loads_plan(plan)
+
+    def put(self, collection, tile, date_start, date_end, plan,
+            filters=None):
+        """ Cache the plan for an ARD, returning True if it was cached
+
+        Parameters
+        ----------
+        collection : str
+            GEE image collection name
+        tile : stems.gis.grids.Tile
+            STEMS TileGrid tile
+        date_start : dt.datetime
+            Starting period
+        date_end : dt.datetime
+            Ending period
+        plan : dict
+            Unique "dates" and image "metadata"
+        filters : Sequence[ee.Filter], optional
+            Additional filters applied over the image collection
+
+        Returns
+        -------
+        bool
+            True if cached, or False if the period ended too recently
+        """
+        age = dt.datetime.now() - date_end
+        if self.min_age and age.total_seconds() < self.min_age:
+            logger.debug(f'Not caching inventory for "{collection}" '
+                         f'{date_start} to {date_end} because it ended '
+                         'recently')
+            return False
+
+        key = inventory_key(collection, tile, date_start, date_end, filters)
+        with self._connect() as conn, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO inventory '
+                '(key, collection, date_start, date_end, plan, created) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, collection, date_start.isoformat(),
+                 date_end.isoformat(), _dumps_plan(plan), time.time())
+            )
+        return True
+
+    def clear(self, expired=False):
+        """ Remove cached inventories, returning the number removed
+
+        Parameters
+        ----------
+        expired : bool, optional
+            Only remove inventories older than ``ttl``
+        """
+        with self._connect() as conn, conn:
+            if expired:
+                if self.ttl is None:
+                    return 0
+                cursor = conn.execute(
+                    'DELETE FROM inventory WHERE created < ?',
+                    (time.time() - self.ttl, ))
+            else:
+                cursor = conn.execute('DELETE FROM inventory')
+        return cursor.rowcount
+
+
+def default_inventory_filename():
+    """ Return the default scene inventory filename, in the config folder
+    """
+    return Path(defaults.CEDAR_ROOT_CONFIG[0]).joinpath(
+        defaults.INVENTORY_FILENAME)
+
+
+def inventory_key(collection, tile, date_start, date_end, filters=None):
+    """ Return the key of an inventory, as a hash of what it depends on
+
+    Parameters
+    ----------
+    collection : str
+        GEE image collection name
+    tile : stems.gis.grids.Tile
+        STEMS TileGrid tile. The key depends on its footprint (bounds and
+        CRS), not its index
+    date_start : dt.datetime
+        Starting period
+    date_end : dt.datetime
+        Ending period
+    filters : Sequence[ee.Filter], optional
+        Additional filters applied over the image collection
+
+    Returns
+    -------
+    str
+        Key
+    """
+    from ..utils import serialize_filter
+
+    desc = {
+        'collection': collection,
+        'bounds': [round(b, 6) for b in tile.bbox.bounds],
+        'crs': tile.crs.wkt,
+        'date_start': date_start.isoformat(),
+        'date_end': date_end.isoformat(),
+        'filters': [serialize_filter(f) for f in (filters or [])]
+    }
+    desc = json.dumps(desc, sort_keys=True, default=str)
+    return hashlib.sha256(desc.encode('utf-8')).hexdigest()
+
+
+def _dumps_plan(plan):
+    plan = dict(plan)
+    plan['dates'] = [d.isoformat() for d in plan['dates']]
+    return json.dumps(plan)
+
+
+def _loads_plan(plan):
+    plan = json.loads(plan)
+    plan['dates'] = [dt.datetime.strptime(d, '%Y-%m-%dT%H:%M:%S')
+                     for d in plan['dates']]
+    return plan
@@ -6,6 +6,7 @@ import warnings
 
 import ee
 
+from .. import defaults
 from ..exceptions import EmptyCollectionError
 from . import common
 
@@ -71,7 +72,7 @@ METADATA = {
 
 
 def create_ard(collection, tile, date_start, date_end, filters=None,
-               validate=False):
+               validate=False, plan=None, inventory=None):
     """ Create an ARD :py:class:`ee.Image`
 
     Parameters
@@ -87,8 +88,15 @@ def create_ard(collection, tile, date_start, date_end, filters=None,
     filters : Sequence[ee.Filter], optional
         Additional filters to apply over image collection
     validate : bool, optional
-        Perform validity checks at cost of submission speed (runs ``.getInfo``
-        on metadata, requiring us to wait on client-server communication)
+        Check that images were found for each unique date, raising an
+        :py:class:`cedar.exceptions.EmptyCollectionError` if not
+    plan : dict, optional
+        Unique "dates" and image "metadata" for the collection, tile, and
+        period, already retrieved using :py:func:`plan_ard`. If given, no
+        requests are made to Earth Engine to find them
+    inventory : cedar.sensors.inventory.SceneInventory, optional
+        Cache of scene inventories to find the unique dates and image
+        metadata in, or to add them to (see :py:func:`plan_ard`)
 
     Returns
     -------
@@ -101,54 +109,34 @@ def create_ard(collection, tile, date_start, date_end, filters=None,
     assert isinstance(date_start, dt.datetime)
     assert isinstance(date_end, dt.datetime)
 
-    # Get collection
-    if isinstance(collection, ee.ImageCollection):
-        imgcol = collection
-        collection = imgcol.get('system:id').getInfo()
-    else:
-        imgcol = ee.ImageCollection(collection)
-
-    if not collection in BANDS.keys():
-        raise KeyError(f'Image collection "{collection}" is unsupported')
+    if plan is None and inventory is not None and isinstance(collection, str):
+        plan = plan_ard([{'collection': collection, 'tile': tile,
+                          'date_start': date_start, 'date_end': date_end,
+                          'filters': filters}],
+                        inventory=inventory)[0]
 
-    # Find images in tile
-    imgcol = common.filter_collection_tile(imgcol, tile)
-
-    # For each unique date of imagery in this image collection covering the tile
-    imgcol = common.filter_collection_time(imgcol, date_start, date_end)
-
-    # Apply additional filters
-    if filters:
-        logger.debug(f'Applying {len(filters)} filters over collection')
-        imgcol = imgcol.filter(filters)
-
-    # Select and rename bands
-    # TODO: specify what bands get ordered
+    imgcol, collection = _ard_collection(collection, tile,
+                                         date_start, date_end,
+                                         filters=filters)
     band_names = BANDS['COMMON']
-    imgcol = imgcol.select(BANDS[collection], band_names)
 
     # Find number of unique observations (or, uniquely dated)
-    imgcol_udates = common.get_collection_uniq_dates(imgcol)
+    if plan is None:
+        imgcol_udates = common.get_collection_uniq_dates(imgcol)
+    else:
+        imgcol_udates = plan['dates']
     n_images = len(imgcol_udates)
     if n_images == 0:
         warnings.warn(f'Found 0 images for "{collection}" between '
                       f'{date_start}-{date_end}')
 
-    # Loop over unique dates, making mosaics to eliminate north/south if needed
+    # Mosaic each unique date, to eliminate north/south overlap if needed,
+    # mapping over the dates on the server so the request doesn't grow with
+    # the number of dates
     logger.debug(f'Creating ARD for {n_images} images')
-    prepped = []
-    for udate in sorted(imgcol_udates):
-        # Prepare and get metadata for unique date
-        img, meta = _prep_collection_image(imgcol, collection, udate,
-                                           validate=validate)
-        # Add image and metadata
-        prepped.append((img, meta))
-
-    # Unpack
-    if prepped:
-        images, image_metadata = list(zip(*prepped))
-    else:
-        images, image_metadata = [], []
+    dates = ee.List([d.strftime(common.DATE_FORMAT)
+                     for d in sorted(imgcol_udates)])
+    images = common.collection_dates_mosaic(imgcol, dates)
 
     # Re-create as collection and turn to bands (n_image x bands_per_image)
     tile_col = ee.ImageCollection.fromImages(images)
@@ -159,7 +147,21 @@ def create_ard(collection, tile, date_start, date_end, filters=None,
     tile_bands_unmasked = tile_bands.unmask(nodata)
 
     # Get all image metadata at once (saves time back and forth)
-    images_metadata_ = list(ee.List(image_metadata).getInfo())
+    if plan is None:
+        keys = METADATA[collection]
+        images_metadata_ = list(
+            common.collection_dates_metadata(imgcol, dates, keys).getInfo())
+    else:
+        images_metadata_ = list(plan['metadata'])
+
+    if validate:
+        # Check to make sure each date has images to mosaic
+        empty = [d for d, meta in zip(sorted(imgcol_udates), images_metadata_)
+                 if not meta]
+        if len(images_metadata_) != n_images or empty:
+            raise EmptyCollectionError(
+                f'Found no images for {len(empty)} of {n_images} dates of '
+                f'"{collection}" between {date_start}-{date_end}')
 
     # Create overall metadata
     metadata = {
@@ -171,35 +173,90 @@ def create_ard(collection, tile, date_start, date_end, filters=None,
     return tile_bands_unmasked, metadata
 
 
-def _imgcol_metadata(imgcol, keys):
-    """ Return metadata for Landsat image collection
-    """
-    def inner(img, previous):
-        meta = common.object_metadata(img, keys)
-        previous_ = ee.List(previous)
-        return ee.List(previous_.add(meta))
+def plan_ard(requests, batch_size=defaults.ORDER_PLAN_BATCH_SIZE,
+             inventory=None):
+    """ Find the unique dates and image metadata for many ARD at once
 
-    meta = imgcol.iterate(inner, ee.List([]))
-    return meta
+    If a scene ``inventory`` is given, requests it has cached are not
+    planned again and the plans for other requests are added to it.
 
+    Parameters
+    ----------
+    requests : Sequence[dict]
+        ARD to plan, given as keyword arguments to :py:func:`create_ard`
+        ("collection", "tile", "date_start", "date_end", and optionally
+        "filters")
+    batch_size : int, optional
+        Number of ARD to plan per request to Earth Engine
+    inventory : cedar.sensors.inventory.SceneInventory, optional
+        Cache of scene inventories
 
-def _prep_collection_image(imgcol, collection, date, validate=False):
-    """ Prepare an image for and ``date`` from an ImageCollection
+    Returns
+    -------
+    list[dict or None]
+        Plan for each request, to pass to :py:func:`create_ard`, or
+        ``None`` if it couldn't be planned (e.g., because its batch
+        failed), so :py:func:`create_ard` finds the dates itself
+    """
+    def _inventory_kwds(request):
+        return {k: request.get(k, None) for k in
+                ('collection', 'tile', 'date_start', 'date_end', 'filters')}
+
+    plans = [None] * len(requests)
+    if inventory is not None:
+        for i, request in enumerate(requests):
+            plans[i] = inventory.get(**_inventory_kwds(request))
+        logger.debug(f'Found {sum(p is not None for p in plans)} of '
+                     f'{len(plans)} ARD plans in the scene inventory')
+
+    imgcols, keys = {}, {}
+    for i, request in enumerate(requests):
+        if plans[i] is not None:
+            continue
+        imgcol, collection = _ard_collection(
+            request['collection'], request['tile'],
+            request['date_start'], request['date_end'],
+            filters=request.get('filters', None))
+        imgcols[str(i)] = imgcol
+        keys[str(i)] = METADATA[collection]
+
+    planned = common.plan_collections(imgcols, keys=keys,
+                                      batch_size=batch_size)
+    for key, plan in planned.items():
+        i = int(key)
+        plans[i] = plan
+        if inventory is not None:
+            inventory.put(plan=plan, **_inventory_kwds(requests[i]))
+
+    return plans
+
+
+def _ard_collection(collection, tile, date_start, date_end, filters=None):
+    """ Return the collection of images for an ARD, and its name
     """
-    # Filter for this date (day <-> day+1)
-    date_end = (date + dt.timedelta(days=1))
-    imgcol_ = common.filter_collection_time(imgcol, date, date_end)
+    # Get collection
+    if isinstance(collection, ee.ImageCollection):
+        imgcol = collection
+        collection = imgcol.get('system:id').getInfo()
+    else:
+        imgcol = ee.ImageCollection(collection)
 
-    if validate:
-        # Check to make sure just 1 unique date
-        _ = common.get_collection_uniq_dates(imgcol_)
-        assert len(_) == 1
+    if not collection in BANDS.keys():
+        raise KeyError(f'Image collection "{collection}" is unsupported')
 
-    # Prepare all images in this collection (i.e., 1 or 2, depending on overlap)
-    img = imgcol_.mosaic()
+    # Find images in tile
+    imgcol = common.filter_collection_tile(imgcol, tile)
 
-    # Get metadata from each image in new, potentially mosaiced ``img``
-    keys = METADATA[collection]
-    meta = _imgcol_metadata(imgcol_, keys)
+    # For each unique date of imagery in this image collection covering the tile
+    imgcol = common.filter_collection_time(imgcol, date_start, date_end)
+
+    # Apply additional filters
+    if filters:
+        logger.debug(f'Applying {len(filters)} filters over collection')
+        imgcol = imgcol.filter(filters)
+
+    # Select and rename bands
+    # TODO: specify what bands get ordered
+    imgcol = imgcol.select(BANDS[collection], BANDS['COMMON'])
 
-    return img, meta
+    return imgcol, collection
@@ -1,3 +1,59 @@
 """ Tests for :py:mod:`cedar.sensors.common`
 """
+import datetime as dt
+from unittest import mock
+
+import pytest
+
 from cedar.sensors import common
+
+fake_ee = pytest.importorskip('benchmarks.fake_ee')
+
+COLLECTION = 'TEST'
+
+
+@pytest.fixture
+def ee_():
+    with mock.patch.object(common, 'ee', fake_ee):
+        yield fake_ee
+
+
+def test_images_metadata(ee_):
+    properties = ee_.make_properties(4, ['CLOUD_COVER', 'WRS_ROW'])
+    del properties[1]['CLOUD_COVER']
+    properties[2]['WRS_ROW'] = None
+    ee_.register_collection(COLLECTION, properties)
+    imgcol = ee_.ImageCollection(COLLECTION)
+
+    keys = ['system:index', 'CLOUD_COVER', 'WRS_ROW']
+    ans = common.images_metadata(imgcol, keys).getInfo()
+    assert [meta['system:index'] for meta in ans] == [
+        p['system:index'] for p in properties]
+    assert 'CLOUD_COVER' not in ans[1]
+    assert 'WRS_ROW' not in ans[2]
+    assert ans[3] == {key: properties[3][key] for key in keys}
+
+    # A column reduction drops images missing any key
+    columns = imgcol.reduceColumns(ee_.Reducer.toList(len(keys)), keys)
+    assert len(columns.getInfo()['list']) == 2
+
+
+def test_plan_collections_batch_error():
+    class Dictionary(object):
+        def __init__(self, batch):
+            self.batch = batch
+
+        def getInfo(self):
+            if 'BAD' in self.batch:
+                raise IOError('Request failed')
+            return {name: {'dates': ['2000-01-01']} for name in self.batch}
+
+    imgcols = {'A': None, 'BAD': None, 'C': None, 'D': None}
+    with mock.patch.object(common, 'ee') as ee_, \
+            mock.patch.object(common, 'collection_uniq_dates'):
+        ee_.Dictionary = Dictionary
+        plans = common.plan_collections(imgcols, batch_size=2)
+
+    # Only the batch that failed is left out
+    assert list(plans) == ['C', 'D']
+    assert plans['C']['dates'] == [dt.datetime(2000, 1, 1)]
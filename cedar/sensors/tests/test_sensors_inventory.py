@@ -0,0 +1,85 @@
+""" Tests for :py:mod:`cedar.sensors.inventory`
+"""
+import datetime as dt
+from unittest import mock
+
+import pytest
+
+from cedar.sensors import inventory, landsat
+
+COLLECTION = 'LANDSAT/LC08/C01/T1_SR'
+
+
+class _Tile(object):
+    def __init__(self, bounds):
+        self.bbox = mock.Mock(bounds=bounds)
+        self.crs = mock.Mock(wkt='EPSG:5070')
+
+
+def _plan(*dates):
+    return {'dates': list(dates), 'metadata': [[{'id': str(d)}]
+                                               for d in dates]}
+
+
+@pytest.fixture
+def scenes(tmp_path):
+    return inventory.SceneInventory(tmp_path.joinpath('inventory.sqlite'))
+
+
+def test_scene_inventory(scenes):
+    tile = _Tile((0, 0, 1, 1))
+    start, end = dt.datetime(2000, 1, 1), dt.datetime(2001, 1, 1)
+    plan = _plan(dt.datetime(2000, 2, 1), dt.datetime(2000, 3, 1))
+
+    assert scenes.get(COLLECTION, tile, start, end) is None
+    assert scenes.put(COLLECTION, tile, start, end, plan)
+    assert scenes.get(COLLECTION, tile, start, end) == plan
+    assert len(scenes) == 1
+
+    # Different footprint or period isn't the same inventory
+    assert scenes.get(COLLECTION, _Tile((1, 0, 2, 1)), start, end) is None
+    assert scenes.get(COLLECTION, tile, start, dt.datetime(2002, 1, 1)) is None
+
+    # Refreshing ignores cached inventories
+    refresh = inventory.SceneInventory(scenes.filename, refresh=True)
+    assert refresh.get(COLLECTION, tile, start, end) is None
+
+    # Expired
+    expired = inventory.SceneInventory(scenes.filename, ttl=-1)
+    assert expired.get(COLLECTION, tile, start, end) is None
+    assert expired.clear(expired=True) == 1
+    assert len(scenes) == 0
+
+
+def test_scene_inventory_recent(scenes):
+    end = dt.datetime.now()
+    assert not scenes.put(COLLECTION, _Tile((0, 0, 1, 1)),
+                          end - dt.timedelta(days=365), end, _plan())
+    assert len(scenes) == 0
+
+
+def test_plan_ard_inventory(scenes):
+    tile = _Tile((0, 0, 1, 1))
+    requests = [
+        {'collection': COLLECTION, 'tile': tile,
+         'date_start': dt.datetime(year, 1, 1),
+         'date_end': dt.datetime(year + 1, 1, 1)}
+        for year in (2000, 2001)
+    ]
+    scenes.put(plan=_plan(dt.datetime(2000, 6, 1)), **requests[0])
+
+    def plan_collections(imgcols, keys=None, batch_size=None):
+        return {key: _plan(dt.datetime(2001, 6, 1)) for key in imgcols}
+
+    with mock.patch.object(landsat, '_ard_collection',
+                           return_value=(None, COLLECTION)), \
+            mock.patch.object(landsat.common, 'plan_collections',
+                              side_effect=plan_collections) as planner:
+        plans = landsat.plan_ard(requests, inventory=scenes)
+        assert list(planner.call_args[0][0]) == ['1']
+        assert [p['dates'] for p in plans] == [[dt.datetime(2000, 6, 1)],
+                                               [dt.datetime(2001, 6, 1)]]
+
+        # Everything is cached now
+        landsat.plan_ard(requests, inventory=scenes)
+        assert list(planner.call_args[0][0]) == []
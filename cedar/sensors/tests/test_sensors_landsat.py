@@ -1,3 +1,45 @@
 """ Tests for :py:mod:`cedar.sensors.landsat`
 """
+import datetime as dt
+from unittest import mock
+
+import pytest
+
+from cedar.exceptions import EmptyCollectionError
 from cedar.sensors import landsat
+
+COLLECTION = 'LANDSAT/LC08/C01/T1_SR'
+
+
+@pytest.fixture
+def ee_():
+    with mock.patch.object(landsat, 'ee') as ee_, \
+            mock.patch.object(landsat, '_ard_collection',
+                              return_value=(mock.sentinel.imgcol,
+                                            COLLECTION)), \
+            mock.patch.object(landsat.common, 'collection_dates_mosaic'):
+        yield ee_
+
+
+def test_create_ard_plan(ee_):
+    plan = {'dates': [dt.datetime(2000, 2, 1), dt.datetime(2000, 3, 1)],
+            'metadata': [[{'id': 'a'}], [{'id': 'b'}, {'id': 'c'}]]}
+    image, metadata = landsat.create_ard(
+        COLLECTION, None, dt.datetime(2000, 1, 1), dt.datetime(2001, 1, 1),
+        plan=plan, validate=True)
+
+    # One server-side map over all dates, not one expression per date
+    ee_.List.assert_called_once_with(['2000-02-01', '2000-03-01'])
+    f = landsat.common.collection_dates_mosaic
+    f.assert_called_once_with(mock.sentinel.imgcol, ee_.List.return_value)
+    ee_.ImageCollection.fromImages.assert_called_once_with(f.return_value)
+    assert metadata['images'] == plan['metadata']
+    assert metadata['nodata'] == landsat.NODATA[COLLECTION]
+
+
+def test_create_ard_validate(ee_):
+    plan = {'dates': [dt.datetime(2000, 2, 1), dt.datetime(2000, 3, 1)],
+            'metadata': [[{'id': 'a'}], []]}
+    with pytest.raises(EmptyCollectionError, match=r'1 of 2 dates'):
+        landsat.create_ard(COLLECTION, None, dt.datetime(2000, 1, 1),
+                           dt.datetime(2001, 1, 1), plan=plan, validate=True)
@@ -29,3 +29,4 @@ def importorskip(name, minversion=None):
 has_earthengine, requires_earthengine = importorskip('ee')
 has_gcs, requires_gcs = importorskip('google.cloud.storage')
 has_gdrive, requires_gdrive = importorskip('googleapiclient.discovery')
+has_zarr, requires_zarr = importorskip('zarr')
@@ -0,0 +1,95 @@
+""" Tests for :py:mod:`cedar.ard`
+"""
+import os
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from cedar import ard, defaults
+from cedar.tests import requires_zarr
+
+
+def _yearly_ard(tmp_path, years):
+    for year in years:
+        time = pd.date_range(f'{year}-01-01', periods=4, freq='QS')
+        data = np.full((4, 5, 5), year, dtype=np.int16)
+        ds = xr.Dataset({'blue': (('time', 'y', 'x'), data)},
+                        coords={'time': time + pd.Timedelta('15h'),
+                                'y': np.arange(5), 'x': np.arange(5)})
+        ds.to_netcdf(str(tmp_path.joinpath(f'ARD_{year}.nc')))
+
+
+def test_open_ard(tmp_path):
+    _yearly_ard(tmp_path, range(2000, 2006))
+
+    ds = ard.open_ard(tmp_path, start='2002-10-01', end='2004-01-01')
+    assert ds['time'].size == 6
+    assert ds['blue'].chunks is not None
+    np.testing.assert_array_equal(ds['blue'][:, 0, 0],
+                                  [2002] + [2003] * 4 + [2004])
+
+    index = ard.read_ard_index(tmp_path.joinpath(defaults.ARD_INDEX_FILENAME))
+    assert sorted(index) == [f'ARD_{year}.nc' for year in range(2000, 2006)]
+    assert index['ARD_2003.nc']['variables'] == ['blue']
+    assert index['ARD_2003.nc']['start'] == '2003-01-01T15:00:00'
+
+    # Index is reused, and only the overlapping ARD are opened
+    with mock.patch.object(ard, 'ard_index_entry') as entry, \
+            mock.patch.object(ard, 'open_ard_file',
+                              wraps=ard.open_ard_file) as open_:
+        ds = ard.open_ard(tmp_path, start='2004')
+    assert not entry.called
+    assert open_.call_count == 2
+    assert ds['time'].size == 8
+
+
+def test_open_ard_update_index(tmp_path):
+    _yearly_ard(tmp_path, [2000])
+    assert ard.open_ard(tmp_path)['time'].size == 4
+
+    _yearly_ard(tmp_path, [2001])
+    tmp_path.joinpath('ARD_2000.nc').unlink()
+    ds = ard.open_ard(tmp_path)
+    assert ds['time'].size == 4
+    assert int(ds['blue'][0, 0, 0]) == 2001
+
+    index = ard.read_ard_index(tmp_path.joinpath(defaults.ARD_INDEX_FILENAME))
+    assert list(index) == ['ARD_2001.nc']
+
+    with pytest.raises(FileNotFoundError, match=r'None of the 1 ARD'):
+        ard.open_ard(tmp_path, start='2010')
+
+
+@requires_zarr
+@pytest.mark.parametrize('zarr_kwds', [
+    {'zarr_format': 2, 'consolidated': False},
+    {'zarr_format': 2, 'consolidated': True},
+    {'zarr_format': 3, 'consolidated': False},
+])
+def test_open_ard_zarr_append(tmp_path, zarr_kwds):
+    import zarr
+    if not zarr.__version__.startswith('3'):
+        if zarr_kwds['zarr_format'] == 3:
+            pytest.skip('Zarr format 3 requires zarr>=3')
+        zarr_kwds = {'consolidated': zarr_kwds['consolidated']}
+
+    time = pd.date_range('2000-01-01', periods=4, freq='QS')
+    ds = xr.Dataset({'blue': (('time', 'y', 'x'),
+                              np.zeros((4, 5, 5), dtype=np.int16))},
+                    coords={'time': time, 'y': np.arange(5),
+                            'x': np.arange(5)})
+    dest = tmp_path.joinpath('ARD.zarr')
+    ds.to_zarr(str(dest), **zarr_kwds)
+    assert ard.open_ard(tmp_path)['time'].size == 4
+
+    # Reopening after appending sees the new times, not the stale index,
+    # even if the store directory itself isn't modified (e.g., by a copy)
+    stat = dest.stat()
+    ds = ds.assign_coords(time=time + pd.DateOffset(years=1))
+    ds.to_zarr(str(dest), mode='a', append_dim='time', **zarr_kwds)
+    os.utime(str(dest), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert ard.open_ard(tmp_path, start='2001')['time'].size == 4
+    assert ard.open_ard(tmp_path)['time'].size == 8
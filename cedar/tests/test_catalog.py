@@ -0,0 +1,52 @@
+""" Tests for :py:mod:`cedar.catalog`
+"""
+from cedar.catalog import ARDCatalog
+
+
+def _entry(path, h, v, year, collection='LANDSAT/LC08/C01/T1_SR'):
+    return {
+        'path': path,
+        'collection': collection,
+        'tile_horizontal': h,
+        'tile_vertical': v,
+        'date_start': f'{year}-01-01T00:00:00',
+        'date_end': f'{year}-12-31T00:00:00',
+        'n_time': 10,
+        'variables': ['blue', 'green'],
+        'format': 'netcdf',
+        'encoding': {'zlib': True},
+        'tracking': f'TRACKING_{year}'
+    }
+
+
+def test_catalog(tmp_path):
+    filename = tmp_path.joinpath('catalog.sqlite')
+    with ARDCatalog(filename) as cat:
+        cat.register(_entry('a.nc', 1, 2, 2000))
+        cat.register(_entry('b.nc', 1, 2, 2001))
+        cat.register(_entry('c.nc', 3, 4, 2001))
+        cat.register(_entry('d.nc', 3, 4, 2001, collection='OTHER'))
+        cat.register(_entry('a.nc', 1, 2, 2000))
+
+    # Reopened from disk
+    with ARDCatalog(filename) as cat:
+        assert len(cat) == 4
+        entry = cat.get('a.nc')
+        assert entry['variables'] == ['blue', 'green']
+        assert entry['encoding'] == {'zlib': True}
+        assert entry['updated']
+
+        def paths(**kwds):
+            return [e['path'] for e in cat.query(**kwds)]
+
+        assert paths() == ['a.nc', 'b.nc', 'c.nc', 'd.nc']
+        assert paths(tiles=[(1, 2)]) == ['a.nc', 'b.nc']
+        assert paths(tiles=[(1, 2), (3, 4)], start='2001-06-01',
+                     collection='LANDSAT/LC08/C01/T1_SR') == ['b.nc', 'c.nc']
+        assert paths(end='2000-12-31') == ['a.nc']
+        assert paths(tracking='TRACKING_2000') == ['a.nc']
+        assert paths(format='zarr') == []
+
+        assert cat.remove('a.nc')
+        assert not cat.remove('a.nc')
+        assert cat.get('a.nc') is None
@@ -0,0 +1,93 @@
+""" Tests for :py:mod:`cedar.chunks`
+"""
+import pytest
+
+from cedar import chunks, defaults
+from cedar.exceptions import MemoryLimitError
+
+
+def _layout(block_shape=(256, 256), interleave='band', count=70,
+            dtype='int16', height=5000, width=5000):
+    return {
+        'block_shape': block_shape,
+        'interleave': interleave,
+        'count': count,
+        'dtype': dtype,
+        'height': height,
+        'width': width
+    }
+
+
+@pytest.mark.parametrize(('block_shape', 'output_chunks', 'multiple_of'), [
+    ((256, 256), None, (256, 256)),
+    ((256, 256), {'y': 512, 'x': 512}, (512, 512)),
+    ((256, 256), {'y': 300, 'x': 300}, (300, 300)),
+    ((512, 512), {'y': 128, 'x': 100}, (512, 100)),
+])
+def test_plan_preard_chunks_aligned(block_shape, output_chunks, multiple_of):
+    layout = _layout(block_shape=block_shape)
+    ans = chunks.plan_preard_chunks(layout, 7, output_chunks=output_chunks,
+                                    chunk_bytes=2 ** 26)
+    for dim, n in zip(('y', 'x'), multiple_of):
+        assert ans[dim] % n == 0
+    assert 70 * ans['y'] * ans['x'] * 2 <= 2 ** 26
+
+
+@pytest.mark.parametrize(('interleave', 'time', 'band'), [
+    ('pixel', 2, -1),
+    ('band', None, -1),
+    ('band', 2, 14),
+    ('band', 100, -1),
+])
+def test_plan_preard_chunks_band(interleave, time, band):
+    layout = _layout(interleave=interleave)
+    output_chunks = {'time': time} if time else None
+    ans = chunks.plan_preard_chunks(layout, 7, output_chunks=output_chunks)
+    assert ans['band'] == band
+
+
+def test_plan_preard_chunks_small():
+    layout = _layout(height=100, width=150)
+    ans = chunks.plan_preard_chunks(layout, 7)
+    assert ans['y'] == 100
+    assert ans['x'] == 150
+
+
+def test_estimate_task_memory():
+    layout = _layout()
+    n = chunks.estimate_task_memory(layout, {'band': -1, 'y': 256, 'x': 512})
+    assert n == 70 * 256 * 512 * 2 * defaults.PREARD_TASK_MEMORY_FACTOR
+
+
+@pytest.mark.parametrize('memory_limit', [2 ** 30, 2 ** 28, 2 ** 26])
+def test_plan_memory(memory_limit):
+    layout = _layout(interleave='pixel')
+    ans = chunks.plan_memory(layout, 7, memory_limit, n_threads=8,
+                             output_chunks={'y': 256, 'x': 256})
+    assert ans['n_threads'] >= 1
+    assert ans['n_threads'] * ans['task_bytes'] <= memory_limit
+    assert ans['task_bytes'] == chunks.estimate_task_memory(layout,
+                                                            ans['chunks'])
+
+
+def test_plan_memory_fewer_threads():
+    # One aligned chunk uses 70 x 256 x 256 x 2 x 3 bytes (~26 MiB)
+    layout = _layout(interleave='pixel')
+    ans = chunks.plan_memory(layout, 7, 2 ** 26, n_threads=8,
+                             output_chunks={'y': 256, 'x': 256})
+    assert ans['chunks'] == {'band': -1, 'y': 256, 'x': 256}
+    assert ans['n_threads'] == 2
+
+
+def test_plan_memory_split():
+    layout = _layout(interleave='pixel')
+    ans = chunks.plan_memory(layout, 7, 2 ** 24, n_threads=1,
+                             output_chunks={'y': 256, 'x': 256})
+    assert ans['chunks']['band'] % 7 == 0
+    assert ans['task_bytes'] <= 2 ** 24
+
+
+def test_plan_memory_too_small():
+    layout = _layout(interleave='pixel')
+    with pytest.raises(MemoryLimitError, match='memory limit'):
+        chunks.plan_memory(layout, 7, 2 ** 20, n_threads=1)
@@ -0,0 +1,331 @@
+""" Tests for :py:mod:`cedar.convert`
+"""
+import os
+
+import dask
+import dask.array as da
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from cedar import convert, preard
+from cedar.convert import CONVERT_STATES
+from cedar.tests import requires_zarr
+
+
+def _ard_ds(shape=(3, 8, 12), chunks=(3, 4, 4), start='2000-01-01'):
+    data = np.arange(np.prod(shape), dtype='int16').reshape(shape)
+    coords = {
+        'time': pd.date_range(start, periods=shape[0]),
+        'y': np.arange(shape[1]),
+        'x': np.arange(shape[2])
+    }
+    return xr.Dataset({
+        'blue': (('time', 'y', 'x'), da.from_array(data, chunks=chunks)),
+        'green': (('time', 'y', 'x'), da.from_array(data + 1, chunks=chunks))
+    }, coords=coords)
+
+
+@requires_zarr
+def test_write_ard_zarr(tmp_path):
+    ard_ds = _ard_ds()
+    ard_ds['blue'][0, 0, 0] = -9999
+    encoding = preard.ard_zarr_encoding(ard_ds, {'image': {'nodata': -9999}},
+                                        chunks={'time': 2, 'y': 4, 'x': 6},
+                                        compressor='zlib', complevel=3)
+    dest = tmp_path.joinpath('ARD.zarr')
+    convert.write_ard_zarr(ard_ds, dest, encoding)
+
+    # Zarr format 2, whichever version of zarr wrote it
+    assert dest.joinpath('.zgroup').exists()
+    ans = xr.open_zarr(str(dest))
+    for var in ard_ds.data_vars:
+        enc = ans[var].encoding
+        assert enc['chunks'] == (2, 4, 6)
+        compressor = (enc['compressors'][0] if 'compressors' in enc
+                      else enc['compressor'])
+        assert compressor.level == 3
+        assert ans[var].encoding['_FillValue'] == -9999
+    assert np.isnan(ans['blue'][0, 0, 0])
+    xr.testing.assert_equal(ans.fillna(-9999).astype('int16').load(),
+                            ard_ds.load())
+
+
+@requires_zarr
+def test_write_ard_zarr_failed(tmp_path, monkeypatch):
+    # Existing ARD is kept until the new ARD is written
+    dest = tmp_path.joinpath('ARD.zarr')
+    existing = _ard_ds(shape=(2, 8, 12))
+    encoding = {var: {'chunks': (3, 4, 4)} for var in existing.data_vars}
+    convert.write_ard_zarr(existing, dest, encoding)
+
+    def fail(block):
+        raise RuntimeError('Interrupted')
+
+    failing = _ard_ds()
+    failing['blue'].data = failing['blue'].data.map_blocks(fail,
+                                                           dtype='int16')
+    with pytest.raises(RuntimeError, match='Interrupted'):
+        convert.write_ard_zarr(failing, dest, encoding)
+
+    xr.testing.assert_equal(xr.open_zarr(str(dest)).load(), existing.load())
+
+    convert.write_ard_zarr(_ard_ds(), dest, encoding)
+    xr.testing.assert_equal(xr.open_zarr(str(dest)).load(),
+                            _ard_ds().load())
+
+
+@pytest.mark.parametrize('options', [
+    {'statistics': True},
+    {'decode_qa': True},
+    {'empty_slices': 'flag'},
+])
+def test_convert_preard_options_stale(tmp_path, monkeypatch, options):
+    # Converted again if options changing the ARD change
+    metadata = tmp_path.joinpath('ORDER.json')
+    metadata.write_text('{"task": {"status": {"state": "COMPLETED"}}}')
+    images = [tmp_path.joinpath('ORDER.tif')]
+    images[0].write_bytes(b'0')
+    dest_dir = tmp_path.joinpath('ARD')
+
+    def write_ard(ard_ds, dest, encoding, **kwds):
+        dest.write_text('ARD')
+
+    monkeypatch.setattr(convert, 'create_dest_dir', lambda *args: dest_dir)
+    monkeypatch.setattr(convert, 'write_ard', write_ard)
+    monkeypatch.setattr(preard, 'process_preard', lambda *a, **k: _ard_ds())
+    monkeypatch.setattr(preard, 'ard_encoding', lambda *a, **k: {})
+
+    def state(**kwds):
+        result = convert.convert_preard(metadata, images, 'ARD',
+                                        skip_metadata=True, **kwds)
+        return result['state'], result.get('stale', [])
+
+    assert state() == (CONVERT_STATES.CONVERTED, [])
+    assert state() == (CONVERT_STATES.EXISTS, [])
+    state_, stale = state(**options)
+    assert state_ == CONVERT_STATES.CONVERTED
+    assert f'"{list(options)[0]}" option changed' in stale
+    assert state(**options) == (CONVERT_STATES.EXISTS, [])
+    assert state()[0] == CONVERT_STATES.CONVERTED
+
+
+@requires_zarr
+def test_write_ard_zarr_resume(tmp_path, monkeypatch):
+    ard_ds = _ard_ds()
+    encoding = {var: {'chunks': (3, 4, 4)} for var in ard_ds.data_vars}
+    dest = tmp_path.joinpath('ARD.zarr')
+    n_regions = 2 * 3
+
+    # Interrupt after writing 2 regions
+    calls = []
+    compute = dask.compute
+
+    def interrupted(*args, **kwds):
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        calls.append(len(args))
+        return compute(*args, **kwds)
+
+    monkeypatch.setattr(dask, 'compute', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        convert.write_ard_zarr(ard_ds, dest, encoding, resume=True,
+                               n_regions=1)
+    assert not dest.exists()
+    assert tmp_path.joinpath('ARD.zarr.partial').exists()
+    assert tmp_path.joinpath('ARD.zarr.partial.checkpoint').exists()
+
+    # Resume, writing only what's left
+    calls.clear()
+    monkeypatch.setattr(dask, 'compute',
+                        lambda *a, **k: calls.append(len(a)) or compute(*a))
+    convert.write_ard_zarr(ard_ds, dest, encoding, resume=True, n_regions=1)
+    assert len(calls) == n_regions - 2
+    assert not tmp_path.joinpath('ARD.zarr.partial').exists()
+    assert not tmp_path.joinpath('ARD.zarr.partial.checkpoint').exists()
+
+    ans = xr.open_zarr(str(dest))
+    xr.testing.assert_equal(ans.load(), ard_ds.load())
+
+
+@requires_zarr
+def test_write_ard_zarr_resume_different(tmp_path):
+    # Checkpoint for different ARD starts over
+    dest = tmp_path.joinpath('ARD.zarr')
+    ard_ds = _ard_ds()
+    encoding = {var: {'chunks': (3, 4, 4)} for var in ard_ds.data_vars}
+    partial = tmp_path.joinpath('ARD.zarr.partial')
+    _ard_ds(shape=(2, 8, 12)).to_zarr(str(partial))
+    tmp_path.joinpath('ARD.zarr.partial.checkpoint').write_text(
+        '{"signature": "different"}\n[[0, 4], [0, 4]]\n')
+
+    convert.write_ard_zarr(ard_ds, dest, encoding, resume=True)
+    ans = xr.open_zarr(str(dest))
+    xr.testing.assert_equal(ans.load(), ard_ds.load())
+
+
+def _convert_group(group, dest_dir_template, **convert_kwds):
+    results = []
+    for meta, images in group:
+        if meta == 'CRASH':
+            os._exit(1)  # e.g., killed for using too much memory
+        elif meta == 'FAIL':
+            raise RuntimeError('Cannot run order')
+        results.append({'preard': meta, 'state': 'CONVERTED'})
+    return results
+
+
+@pytest.mark.parametrize(('order_pool', 'bad'), [
+    ('threads', 'FAIL'),
+    ('processes', 'FAIL'),
+    ('processes', 'CRASH'),
+])
+def test_convert_preard_orders_failed(monkeypatch, order_pool, bad):
+    monkeypatch.setattr(convert, '_convert_preard_group', _convert_group)
+    preard = {name: [] for name in ('A', bad, 'B', 'C')}
+
+    results = list(convert.convert_preard_orders(
+        preard, 'DEST', n_orders=2, order_pool=order_pool))
+    states = {r['preard']: r['state'] for r in results}
+    assert states == {'A': 'CONVERTED', bad: 'FAILED',
+                      'B': 'CONVERTED', 'C': 'CONVERTED'}
+    assert [r for r in results if r['preard'] == bad][0]['error']
+
+
+def test_convert_preard_isolated(monkeypatch):
+    def convert_preard(metadata_filename, images, dest_dir_template,
+                       **kwds):
+        assert dask.config.get('num_workers') == 3
+        raise ValueError('Bad order')
+
+    monkeypatch.setattr(convert, 'convert_preard', convert_preard)
+    result = convert._convert_preard_isolated('ORDER.json', [], 'DEST',
+                                              n_threads=3)
+    assert result['state'] == convert.CONVERT_STATES.FAILED
+    assert result['error'] == 'ValueError: Bad order\n'
+
+
+# =============================================================================
+# Appending
+@requires_zarr
+def test_append_ard_zarr(tmp_path):
+    dest = tmp_path.joinpath('ARD.zarr')
+    existing = _ard_ds(chunks=(3, 8, 12))
+    existing.attrs['history'] = 'Created'
+    encoding = {var: {'chunks': (2, 4, 4)} for var in existing.data_vars}
+    assert convert.append_ard_zarr(existing, dest, encoding) == 3
+
+    # First time overlaps the existing ARD, so it's skipped
+    new = _ard_ds(shape=(4, 8, 12), chunks=(4, 8, 12), start='2000-01-03')
+    new.attrs['history'] = 'Appended'
+    assert convert.append_ard_zarr(new, dest, encoding) == 3
+
+    ans = xr.open_zarr(str(dest))
+    assert list(ans['time'].values) == list(
+        pd.date_range('2000-01-01', periods=6).values)
+    xr.testing.assert_equal(ans.isel(time=slice(3, None)).load(),
+                            new.isel(time=slice(1, None)).load())
+    assert ans['blue'].encoding['chunks'] == (2, 4, 4)
+    assert ans.attrs['history'] == 'Created\nAppended'
+
+    # Appending the same ARD again does nothing
+    assert convert.append_ard_zarr(new, dest, encoding) == 0
+
+
+@requires_zarr
+def test_append_ard_zarr_before(tmp_path):
+    dest = tmp_path.joinpath('ARD.zarr')
+    existing = _ard_ds(start='2000-01-10')
+    convert.append_ard_zarr(existing, dest, {})
+
+    with pytest.raises(ValueError, match=r'before the last time'):
+        convert.append_ard_zarr(_ard_ds(start='2000-01-01'), dest, {})
+    # Between existing times
+    with pytest.raises(ValueError, match=r'before the last time'):
+        convert.append_ard_zarr(_ard_ds(start='2000-01-10T12'), dest, {})
+    assert xr.open_zarr(str(dest))['time'].size == 3
+
+
+def _with_images(ard_ds, images):
+    return ard_ds.assign_coords(**preard.preard_image_coords(images))
+
+
+@requires_zarr
+def test_append_ard_zarr_image_coords(tmp_path):
+    dest = tmp_path.joinpath('ARD.zarr')
+    existing = _with_images(_ard_ds(), [
+        [{'system:time_start': 946684800000.0, 'WRS_ROW': 30.0,
+          'CLOUD_COVER': 10.0, 'LANDSAT_ID': 'A'}]
+    ] * 3)
+    convert.append_ard_zarr(existing, dest, {})
+
+    # Missing "CLOUD_COVER" and "LANDSAT_ID", and an extra "SUN_ELEVATION"
+    new = _with_images(_ard_ds(start='2000-01-04'), [
+        [{'system:time_start': 947030400000.0, 'WRS_ROW': 31.0,
+          'SUN_ELEVATION': 45.0}]
+    ] * 3)
+    assert convert.append_ard_zarr(new, dest, {}) == 3
+
+    ans = xr.open_zarr(str(dest)).load()
+    assert ans['time'].size == 6
+    assert 'SUN_ELEVATION' not in ans.variables
+    assert ans['WRS_ROW'].dtype == np.int64
+    assert list(ans['WRS_ROW'].values) == [30] * 3 + [31] * 3
+    np.testing.assert_equal(ans['CLOUD_COVER'].values,
+                            [10.0] * 3 + [np.nan] * 3)
+    assert list(ans['LANDSAT_ID'].values) == ['A'] * 3 + [''] * 3
+    assert ans['system_time_start'].notnull().all()
+
+
+@requires_zarr
+def test_append_ard_zarr_image_coords_dtype(tmp_path):
+    dest = tmp_path.joinpath('ARD.zarr')
+    existing = _with_images(_ard_ds(), [[{'WRS_ROW': 30.0}]] * 3)
+    convert.append_ard_zarr(existing, dest, {})
+
+    # Can't store a missing WRS row as an integer
+    new = _with_images(_ard_ds(start='2000-01-04'),
+                       [[{'WRS_ROW': 31.0}], [{}], [{'WRS_ROW': 31.0}]])
+    with pytest.raises(ValueError, match=r'"WRS_ROW" has a different'):
+        convert.append_ard_zarr(new, dest, {})
+    new = _with_images(_ard_ds(start='2000-01-04'), [[{}]] * 3)
+    with pytest.raises(ValueError, match=r'missing image metadata "WRS_ROW"'):
+        convert.append_ard_zarr(new, dest, {})
+    assert xr.open_zarr(str(dest))['time'].size == 3
+
+
+@requires_zarr
+@pytest.mark.parametrize(('existing_kwds', 'new_kwds'), [
+    ({'empty_slices': 'flag'}, {}),
+    ({}, {'empty_slices': 'flag'}),
+    ({'empty_slices': 'flag'}, {'empty_slices': 'drop'}),
+    ({'statistics': True}, {}),
+    ({}, {'decode_qa': True}),
+])
+def test_append_ard_zarr_options(tmp_path, existing_kwds, new_kwds):
+    def convert_(ard_ds, empty_slices=None, statistics=False,
+                 decode_qa=False):
+        if empty_slices:
+            ard_ds = preard._EMPTY_SLICES[empty_slices](ard_ds)
+        if statistics:
+            ard_ds = ard_ds.assign_coords(**preard.ard_statistics(ard_ds))
+        if decode_qa:
+            ard_ds['qa_mask'] = ard_ds['blue'] > 0
+        return ard_ds
+
+    dest = tmp_path.joinpath('ARD.zarr')
+    convert.append_ard_zarr(convert_(_ard_ds(), **existing_kwds), dest, {})
+
+    new = convert_(_ard_ds(start='2000-01-04'), **new_kwds)
+    with pytest.raises(ValueError, match=r'same options'):
+        convert.append_ard_zarr(new, dest, {})
+    assert xr.open_zarr(str(dest))['time'].size == 3
+
+
+def test_align_zarr_chunks():
+    ard_ds = _ard_ds(shape=(5, 8, 12), chunks=(5, 8, 12))
+    ans = convert._align_zarr_chunks(ard_ds, {'blue': (2, 4, 4)},
+                                     offsets={'time': 3})
+    assert ans['blue'].chunks == ((1, 2, 2), (4, 4), (4, 4, 4))
+    assert ans['green'].chunks == ard_ds['green'].chunks
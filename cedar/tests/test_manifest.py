@@ -0,0 +1,102 @@
+""" Tests for :py:mod:`cedar.manifest`
+"""
+import os
+
+import pytest
+
+from cedar import manifest
+
+
+@pytest.fixture
+def order(tmp_path):
+    metadata = tmp_path.joinpath('ORDER.json')
+    metadata.write_text('{"a": 1}')
+    images = [tmp_path.joinpath(f'ORDER-{i}.tif') for i in range(2)]
+    for image in images:
+        image.write_bytes(b'1234')
+    dest = tmp_path.joinpath('ORDER.nc')
+    filename = manifest.manifest_filename(dest)
+    manifest.write_manifest(
+        manifest.create_manifest(metadata, images, 'netcdf', {'zlib': True}),
+        filename
+    )
+    return filename, metadata, images
+
+
+def test_manifest_filename(tmp_path):
+    ans = manifest.manifest_filename(tmp_path.joinpath('ORDER.zarr'))
+    assert ans == tmp_path.joinpath('ORDER.zarr.manifest.json')
+
+
+def test_check_manifest_current(order):
+    filename, metadata, images = order
+    assert manifest.check_manifest(filename, metadata, images,
+                                   'netcdf', {'zlib': True}) == []
+
+
+def test_check_manifest_missing(tmp_path, order):
+    _, metadata, images = order
+    ans = manifest.check_manifest(tmp_path.joinpath('missing.json'),
+                                  metadata, images)
+    assert ans == ['no manifest']
+
+
+@pytest.mark.parametrize(('format_', 'encoding', 'n'), [
+    ('zarr', {'zlib': True}, 1),
+    ('netcdf', {'zlib': False}, 1),
+    ('zarr', None, 2),
+])
+def test_check_manifest_options(order, format_, encoding, n):
+    filename, metadata, images = order
+    ans = manifest.check_manifest(filename, metadata, images,
+                                  format_, encoding)
+    assert len(ans) == n
+
+
+@pytest.mark.parametrize(('previous', 'options', 'ans'), [
+    (None, None, []),
+    (None, {'statistics': True}, ['"statistics" option changed']),
+    ({'statistics': True}, None, ['"statistics" option changed']),
+    ({'empty_slices': 'flag', 'empty_threshold': 0.},
+     {'empty_slices': 'flag', 'empty_threshold': 0.1},
+     ['"empty_threshold" option changed']),
+    ({'decode_qa': True}, {'decode_qa': True}, []),
+])
+def test_check_manifest_conversion_options(order, previous, options, ans):
+    filename, metadata, images = order
+    manifest.write_manifest(
+        manifest.create_manifest(metadata, images, 'netcdf', {'zlib': True},
+                                 options=previous),
+        filename
+    )
+    assert manifest.check_manifest(filename, metadata, images,
+                                   'netcdf', {'zlib': True},
+                                   options=options) == ans
+
+
+def test_check_manifest_touched(order):
+    filename, metadata, images = order
+    # Same contents, new modification time
+    images[0].write_bytes(b'1234')
+    os.utime(str(images[0]), (0, 0))
+    assert manifest.check_manifest(filename, metadata, images,
+                                   'netcdf', {'zlib': True}) == []
+    info = manifest.read_manifest(filename)['images'][0]
+    assert info['mtime'] == 0
+
+
+@pytest.mark.parametrize('contents', [b'4321', b'12345'])
+def test_check_manifest_changed(order, contents):
+    filename, metadata, images = order
+    images[1].write_bytes(contents)
+    os.utime(str(images[1]), (0, 0))
+    ans = manifest.check_manifest(filename, metadata, images,
+                                  'netcdf', {'zlib': True})
+    assert ans == ['"ORDER-1.tif" changed']
+
+
+def test_check_manifest_files_changed(order):
+    filename, metadata, images = order
+    ans = manifest.check_manifest(filename, metadata, images[:1],
+                                  'netcdf', {'zlib': True})
+    assert ans == ['pre-ARD files changed']
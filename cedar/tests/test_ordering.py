@@ -0,0 +1,150 @@
+""" Tests for :py:mod:`cedar.ordering`
+"""
+import datetime as dt
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from cedar import ordering
+from cedar.sensors.inventory import SceneInventory
+from cedar.exceptions import (EmptyCollectionError, OrderAddError,
+                              OrderEmptyCollectionError)
+
+
+class _Tile(object):
+    def __init__(self, horizontal, vertical):
+        self.horizontal = horizontal
+        self.vertical = vertical
+        self.bbox = mock.Mock(bounds=(horizontal, vertical,
+                                      horizontal + 1, vertical + 1))
+        self.crs = mock.Mock(wkt='EPSG:5070')
+
+    def __format__(self, spec):
+        return f'h{self.horizontal:03d}v{self.vertical:03d}'
+
+
+def _requests(n):
+    return [{
+        'collection': 'TEST',
+        'tile': _Tile(i, 0),
+        'date_start': dt.datetime(2000 + i, 1, 1),
+        'date_end': dt.datetime(2001 + i, 1, 1),
+    } for i in range(n)]
+
+
+def _create_ard(collection, tile, date_start, date_end, filters=None):
+    # Later requests finish first
+    time.sleep(0.01 * (5 - tile.horizontal))
+    if tile.horizontal == 3:
+        raise ValueError('Bad tile')
+    return threading.get_ident(), {'images': [str(date_start)]}
+
+
+@pytest.fixture
+def create_ard():
+    with mock.patch.dict(ordering.CREATE_ARD_COLLECTION,
+                         {'TEST': _create_ard}):
+        yield
+
+
+def test_order_add_many(create_ard):
+    order = ordering.Order('TRACKING', 'PREFIX',
+                           name_template='{collection}_{tile}')
+    order.add_many(_requests(3), max_workers=3)
+    assert [item['name'] for item in order._items] == [
+        'TEST_h000v000', 'TEST_h001v000', 'TEST_h002v000'
+    ]
+    assert len(set(item['image'] for item in order._items)) > 1
+
+
+def test_order_add_many_errors(create_ard):
+    order = ordering.Order('TRACKING', 'PREFIX')
+    with pytest.raises(OrderAddError, match=r'1 pre-ARD') as exc:
+        order.add_many(_requests(5), max_workers=2)
+    assert len(exc.value.errors) == 1
+    assert exc.value.errors[0][0]['tile'].horizontal == 3
+    assert isinstance(exc.value.errors[0][1], ValueError)
+    assert len(order) == 0
+
+
+def test_order_add_many_empty():
+    def create_ard_empty(collection, tile, date_start, date_end,
+                         filters=None):
+        if tile.horizontal == 3:
+            raise ValueError('Bad tile')
+        return None, {'images': [] if tile.horizontal % 2 else ['IMAGE']}
+
+    order = ordering.Order('TRACKING', 'PREFIX')
+    with mock.patch.dict(ordering.CREATE_ARD_COLLECTION,
+                         {'TEST': create_ard_empty}):
+        # Only empty results
+        with pytest.raises(EmptyCollectionError, match=r'1 pre-ARD') as exc:
+            order.add_many(_requests(3), error_if_empty=True)
+        assert isinstance(exc.value, OrderEmptyCollectionError)
+        assert isinstance(exc.value, OrderAddError)
+        assert len(order) == 0
+
+        # Also other errors
+        with pytest.raises(OrderAddError, match=r'2 pre-ARD') as exc:
+            order.add_many(_requests(4), error_if_empty=True)
+        assert not isinstance(exc.value, EmptyCollectionError)
+
+        order.add_many(_requests(3))
+        assert len(order) == 3
+
+
+def test_order_add_many_plan(create_ard):
+    calls = []
+
+    def plan_ard(requests, batch_size=None):
+        calls.append(len(requests))
+        return [{'dates': [r['date_start']]} for r in requests]
+
+    def create_ard_plan(collection, tile, date_start, date_end,
+                        filters=None, plan=None):
+        assert plan == {'dates': [date_start]}
+        return None, {'images': [plan]}
+
+    order = ordering.Order('TRACKING', 'PREFIX')
+    with mock.patch.dict(ordering.PLAN_ARD_COLLECTION, {'TEST': plan_ard}), \
+            mock.patch.dict(ordering.CREATE_ARD_COLLECTION,
+                            {'TEST': create_ard_plan}):
+        order.add_many(_requests(4))
+        assert calls == [4]
+        assert len(order) == 4
+
+        with mock.patch.dict(ordering.PLAN_ARD_COLLECTION,
+                             {'TEST': mock.Mock(side_effect=IOError)}):
+            with pytest.raises(OrderAddError, match=r'4 pre-ARD'):
+                order.add_many(_requests(4))
+
+
+def test_order_add_many_inventory(tmp_path):
+    def plan_ard(requests, batch_size=None, inventory=None):
+        plans = []
+        for request in requests:
+            plan = inventory.get(**request)
+            if plan is None:
+                plan = {'dates': [request['date_start']], 'metadata': None}
+                inventory.put(plan=plan, **request)
+            plans.append(plan)
+        return plans
+
+    def create_ard_plan(collection, tile, date_start, date_end,
+                        filters=None, plan=None, inventory=None):
+        return None, {'images': plan['dates']}
+
+    # Empty inventories are still used, and filled
+    scenes = SceneInventory(tmp_path.joinpath('inventory.sqlite'), min_age=0)
+    assert len(scenes) == 0
+
+    order = ordering.Order('TRACKING', 'PREFIX',
+                           name_template='{collection}_{tile}')
+    with mock.patch.dict(ordering.PLAN_ARD_COLLECTION, {'TEST': plan_ard}), \
+            mock.patch.dict(ordering.CREATE_ARD_COLLECTION,
+                            {'TEST': create_ard_plan}):
+        order.add_many(_requests(3), inventory=scenes)
+    assert len(order) == 3
+    assert len(scenes) == 3
@@ -0,0 +1,173 @@
+""" Tests for :py:mod:`cedar.pipeline`
+"""
+import json
+import os
+from pathlib import Path
+import threading
+import time
+
+import pytest
+
+from cedar import pipeline
+from cedar.convert import CONVERT_STATES
+from cedar.utils import EE_STATES
+
+
+class _Store(object):
+    """ Store retrieving from and removing files in a local directory
+    """
+    def __init__(self, root):
+        self.root = Path(root)
+        self.retrieved = []
+
+    def _retrieve(self, dest, name, ext):
+        for src in sorted(self.root.glob(f'{name}*.{ext}')):
+            dst = Path(dest).joinpath(src.name)
+            dst.write_bytes(src.read_bytes())
+            self.retrieved.append(src.name)
+            yield dst
+
+    def retrieve_metadata(self, dest, name, path=None, overwrite=True):
+        return self._retrieve(dest, name, 'json')
+
+    def retrieve_image(self, dest, name, path=None, overwrite=True):
+        return self._retrieve(dest, name, 'tif')
+
+    def list(self, path=None, pattern=None):
+        return [p.name for p in self.root.glob(f'{pattern}*')]
+
+    def remove(self, name, path=None):
+        self.root.joinpath(name).unlink()
+        return name
+
+
+@pytest.fixture
+def tracked(tmp_path):
+    root = tmp_path.joinpath('store')
+    root.mkdir()
+    orders = []
+    for i, state in enumerate([EE_STATES.COMPLETED, EE_STATES.RUNNING,
+                               EE_STATES.COMPLETED, EE_STATES.COMPLETED]):
+        name = f'ORDER{i}'
+        root.joinpath(f'{name}.json').write_text('{}')
+        for j in range(2):
+            root.joinpath(f'{name}-{j}.tif').write_bytes(b'0')
+        orders.append({'name': name, 'prefix': 'PREFIX',
+                       'status': {'id': str(i), 'state': state}})
+    return {'orders': orders}, _Store(root)
+
+
+@pytest.mark.parametrize('n_orders', [1, 2])
+def test_pipeline_tracked(tmp_path, monkeypatch, tracked, n_orders):
+    tracking_info, store = tracked
+    download_dir = tmp_path.joinpath('download')
+    in_flight, max_in_flight = set(), []
+    lock = threading.Lock()
+
+    def fake_convert(metadata_filename, images, dest_dir_template, **kwds):
+        with lock:
+            in_flight.add(metadata_filename.stem)
+            max_in_flight.append(len(in_flight))
+            on_disk = set(p.stem for p in download_dir.glob('*.json'))
+        assert len(images) == 2
+
+        # The next order is downloaded while this one is converted
+        overlapped = False
+        if metadata_filename.stem == 'ORDER0':
+            for _ in range(100):
+                if 'ORDER2.json' in store.retrieved:
+                    overlapped = True
+                    break
+                time.sleep(0.05)
+
+        with lock:
+            in_flight.remove(metadata_filename.stem)
+        state = (CONVERT_STATES.FAILED if metadata_filename.stem == 'ORDER3'
+                 else CONVERT_STATES.CONVERTED)
+        return {'preard': str(metadata_filename), 'state': state,
+                'on_disk': on_disk, 'overlapped': overlapped}
+
+    monkeypatch.setattr(pipeline, '_convert_preard_isolated', fake_convert)
+
+    results = list(pipeline.pipeline_tracked(
+        tracking_info, store, download_dir, 'ARD',
+        n_orders=n_orders, order_pool='threads', clean=True
+    ))
+    results = {Path(r['preard']).stem: r for r in results}
+
+    assert results['ORDER1']['state'] == CONVERT_STATES.INCOMPLETE
+    assert results['ORDER0']['overlapped']
+    assert max(max_in_flight) <= n_orders
+    for result in results.values():
+        assert len(result.get('on_disk', ())) <= n_orders + 1
+
+    # Converted orders are deleted locally and cleaned from the store
+    assert len(results['ORDER0']['cleaned']) == 3
+    assert not list(store.root.glob('ORDER0*'))
+    # Failed orders are kept so they can be retried
+    assert results['ORDER3']['cleaned'] == []
+    assert len(list(download_dir.glob('ORDER3*'))) == 3
+    assert len(list(store.root.glob('ORDER3*'))) == 3
+    # Incomplete orders aren't touched
+    assert len(list(store.root.glob('ORDER1*'))) == 3
+    assert not list(download_dir.glob('ORDER1*'))
+
+
+def _convert_or_fail(metadata_filename, images, dest_dir_template, **kwds):
+    if metadata_filename.stem == 'ORDER2':
+        os._exit(1)  # the worker process dies
+    if metadata_filename.stem == 'ORDER3':
+        raise RuntimeError('Not caught')
+    return {'preard': str(metadata_filename),
+            'state': CONVERT_STATES.CONVERTED}
+
+
+@pytest.mark.parametrize('order_pool', ['threads', 'processes'])
+def test_pipeline_tracked_failed(tmp_path, monkeypatch, tracked, order_pool):
+    tracking_info, store = tracked
+    download_dir = tmp_path.joinpath('download')
+    if order_pool == 'threads':
+        # Don't kill the test process
+        tracking_info['orders'] = tracking_info['orders'][:2] + \
+            tracking_info['orders'][3:]
+    monkeypatch.setattr(pipeline, '_convert_preard_isolated',
+                        _convert_or_fail)
+
+    results = list(pipeline.pipeline_tracked(
+        tracking_info, store, download_dir, 'ARD',
+        n_orders=2, order_pool=order_pool
+    ))
+    results = {Path(r['preard']).stem: r for r in results}
+
+    assert results['ORDER0']['state'] == CONVERT_STATES.CONVERTED
+    assert results['ORDER3']['state'] == CONVERT_STATES.FAILED
+    assert 'Not caught' in results['ORDER3']['error']
+    assert len(list(download_dir.glob('ORDER3*'))) == 3
+    if order_pool == 'processes':
+        assert results['ORDER2']['state'] == CONVERT_STATES.FAILED
+        assert len(list(download_dir.glob('ORDER2*'))) == 3
+
+
+def test_pipeline_tracked_append_order(tmp_path, monkeypatch, tracked):
+    tracking_info, store = tracked
+    dates = {'ORDER0': '2002-01-01', 'ORDER2': '2000-01-01',
+             'ORDER3': '2001-01-01'}
+    for name, date in dates.items():
+        store.root.joinpath(f'{name}.json').write_text(
+            json.dumps({'order': {'date_start': date}}))
+    converted = []
+
+    def fake_convert(metadata_filename, images, dest_dir_template, **kwds):
+        converted.append(metadata_filename.stem)
+        return {'preard': str(metadata_filename),
+                'state': CONVERT_STATES.APPENDED}
+
+    monkeypatch.setattr(pipeline, '_convert_preard_isolated', fake_convert)
+    monkeypatch.setattr(pipeline, '_append_key', lambda *args: 'ARD')
+
+    list(pipeline.pipeline_tracked(
+        tracking_info, store, tmp_path.joinpath('download'), 'ARD',
+        n_orders=2, order_pool='threads', append=True
+    ))
+    # Appended in time order, not the order tracked
+    assert converted == ['ORDER2', 'ORDER3', 'ORDER0']
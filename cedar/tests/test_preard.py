@@ -1,3 +1,265 @@
 """ Tests for :py:mod:`cedar.preard`
 """
+from affine import Affine
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
 from cedar import preard
+from cedar.tests import requires_zarr
+
+
+# =============================================================================
+# read_preard
+@pytest.mark.parametrize('chunks', [
+    {'band': -1, 'y': 100, 'x': 100},
+    {'band': 2, 'y': 64, 'x': 200},
+])
+def test_read_preard_mosaic(tmp_path, chunks):
+    data, filenames = write_preard_shards(tmp_path, shape=(6, 300, 500),
+                                          shard_size=128)
+    # Order of filenames shouldn't matter
+    da = preard.read_preard(filenames[::-1], chunks=chunks)
+    assert da.shape == data.shape
+    np.testing.assert_array_equal(da.values, data)
+    # Pixel center coordinates
+    assert da['x'].values[0] == 1015.
+    assert da['y'].values[0] == 4985.
+
+
+def test_read_preard_mosaic_geotransform(tmp_path):
+    # Without "-{ymin}-{xmin}" suffix, shards are located by geotransform
+    data, filenames = write_preard_shards(tmp_path, shape=(2, 100, 150),
+                                          shard_size=64, suffix=False)
+    da = preard.read_preard(filenames, chunks={'y': 50, 'x': 50})
+    np.testing.assert_array_equal(da.values, data)
+
+
+@pytest.mark.parametrize(('filename', 'offset'), [
+    ('X_2012-01-01_2017-01-01-0000001024-0000002048.tif', (1024, 2048)),
+    ('X_2012-01-01_2017-01-01.tif', None),
+])
+def test_parse_shard_offset(filename, offset):
+    assert preard._parse_shard_offset(filename) == offset
+
+
+# =============================================================================
+# preard_to_ard
+@pytest.mark.parametrize('band_chunks', [None, -1, 6, 5])
+def test_preard_to_ard(band_chunks):
+    bands = ['blue', 'green', 'red']
+    time = pd.date_range('2000-01-01', periods=4, freq='16D').values
+    data = np.arange(12 * 5 * 4).reshape(12, 5, 4)
+    xarr = xr.DataArray(data, dims=('band', 'y', 'x'),
+                        coords={'band': np.arange(1, 13),
+                                'y': np.arange(5), 'x': np.arange(4)})
+    if band_chunks is not None:
+        xarr = xarr.chunk({'band': band_chunks, 'y': 2, 'x': 2})
+
+    ard = preard.preard_to_ard(xarr, time, bands)
+
+    assert list(ard.data_vars) == bands
+    for i, band in enumerate(bands):
+        assert ard[band].dims == ('time', 'y', 'x')
+        np.testing.assert_array_equal(ard[band].values, data[i::3])
+        np.testing.assert_array_equal(ard[band]['time'].values, time)
+
+
+def test_preard_to_ard_mismatch():
+    xarr = xr.DataArray(np.zeros((5, 2, 2)), dims=('band', 'y', 'x'))
+    with pytest.raises(ValueError, match=r'\(5\)'):
+        preard.preard_to_ard(xarr, np.arange(2), ['blue', 'green'])
+
+
+@pytest.mark.parametrize('recursive', [False, True])
+def test_find_preard(tmp_path, recursive):
+    names = {
+        'A': ['A-0000000000-0000000000.tif', 'A-0000000000-0000000256.tif'],
+        'A_2': ['A_2.tif'],
+        'B': []
+    }
+    sub = tmp_path.joinpath('order2')
+    sub.mkdir()
+    for path in (tmp_path, sub):
+        for stem, images in names.items():
+            path.joinpath(stem + '.json').write_text('{}')
+            for image in images:
+                path.joinpath(image).write_bytes(b'')
+        path.joinpath('A.txt').write_text('')
+
+    ans = preard.find_preard(tmp_path, recursive=recursive)
+    paths = [tmp_path, sub] if recursive else [tmp_path]
+    assert list(ans) == sorted(p.joinpath(stem + '.json')
+                               for p in paths for stem in names)
+    for path in paths:
+        # Same as globbing for images of each metadata file
+        for stem in names:
+            meta = path.joinpath(stem + '.json')
+            assert ans[meta] == sorted(path.glob(stem + '*.tif'))
+
+    # Just one metadata file
+    meta = sub.joinpath('A.json')
+    assert preard.find_preard(meta) == {meta: sorted(sub.glob('A*.tif'))}
+
+
+def test_preard_image_coords():
+    images = [
+        [{'CLOUD_COVER': 10, 'WRS_ROW': 30, 'LANDSAT_ID': 'A',
+          'system:time_start': 1000},
+         {'CLOUD_COVER': 20.5, 'WRS_ROW': 31, 'LANDSAT_ID': 'B',
+          'system:time_start': 2000}],
+        [{'CLOUD_COVER': 5, 'WRS_ROW': 30, 'LANDSAT_ID': 'C',
+          'system:time_start': 3000, 'IMAGE_QUALITY': 9}]
+    ]
+    coords = preard.preard_image_coords(images)
+
+    assert set(coords) == {'CLOUD_COVER', 'WRS_ROW', 'LANDSAT_ID',
+                           'system_time_start', 'IMAGE_QUALITY'}
+    np.testing.assert_array_equal(coords['CLOUD_COVER'], [15.25, 5.])
+    np.testing.assert_array_equal(coords['WRS_ROW'], [30, 30])
+    assert coords['WRS_ROW'].dtype == np.int64
+    np.testing.assert_array_equal(coords['LANDSAT_ID'], ['A,B', 'C'])
+    np.testing.assert_array_equal(coords['IMAGE_QUALITY'], [np.nan, 9.])
+    np.testing.assert_array_equal(
+        coords['system_time_start'],
+        pd.to_datetime([1000, 3000], unit='ms').values
+    )
+    assert coords['system_time_start'].attrs['long_name'] == \
+        'system:time_start'
+    assert all(c.dims == ('time', ) for c in coords.values())
+
+
+def test_preard_image_coords_float():
+    # Earth Engine returns numbers as JSON floats
+    images = [
+        [{'CLOUD_COVER': 10., 'WRS_PATH': 12., 'WRS_ROW': 47.,
+          'system:time_start': 1000., 'LEVEL1_PRODUCTION_DATE': 5000.},
+         {'CLOUD_COVER': 20., 'WRS_PATH': 12., 'WRS_ROW': 48.,
+          'system:time_start': 2000., 'LEVEL1_PRODUCTION_DATE': 4000.}],
+        [{'CLOUD_COVER': 5., 'WRS_PATH': 12., 'WRS_ROW': 48.,
+          'system:time_start': 3000.}]
+    ]
+    coords = preard.preard_image_coords(images)
+
+    np.testing.assert_array_equal(coords['CLOUD_COVER'], [15., 5.])
+    np.testing.assert_array_equal(coords['WRS_ROW'], [47, 48])
+    assert coords['WRS_ROW'].dtype == np.int64
+    assert coords['WRS_PATH'].dtype == np.int64
+    np.testing.assert_array_equal(
+        coords['system_time_start'],
+        pd.to_datetime([1000, 3000], unit='ms').values
+    )
+    np.testing.assert_array_equal(
+        coords['LEVEL1_PRODUCTION_DATE'],
+        pd.to_datetime([4000, np.nan], unit='ms').values
+    )
+
+
+# =============================================================================
+# Empty time slices
+def _empty_ard_ds(nodata=-9999):
+    blue = np.ones((4, 5, 4), dtype=np.int16)
+    blue[1] = nodata          # empty
+    blue[2, :, 1:] = nodata   # 1 of 4 columns valid
+    green = blue.copy()
+    green[3, 0, 0] = nodata   # still valid in blue
+    time = pd.date_range('2000-01-01', periods=4, freq='16D').values
+    return xr.Dataset({
+        'blue': (('time', 'y', 'x'), blue),
+        'green': (('time', 'y', 'x'), green)
+    }, coords={'time': time}).chunk({'time': 2, 'y': 2, 'x': 2})
+
+
+def test_flag_empty_slices():
+    ard = preard.flag_empty_slices(_empty_ard_ds(), nodata=-9999,
+                                   threshold=0.25)
+    assert ard['valid_fraction'].chunks is not None  # lazy until written
+    np.testing.assert_allclose(ard['valid_fraction'], [1, 0, 0.25, 1])
+    np.testing.assert_array_equal(ard['empty'], [False, True, True, False])
+    assert ard['time'].size == 4
+
+
+@pytest.mark.parametrize(('threshold', 'n_time'), [(0., 3), (0.25, 2)])
+def test_drop_empty_slices(threshold, n_time):
+    ard = preard.drop_empty_slices(_empty_ard_ds(), nodata=-9999,
+                                   threshold=threshold)
+    assert ard['time'].size == n_time
+    assert (ard['valid_fraction'] > threshold).all()
+
+
+@pytest.mark.parametrize('dtype', ['int16', 'float32'])
+def test_ard_statistics(dtype):
+    ard_ds = _empty_ard_ds().astype(dtype)
+    ard_ds['blue'][0, 0, 0] = 5
+    ard_ds['blue'][0, 0, 1] = -3
+    stats = preard.ard_statistics(ard_ds, nodata=-9999)
+
+    assert set(stats) == {f'{band}_{stat}' for band in ('blue', 'green')
+                          for stat in ('count', 'min', 'max', 'mean')}
+    assert all(stat.dims == ('time', ) for stat in stats.values())
+    assert stats['blue_count'].chunks is not None  # lazy until written
+    np.testing.assert_array_equal(stats['blue_count'], [20, 0, 5, 20])
+    np.testing.assert_array_equal(stats['green_count'], [20, 0, 5, 19])
+    np.testing.assert_array_equal(stats['blue_min'], [-3, np.nan, 1, 1])
+    np.testing.assert_array_equal(stats['blue_max'], [5, np.nan, 1, 1])
+    np.testing.assert_allclose(stats['blue_mean'], [1, np.nan, 1, 1])
+
+
+# =============================================================================
+# Zarr encoding
+@requires_zarr
+def test_zarr_compressor():
+    assert preard.zarr_compressor('zlib', 3).level == 3
+    assert preard.zarr_compressor('ZSTD', 5).cname == 'zstd'
+    assert preard.zarr_compressor('none') is None
+    with pytest.raises(KeyError, match=r'Unknown Zarr compressor'):
+        preard.zarr_compressor('bz3')
+
+
+@requires_zarr
+def test_ard_zarr_encoding():
+    ard_ds = _empty_ard_ds().chunk({'time': 1, 'y': 2, 'x': 2})
+    metadata = {'image': {'nodata': -9999}}
+    encoding = preard.ard_zarr_encoding(ard_ds, metadata,
+                                        chunks={'y': 4, 'x': 4},
+                                        compressor='zlib', complevel=3,
+                                        zlib=True)
+    assert set(encoding) == set(ard_ds.data_vars)
+    for var, enc in encoding.items():
+        assert enc['chunks'] == (4, 4, 4)
+        assert enc['_FillValue'] == -9999
+        compressor = (enc['compressors'][0] if 'compressors' in enc
+                      else enc['compressor'])
+        assert compressor.level == 3
+        assert 'zlib' not in enc
+
+
+# =============================================================================
+# Fixtures / helpers
+def write_preard_shards(path, shape, shard_size, suffix=True):
+    import rasterio
+    count, height, width = shape
+    data = np.random.randint(0, 1000, shape).astype('int16')
+    transform = Affine(30, 0, 1000, 0, -30, 5000)
+
+    filenames = []
+    for row in range(0, height, shard_size):
+        for col in range(0, width, shard_size):
+            h = min(shard_size, height - row)
+            w = min(shard_size, width - col)
+            name = 'X_2012-01-01_2017-01-01'
+            if suffix:
+                name += f'-{row:010d}-{col:010d}'
+            else:
+                name += f'_{len(filenames)}'
+            filename = path.joinpath(name + '.tif')
+            shard_transform = transform * Affine.translation(col, row)
+            with rasterio.open(str(filename), 'w', driver='GTiff',
+                               height=h, width=w, count=count, dtype='int16',
+                               crs='EPSG:5070', nodata=-9999,
+                               transform=shard_transform) as dst:
+                dst.write(data[:, row:row + h, col:col + w])
+            filenames.append(filename)
+
+    return data, filenames
@@ -0,0 +1,42 @@
+""" Tests for :py:mod:`cedar.profiling`
+"""
+import json
+
+import dask.array as da
+
+from cedar import profiling
+
+
+def test_conversion_profiler(tmp_path):
+    src = tmp_path.joinpath('PREARD.tif')
+    src.write_bytes(b'0' * 100)
+    dest = tmp_path.joinpath('ARD.zarr')
+    dest.mkdir()
+    dest.joinpath('0.0').write_bytes(b'0' * 10)
+    dest_profile, dest_report = profiling.profile_filenames(dest)
+
+    profiler = profiling.ConversionProfiler('PREARD')
+    with profiler.stage('write'), profiler.compute(dest_report):
+        da.ones((10, 10), chunks=5).sum().compute(scheduler='sync')
+    profiler.read([src])
+    profiler.written(dest)
+    profiler.write(dest_profile)
+
+    assert dest_profile.name == 'ARD.zarr.profile.json'
+    with dest_profile.open() as f:
+        report = json.load(f)
+    assert list(report['stages']) == ['write']
+    assert report['stages']['write']['wall'] > 0
+    assert report['tasks']
+    assert sum(t['n'] for t in report['tasks'].values()) > 0
+    assert report['io'] == {'bytes_read': 100, 'bytes_written': 10}
+    assert report['performance_report'] is None
+
+
+def test_conversion_profiler_disabled(tmp_path):
+    profiler = profiling.ConversionProfiler('PREARD', enabled=False)
+    with profiler.stage('write'), profiler.compute(tmp_path):
+        pass
+    profiler.read([tmp_path.joinpath('missing.tif')])
+    assert not profiler.stages
+    assert profiler.io['bytes_read'] == 0
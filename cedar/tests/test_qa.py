@@ -0,0 +1,52 @@
+""" Tests for :py:mod:`cedar.qa`
+"""
+import numpy as np
+import pytest
+import xarray as xr
+
+from cedar import qa
+
+# clear, water, cloud shadow, snow, cloud (high confidence), cirrus (high)
+QA_CLEAR = 0b10
+QA_WATER = 0b100
+QA_SHADOW = 0b1000
+QA_SNOW = 0b10000
+QA_CLOUD = 0b11100000
+QA_CIRRUS = 0b1100000000
+
+
+def test_qa_lookup_table():
+    lut = qa.qa_lookup_table()
+    assert lut.dtype == np.uint8
+    assert lut.size == 2 ** 16
+    assert lut[QA_CLEAR] == 0b10
+    assert lut[QA_CLOUD] == 0b1100000  # cloud + cloud_high_confidence
+    assert lut[0b1000000] == 0  # low confidence cloud isn't a cloud
+    assert lut[QA_CIRRUS | QA_CLEAR] == 0b10000010
+
+
+@pytest.mark.parametrize('chunks', [None, 2])
+def test_decode_qa(chunks):
+    data = np.array([[QA_CLEAR, QA_WATER | QA_CLEAR],
+                     [QA_SHADOW, QA_SNOW],
+                     [QA_CLOUD, -9999]], dtype=np.int16)
+    xarr = xr.DataArray(data, dims=('y', 'x'))
+    if chunks:
+        xarr = xarr.chunk(chunks)
+
+    mask = qa.decode_qa(xarr, nodata=-9999)
+    assert mask.dtype == np.uint8
+    assert mask.name == qa.QA_MASK_NAME
+    assert qa.is_flag_variable(mask)
+    np.testing.assert_array_equal(
+        qa.qa_flag(mask, 'cloud', 'cloud_shadow'),
+        [[False, False], [True, False], [True, False]]
+    )
+    np.testing.assert_array_equal(qa.qa_flag(mask, 'water'),
+                                  [[False, True], [False, False],
+                                   [False, False]])
+    np.testing.assert_array_equal(qa.qa_flag(mask, 'fill'),
+                                  [[False, False], [False, False],
+                                   [False, True]])
+    with pytest.raises(KeyError, match='Unknown QA flag'):
+        qa.qa_flag(mask, 'dragons')
@@ -0,0 +1,63 @@
+""" Tests for :py:mod:`cedar.rechunk`
+"""
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from cedar import rechunk
+from cedar.exceptions import MemoryLimitError
+
+pytest.importorskip('zarr')
+
+
+def _yearly_ard(tmp_path, year, n_time=6, n_y=20, n_x=20):
+    time = pd.date_range(f'{year}-01-01', periods=n_time, freq='MS')
+    data = np.arange(n_time * n_y * n_x, dtype=np.int16).reshape(
+        n_time, n_y, n_x) + year
+    ds = xr.Dataset({'blue': (('time', 'y', 'x'), data)},
+                    coords={'time': time, 'y': np.arange(n_y),
+                            'x': np.arange(n_x)})
+    dest = tmp_path.joinpath(f'ARD_{year}.nc')
+    ds.to_netcdf(str(dest), encoding={'blue': {'chunksizes': (2, 10, 10)}})
+    return dest, ds
+
+
+def test_rechunk_ard(tmp_path):
+    src_1, ds_1 = _yearly_ard(tmp_path, 2018)
+    src_2, ds_2 = _yearly_ard(tmp_path, 2019)
+    dest = tmp_path.joinpath('ARD.zarr')
+
+    ans = rechunk.rechunk_ard([src_2, src_1], dest, space_chunk=8)
+    assert ans == dest
+
+    test = xr.open_zarr(str(dest))
+    assert test['blue'].encoding['chunks'] == (12, 8, 8)
+    expected = xr.concat([ds_1, ds_2], dim='time')
+    np.testing.assert_array_equal(test['blue'].values,
+                                  expected['blue'].values)
+    # Intermediate data are removed
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        'ARD.zarr', 'ARD_2018.nc', 'ARD_2019.nc'
+    ]
+
+    with pytest.raises(FileExistsError):
+        rechunk.rechunk_ard(src_1, dest)
+
+
+def test_rechunk_ard_compressor(tmp_path):
+    src, ds = _yearly_ard(tmp_path, 2018)
+    dest = tmp_path.joinpath('ARD.zarr')
+    rechunk.rechunk_ard(src, dest, compressor='zlib', complevel=3)
+
+    assert dest.joinpath('.zgroup').exists()
+    enc = xr.open_zarr(str(dest))['blue'].encoding
+    compressor = (enc['compressors'][0] if 'compressors' in enc
+                  else enc['compressor'])
+    assert compressor.level == 3
+
+
+def test_rechunk_ard_max_mem(tmp_path):
+    src, _ = _yearly_ard(tmp_path, 2018)
+    with pytest.raises(MemoryLimitError, match=r'memory limit'):
+        rechunk.rechunk_ard(src, tmp_path.joinpath('ARD.zarr'), max_mem=100)
@@ -43,6 +43,11 @@ class Tracker(object):
         Earth Engine filters to apply, organized by image collection name.
         Values should either be ``ee.Filter`` objects or dictionaries
         that describe the filter (see :py:func:`cedar.utils.serialize_filter`)
+    export_image_kwds : dict, optional
+        Additional keyword arguments to pass to ``store.store_image``
+    inventory : cedar.sensors.inventory.SceneInventory, optional
+        Cache of scene inventories consulted before asking Earth Engine for
+        the images in each order
     """
     def __init__(self, tile_grid, store,
                  name_template=defaults.PREARD_NAME,
@@ -50,7 +55,8 @@ class Tracker(object):
                  tracking_template=defaults.PREARD_TRACKING,
                  tracking_prefix=defaults.PREARD_TRACKING_PREFIX,
                  filters=None,
-                 export_image_kwds=None):
+                 export_image_kwds=None,
+                 inventory=None):
         assert isinstance(tile_grid, TileGrid)
         self.tile_grid = tile_grid
         self.store = store
@@ -60,6 +66,7 @@ class Tracker(object):
         self.tracking_prefix = tracking_prefix
         self._filters = filters or defaultdict(list)
         self.export_image_kwds = export_image_kwds or {}
+        self.inventory = inventory
 
     @property
     def filters(self):
@@ -74,7 +81,8 @@ class Tracker(object):
 
     def submit(self, collections, tile_indices,
                period_start, period_end, period_freq=None,
-               save_empty_metadata=True, error_if_empty=False):
+               save_empty_metadata=True, error_if_empty=False,
+               max_workers=defaults.ORDER_MAX_WORKERS):
         """ Submit and track GEE pre-ARD tasks
 
         Parameters
@@ -96,9 +104,13 @@ class Tracker(object):
             of spotty historical record) will store metadata, but will not start
             the task. If False, will not store this metadata
         error_if_empty : bool, optional
-            If True, raise an EmptyCollectionError if the image collection
-            result has no images. The default behavior is to log and skip
-            empty search results
+            If True, raise an EmptyCollectionError (specifically, a
+            :py:class:`cedar.exceptions.OrderEmptyCollectionError`) if the
+            image collection results have no images. The default behavior is
+            to log and skip empty search results
+        max_workers : int, optional
+            Number of pre-ARD images to create at once (see
+            :py:meth:`cedar.ordering.Order.add_many`)
 
         Returns
         -------
@@ -152,18 +164,24 @@ class Tracker(object):
             prefix_template=self.prefix_template
         )
 
-        # Loop over product of collections, tiles, and dates
+        # Create images for product of collections, tiles, and dates
+        filters = self.filters
+        requests = []
         for collection, tile, (date_start, date_end) in iter_submit:
             logger.debug(
                 f'Adding "{collection}" - '
                 f'"h{tile.horizontal:03d}v{tile.vertical:03d} - '
                 f'{date_start} to {date_end}'
             )
-            order.add(
-                collection, tile, date_start, date_end,
-                filters=self.filters.get(collection, []),
-                error_if_empty=error_if_empty
-            )
+            requests.append({
+                'collection': collection,
+                'tile': tile,
+                'date_start': date_start,
+                'date_end': date_end,
+                'filters': filters.get(collection, [])
+            })
+        order.add_many(requests, error_if_empty=error_if_empty,
+                       max_workers=max_workers, inventory=self.inventory)
 
         logger.debug('Submitting order')
         tracking_id = order.submit(
@@ -41,12 +41,15 @@ ENTRY_POINTS = {
     ],
     'cedar.cli': [
         'auth=cedar.cli.auth:group_auth',
+        'catalog=cedar.cli.catalog:group_catalog',
         'clean=cedar.cli.storage:clean',
         'config=cedar.cli.config:group_config',
         'console=cedar.cli.console:console',
         'convert=cedar.cli.convert:convert',
         'download=cedar.cli.storage:download',
         'gee=cedar.cli.gee:group_gee',
+        'pipeline=cedar.cli.pipeline:pipeline',
+        'rechunk=cedar.cli.rechunk:rechunk',
         'status=cedar.cli.status:group_status',
         'submit=cedar.cli.submit:submit',
     ]
@@ -75,7 +78,9 @@ EXTRAS_REQUIRE = {
     'tests': TESTS_REQUIRE,
     'gcs': ['google-cloud-storage'],
     'gdrive': ['google-api-python-client', 'google-auth-httplib2',
-               'google-auth-oauthlib']
+               'google-auth-oauthlib'],
+    'zarr': ['zarr', 'numcodecs'],
+    'rechunker': ['rechunker']
 }
 EXTRAS_REQUIRE['all'] = sorted(set(sum(EXTRAS_REQUIRE.values(), [])))
 